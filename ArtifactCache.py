@@ -0,0 +1,314 @@
+'''
+Content addressed cache of built EPICS release outputs.
+
+Each entry holds the bin/<arch> and lib/<arch> outputs of building one cross
+target arch of a release.  Only cross arches are cached, as a full make or a
+host arch build also installs db, dbd, include, iocBoot envPaths, etc.
+An entry is keyed by a hash of what went into the build:
+    the git commit sha of the release checkout,
+    the real path of the build dir, as EPICS builds embed absolute paths,
+    the path, version, and git commit sha of each package it depends on,
+    the target arch and the host toolchain.
+A release built again w/ the same inputs, ex. after a -FAILED cleanup,
+is restored from the cache via reflinks or copies instead of running make.
+Files are never hardlinked between the cache and release trees, so
+fixPermissions() on a release can't change a cache entry.
+
+The cache keeps persistent hit and miss statistics and evicts the least
+recently used entries when it grows past its max size.'''
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import subprocess
+from repo_defaults import *
+from cmd_utils import *
+from version_utils import *
+
+artifactCacheVersion = 1
+
+def _gitHeadSha( topDir ):
+    '''Returns the HEAD commit sha for the git checkout at topDir, or None'''
+    if not os.path.exists( os.path.join( topDir, '.git' ) ):
+        return None
+    try:
+        return cmd_check_output( [ 'git', '-C', topDir, 'rev-parse', 'HEAD' ],
+                                 stderr=subprocess.DEVNULL, universal_newlines=True ).strip()
+    except ( OSError, subprocess.CalledProcessError ):
+        return None
+
+def _gitIsClean( topDir ):
+    '''Returns True if no tracked files in the git checkout at topDir have been modified'''
+    return cmd_call( [ 'git', '-C', topDir, 'diff', '--quiet', 'HEAD' ],
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL ) == 0
+
+_toolchainId = None
+
+def getToolchainId():
+    '''Returns a string identifying the host compiler, ex. x86_64-redhat-linux gcc 11.4.1'''
+    global _toolchainId
+    if _toolchainId is None:
+        try:
+            machine = cmd_check_output( [ 'gcc', '-dumpmachine' ], stderr=subprocess.DEVNULL, universal_newlines=True ).strip()
+            version = cmd_check_output( [ 'gcc', '-dumpfullversion', '-dumpversion' ], stderr=subprocess.DEVNULL, universal_newlines=True ).strip()
+            _toolchainId = "%s gcc %s" % ( machine, version )
+        except ( OSError, subprocess.CalledProcessError ):
+            _toolchainId = "unknown"
+    return _toolchainId
+
+def getArtifactKeyInputs( buildDir, arch=None, debug=False ):
+    '''
+    Returns a dict of the inputs that determine the outputs of building buildDir for arch,
+    or None if the build can't be cached, ex. for a checkout that isn't git or has local changes.
+    Dependents are read from the configure/RELEASE macros, so call this after they're built.
+    '''
+    releaseSha = _gitHeadSha( buildDir )
+    if releaseSha is None or not _gitIsClean( buildDir ):
+        return None
+
+    dependents = {}
+    macros = getConfigureDir( buildDir, debug=debug ).getMacros()
+    for macroName in sorted( macros ):
+        macroValue = macros[macroName]
+        if macroName == 'TOP' or not macroValue or ' ' in macroValue:
+            continue
+        if not macroNameToPkgName( macroName ) or not os.path.isdir( macroValue ):
+            continue
+        depPath = os.path.realpath( macroValue )
+        dependents[macroName] = [ depPath, os.path.basename( depPath ), _gitHeadSha( depPath ) ]
+
+    return {    'version':		artifactCacheVersion,
+                'releaseSha':	releaseSha,
+                'buildDir':		os.path.realpath( buildDir ),
+                'dependents':	dependents,
+                'arch':			arch,
+                'hostArch':		os.environ.get( 'EPICS_HOST_ARCH', '' ),
+                'toolchain':	getToolchainId() }
+
+def getArtifactKey( keyInputs ):
+    '''Returns the cache key for the dict returned by getArtifactKeyInputs()'''
+    return hashlib.sha256( json.dumps( keyInputs, sort_keys=True ).encode() ).hexdigest()
+
+def getArtifactPaths( topDir, arch, artifactDirs=None ):
+    '''
+    Returns the list of paths relative to topDir that hold the build outputs for arch,
+    ex. bin/linuxRT-x86_64 and lib/linuxRT-x86_64
+    '''
+    if artifactDirs is None:
+        artifactDirs = DEF_ECO_ARTIFACT_DIRS
+    artifactPaths = []
+    for artifactDir in artifactDirs:
+        artifactDir = os.path.join( artifactDir, arch )
+        if os.path.isdir( os.path.join( topDir, artifactDir ) ):
+            artifactPaths.append( artifactDir )
+    return artifactPaths
+
+def linkTree( srcDir, dstDir, linkMode='reflink' ):
+    '''
+    Populate dstDir w/ a copy of the contents of srcDir, replacing any existing files.
+    reflink mode lets cp share the file extents where supported, otherwise it copies.
+    copy mode always copies.  Each file gets its own inode either way, so changing
+    the permissions or contents of one tree never changes the other.
+    Symlinks are copied as symlinks.  Returns the number of bytes in the files.
+    '''
+    if not os.path.isdir( dstDir ):
+        os.makedirs( dstDir, 0o775 )
+    reflink = '--reflink=never' if linkMode == 'copy' else '--reflink=auto'
+    cmd_check_call( [ 'cp', '-a', reflink, os.path.join( srcDir, '.' ), dstDir ] )
+    return getTreeSize( dstDir )
+
+def getTreeSize( topDir ):
+    '''Returns the total size of the regular files under topDir'''
+    nBytes = 0
+    for dirPath, dirs, files in os.walk( topDir ):
+        for name in files:
+            filePath = os.path.join( dirPath, name )
+            if not os.path.islink( filePath ):
+                nBytes += os.lstat( filePath ).st_size
+    return nBytes
+
+class ArtifactCache( object ):
+    '''
+    Cache of build outputs under cacheDir, each entry in cacheDir/ab/abcdef.../
+    w/ an entry.json manifest whose mtime records when the entry was last used.
+    maxSize is in bytes, the least recently used entries are evicted past it.
+    '''
+    def __init__( self, cacheDir=DEF_ECO_ARTIFACT_CACHE_DIR, maxSize=DEF_ECO_ARTIFACT_CACHE_SIZE,
+                  linkMode=DEF_ECO_ARTIFACT_LINK_MODE, verbose=False ):
+        self._cacheDir	= cacheDir
+        self._maxSize	= maxSize
+        self._linkMode	= linkMode
+        self._verbose	= verbose
+        self._lockPath	= os.path.join( cacheDir, '.lock' )
+        self._statsPath	= os.path.join( cacheDir, 'stats.json' )
+        # Statistics for this process, the persistent totals are in stats.json
+        self._sessionStats = { 'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0 }
+
+    def __str__( self ):
+        return "ArtifactCache( %s, maxSize=%.1fGB, linkMode=%s )" % ( self._cacheDir, self._maxSize / 1024.0**3, self._linkMode )
+
+    def getEntryDir( self, key ):
+        return os.path.join( self._cacheDir, key[:2], key )
+
+    def _lock( self ):
+        '''Returns an open lock file w/ an exclusive lock on the cache, close it to unlock'''
+        if not os.path.isdir( self._cacheDir ):
+            os.makedirs( self._cacheDir, 0o775 )
+        lockFile = open( self._lockPath, 'a' )
+        fcntl.flock( lockFile, fcntl.LOCK_EX )
+        return lockFile
+
+    def _readStats( self ):
+        try:
+            with open( self._statsPath, 'r' ) as f:
+                return json.load( f )
+        except ( IOError, OSError, ValueError ):
+            return { 'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0 }
+
+    def _updateStats( self, **counts ):
+        '''Add counts to the session and persistent stats.  Caller must hold the lock'''
+        stats = self._readStats()
+        for name, count in counts.items():
+            stats[name] = stats.get( name, 0 ) + count
+            self._sessionStats[name] = self._sessionStats.get( name, 0 ) + count
+        tmpPath = '%s.%d' % ( self._statsPath, os.getpid() )
+        with open( tmpPath, 'w' ) as f:
+            json.dump( stats, f )
+        os.replace( tmpPath, self._statsPath )
+
+    def restore( self, key, topDir ):
+        '''
+        Populate topDir w/ the outputs cached under key.
+        Returns True on a hit, False on a miss.
+        '''
+        entryDir = self.getEntryDir( key )
+        manifestPath = os.path.join( entryDir, 'entry.json' )
+        try:
+            with self._lock():
+                if not os.path.isfile( manifestPath ):
+                    self._updateStats( misses=1 )
+                    return False
+                with open( manifestPath, 'r' ) as f:
+                    manifest = json.load( f )
+                for artifactPath in manifest['paths']:
+                    linkTree( os.path.join( entryDir, artifactPath ), os.path.join( topDir, artifactPath ), self._linkMode )
+                # Mark the entry as recently used
+                os.utime( manifestPath, None )
+                self._updateStats( hits=1 )
+        except ( IOError, OSError, ValueError, KeyError, subprocess.CalledProcessError ) as e:
+            print("ArtifactCache: Unable to restore %s to %s: %s" % ( key, topDir, e ))
+            return False
+        if self._verbose:
+            print("ArtifactCache: Restored %s from %s" % ( topDir, entryDir ))
+        return True
+
+    def store( self, key, topDir, artifactPaths, keyInputs=None ):
+        '''
+        Save the artifactPaths, relative to topDir, under key and evict old entries if needed.
+        Returns True if the outputs were stored.
+        '''
+        if len(artifactPaths) == 0:
+            return False
+        entryDir = self.getEntryDir( key )
+        tmpDir = '%s.tmp%d' % ( entryDir, os.getpid() )
+        try:
+            nBytes = 0
+            for artifactPath in artifactPaths:
+                nBytes += linkTree( os.path.join( topDir, artifactPath ), os.path.join( tmpDir, artifactPath ), self._linkMode )
+            manifest = { 'key': key, 'source': os.path.abspath( topDir ), 'paths': artifactPaths,
+                         'size': nBytes, 'created': time.time(), 'inputs': keyInputs }
+            with open( os.path.join( tmpDir, 'entry.json' ), 'w' ) as f:
+                json.dump( manifest, f, indent=1 )
+            with self._lock():
+                if os.path.isdir( entryDir ):
+                    # Another build stored it first
+                    shutil.rmtree( tmpDir )
+                    return False
+                os.rename( tmpDir, entryDir )
+                self._updateStats( stores=1 )
+                self._evict()
+        except ( IOError, OSError, subprocess.CalledProcessError ) as e:
+            print("ArtifactCache: Unable to store %s: %s" % ( topDir, e ))
+            if os.path.isdir( tmpDir ):
+                shutil.rmtree( tmpDir, ignore_errors=True )
+            return False
+        if self._verbose:
+            print("ArtifactCache: Stored %s in %s" % ( topDir, entryDir ))
+        return True
+
+    def getEntries( self ):
+        '''Returns a list of ( lastUsed, size, entryDir ) for each cache entry'''
+        entries = []
+        if not os.path.isdir( self._cacheDir ):
+            return entries
+        for prefix in os.listdir( self._cacheDir ):
+            prefixDir = os.path.join( self._cacheDir, prefix )
+            if len(prefix) != 2 or not os.path.isdir( prefixDir ):
+                continue
+            for key in os.listdir( prefixDir ):
+                manifestPath = os.path.join( prefixDir, key, 'entry.json' )
+                try:
+                    with open( manifestPath, 'r' ) as f:
+                        size = json.load( f ).get( 'size', 0 )
+                    entries.append( ( os.stat( manifestPath ).st_mtime, size, os.path.join( prefixDir, key ) ) )
+                except ( IOError, OSError, ValueError ):
+                    continue
+        return entries
+
+    def _evict( self ):
+        '''Remove least recently used entries until the cache fits in maxSize.  Caller must hold the lock'''
+        entries = sorted( self.getEntries() )
+        totalSize = sum( [ size for ( lastUsed, size, entryDir ) in entries ] )
+        nEvicted = 0
+        for ( lastUsed, size, entryDir ) in entries:
+            if totalSize <= self._maxSize:
+                break
+            if self._verbose:
+                print("ArtifactCache: Evicting %s" % entryDir)
+            shutil.rmtree( entryDir, ignore_errors=True )
+            totalSize -= size
+            nEvicted += 1
+        if nEvicted:
+            self._updateStats( evictions=nEvicted )
+
+    def getStats( self ):
+        '''Returns a dict of the persistent and session stats plus the current cache size'''
+        with self._lock():
+            stats = self._readStats()
+        entries = self.getEntries()
+        stats['entries']	= len(entries)
+        stats['size']		= sum( [ size for ( lastUsed, size, entryDir ) in entries ] )
+        stats['maxSize']	= self._maxSize
+        stats['session']	= dict( self._sessionStats )
+        return stats
+
+    def showStats( self ):
+        stats = self.getStats()
+        lookups = stats['hits'] + stats['misses']
+        print("%s" % self)
+        print("  Entries: %d, %.1fMB" % ( stats['entries'], stats['size'] / 1024.0**2 ))
+        print("  Total:   %d hits, %d misses (%.0f%% hit rate), %d stores, %d evictions" % (
+                stats['hits'], stats['misses'], ( 100.0 * stats['hits'] / lookups ) if lookups else 0.0,
+                stats['stores'], stats['evictions'] ))
+        session = stats['session']
+        print("  Session: %d hits, %d misses, %d stores, %d evictions" % (
+                session['hits'], session['misses'], session['stores'], session['evictions'] ))
+
+_defaultArtifactCache = None
+_artifactCacheEnabled = DEF_ECO_ARTIFACT_CACHE_SIZE > 0
+
+def enableArtifactCache( enable=True ):
+    global _artifactCacheEnabled
+    _artifactCacheEnabled = enable
+
+def getDefaultArtifactCache( verbose=False ):
+    '''Returns the shared ArtifactCache, or None if the cache is disabled'''
+    global _defaultArtifactCache
+    if not _artifactCacheEnabled:
+        return None
+    if _defaultArtifactCache is None:
+        _defaultArtifactCache = ArtifactCache( verbose=verbose )
+    return _defaultArtifactCache
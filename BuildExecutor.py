@@ -0,0 +1,204 @@
+'''
+Build executors for Releaser build steps.
+
+BuildExecutor queues commands, retries failed attempts, and streams each
+command's output to an optional log as it runs.  Subclasses only need to say
+where a command runs and how to launch it there:
+    LocalExecutor runs commands in a local /bin/bash subprocess.
+    SshExecutor dispatches commands via ssh to a pool of build hosts,
+    placing each one on the host w/ the lowest load.'''
+
+import os
+import time
+import shlex
+import threading
+import subprocess
+import concurrent.futures
+from repo_defaults import *
+from cmd_utils import *
+
+class BuildExecutor(object):
+    '''
+    Base class for build executors.
+    hosts is the list of places a command can run, each w/ up to jobsPerHost commands at once.
+    A command that exits w/ one of retryReturnCodes is retried up to retries times,
+    waiting retryDelay seconds between attempts.
+    '''
+    def __init__( self, hosts, jobsPerHost=1, retries=0, retryReturnCodes=(), retryDelay=5.0, verbose=False, debug=False ):
+        self._hosts				= list(hosts)
+        self._jobsPerHost		= jobsPerHost
+        self._retries			= retries
+        self._retryReturnCodes	= tuple(retryReturnCodes)
+        self._retryDelay		= retryDelay
+        self._verbose			= verbose
+        self._debug				= debug
+        self._running			= dict( ( host, 0 ) for host in self._hosts )
+        self._hostFree			= threading.Condition()
+        self._queue				= concurrent.futures.ThreadPoolExecutor( max_workers=max( 1, len(self._hosts) * jobsPerHost ) )
+
+    def __str__( self ):
+        return "%s( hosts=%s, jobsPerHost=%d, retries=%d )" % ( self.__class__.__name__, ' '.join(self._hosts), self._jobsPerHost, self._retries )
+
+    # Override in child class
+    def commandList( self, host, cmd, cwd ):
+        '''Returns the Popen args list that runs the bash cmd in cwd on host, a local /bin/bash by default'''
+        return [ '/bin/bash', '-c', cmd ]
+
+    def getLoadAvg( self, host ):
+        '''Returns the load on host from other users, added to our running command count for placement'''
+        return 0.0
+
+    def submit( self, cmd, outputPipe=subprocess.PIPE, logStream=None, cwd=None ):
+        '''Queue cmd to run on the next free host.  Returns a concurrent.futures.Future for execute()'''
+        if cwd is None:
+            cwd = os.getcwd()
+        return self._queue.submit( self.execute, cmd, outputPipe, logStream, cwd )
+
+    def execute( self, cmd, outputPipe=subprocess.PIPE, logStream=None, cwd=None ):
+        '''
+        Run the bash cmd and return its output.
+        outputPipe is handled like subprocess stdout:
+            subprocess.PIPE captures stdout and stderr, which are returned as a string,
+            None leaves them on our stdout and stderr,
+            a file object receives them.
+        If logStream is provided, captured output is also written to it a line at a time as it arrives.
+        Raises RuntimeError if cmd fails after any retries.
+        '''
+        if cwd is None:
+            cwd = os.getcwd()
+        attempt = 0
+        while True:
+            host = self.acquireHost()
+            try:
+                ( returnCode, output ) = self.runOnHost( host, cmd, cwd, outputPipe, logStream )
+            finally:
+                self.releaseHost( host )
+            if returnCode == 0:
+                return output
+            if attempt >= self._retries or returnCode not in self._retryReturnCodes:
+                break
+            attempt += 1
+            print("%s: Retry %d of %d for command on %s: %s" % ( self.__class__.__name__, attempt, self._retries, host, cmd ))
+            time.sleep( self._retryDelay )
+
+        errMsg = "Command Failed: %s\n" % ( cmd )
+        if output:
+            errMsg += output
+        errMsg += "Return Code: %d\n" % ( returnCode )
+        raise RuntimeError(errMsg)
+
+    def acquireHost( self ):
+        '''Wait for a host w/ a free job slot and reserve the slot on the least loaded one'''
+        # Read the load averages before taking the lock as they may need a remote query
+        loadAvg = dict( ( host, self.getLoadAvg( host ) ) for host in self._hosts )
+        with self._hostFree:
+            while True:
+                freeHosts = [ host for host in self._hosts if self._running[host] < self._jobsPerHost ]
+                if freeHosts:
+                    break
+                self._hostFree.wait()
+            host = min( freeHosts, key=lambda h: self._running[h] + loadAvg[h] )
+            self._running[host] += 1
+        return host
+
+    def releaseHost( self, host ):
+        with self._hostFree:
+            self._running[host] -= 1
+            self._hostFree.notify()
+
+    def runOnHost( self, host, cmd, cwd, outputPipe, logStream ):
+        '''Run cmd on host, streaming captured output to logStream.  Returns ( returnCode, output )'''
+        cmdList = self.commandList( host, cmd, cwd )
+        if self._debug:
+            print("%s running on %s: %s" % ( self.__class__.__name__, host, ' '.join(cmdList) ))
+        start = time.perf_counter()
+        if outputPipe is subprocess.PIPE:
+            proc = subprocess.Popen( cmdList, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     universal_newlines=True )
+            outputLines = []
+            for line in proc.stdout:
+                outputLines.append( line )
+                if logStream is not None:
+                    logStream.write( line )
+                    logStream.flush()
+            proc.wait()
+            output = ''.join( outputLines )
+        else:
+            proc = subprocess.Popen( cmdList, cwd=cwd, stdout=outputPipe, stderr=outputPipe )
+            proc.wait()
+            output = None
+        recordCmd( cmdList, cwd, start, proc.returncode )
+        if self._debug:
+            print("process returned", proc.returncode)
+        return ( proc.returncode, output )
+
+    def shutdown( self, wait=True ):
+        self._queue.shutdown( wait=wait )
+
+class LocalExecutor( BuildExecutor ):
+    '''
+    Runs commands in a local /bin/bash subprocess, up to maxJobs at a time.
+    Uses the same queueing, retries, and log streaming as the remote executors,
+    so it can stand in for them w/o network access.
+    '''
+    def __init__( self, maxJobs=1, retries=0, retryReturnCodes=(), retryDelay=5.0, verbose=False, debug=False ):
+        super(LocalExecutor, self).__init__( [ 'localhost' ], jobsPerHost=maxJobs, retries=retries,
+                                             retryReturnCodes=retryReturnCodes, retryDelay=retryDelay,
+                                             verbose=verbose, debug=debug )
+
+class SshExecutor( BuildExecutor ):
+    '''
+    Runs commands on a pool of build hosts via ssh.
+    The build directories must be on a filesystem shared w/ the build hosts.
+    Each command is placed on the host w/ the fewest commands running from us
+    plus its 1 minute load average, which is refreshed every loadInterval seconds.
+    ssh exits w/ 255 when it can't reach a host, so those attempts are retried by default.
+    The envVars set in our environment, ex. EPICS_HOST_ARCH and PATH, are exported
+    to each command after the remote login profile so it builds w/ the same toolchain.
+    '''
+    def __init__( self, hosts, jobsPerHost=DEF_ECO_BUILD_JOBS_PER_HOST, retries=DEF_ECO_BUILD_RETRIES, retryReturnCodes=(255,),
+                  retryDelay=5.0, loadInterval=30.0, sshOptions=None, envVars=DEF_ECO_BUILD_ENV_VARS, verbose=False, debug=False ):
+        super(SshExecutor, self).__init__( hosts, jobsPerHost=jobsPerHost, retries=retries,
+                                           retryReturnCodes=retryReturnCodes, retryDelay=retryDelay,
+                                           verbose=verbose, debug=debug )
+        if sshOptions is None:
+            sshOptions = [ '-o', 'BatchMode=yes', '-o', 'ConnectTimeout=10' ]
+        self._sshOptions	= sshOptions
+        self._loadInterval	= loadInterval
+        self._loadAvg		= {}	# host -> ( timeRead, loadAvg )
+        self._envVars		= list(envVars)
+
+    def commandList( self, host, cmd, cwd ):
+        remoteCmd = 'cd %s && %s' % ( shlex.quote( cwd ), cmd )
+        exports = [ '%s=%s' % ( var, shlex.quote( os.environ[var] ) ) for var in self._envVars if var in os.environ ]
+        if exports:
+            remoteCmd = 'export %s && %s' % ( ' '.join( exports ), remoteCmd )
+        return [ 'ssh' ] + self._sshOptions + [ host, 'bash -l -c %s' % shlex.quote( remoteCmd ) ]
+
+    def getLoadAvg( self, host ):
+        '''Returns the host's 1 minute load average, read via ssh at most once per loadInterval'''
+        ( timeRead, loadAvg ) = self._loadAvg.get( host, ( 0.0, 0.0 ) )
+        if time.time() - timeRead < self._loadInterval:
+            return loadAvg
+        try:
+            output = cmd_check_output( [ 'ssh' ] + self._sshOptions + [ host, 'cat /proc/loadavg' ],
+                                       stderr=subprocess.DEVNULL, universal_newlines=True, timeout=15 )
+            loadAvg = float( output.split()[0] )
+        except ( OSError, ValueError, IndexError, subprocess.CalledProcessError, subprocess.TimeoutExpired ):
+            # Unreachable hosts go to the back of the line
+            loadAvg = float( 'inf' )
+        self._loadAvg[host] = ( time.time(), loadAvg )
+        return loadAvg
+
+_defaultBuildExecutor = None
+
+def getDefaultBuildExecutor( verbose=False ):
+    '''Returns the shared executor for build steps, an SshExecutor if DEF_ECO_BUILD_HOSTS is set, else a LocalExecutor'''
+    global _defaultBuildExecutor
+    if _defaultBuildExecutor is None:
+        if DEF_ECO_BUILD_HOSTS:
+            _defaultBuildExecutor = SshExecutor( DEF_ECO_BUILD_HOSTS, verbose=verbose )
+        else:
+            # Enough local slots for concurrent per-arch builds
+            _defaultBuildExecutor = LocalExecutor( maxJobs=max( DEF_ECO_BUILD_JOBS_PER_HOST, os.cpu_count() or 1 ), verbose=verbose )
+    return _defaultBuildExecutor
@@ -1,41 +1,108 @@
 import re
 import sys
-import shutil
+import fcntl
 import tempfile
 import os
 import grp
 import pwd
 import stat
 import subprocess
+import concurrent.futures
 import Repo
 import gitRepo
 import svnRepo
+from ArtifactCache import *
+from cmd_utils import *
+from BuildExecutor import *
 from cram_utils import *
+from fs_utils import *
 from git_utils import *
 from svn_utils import *
 from site_utils import *
 from version_utils import *
 
-def makeDirsWritable( dirPathTop ):
-    userId  = os.geteuid()
-    for dirPath, dirs, files in os.walk(dirPathTop):
-        dirName = os.path.split( dirPath )[-1]
-        pathStatus = os.stat( dirPath )
-        if pathStatus.st_mode & stat.S_IWGRP:
-            continue
-        # See if user owns the directory
-        if userId != pathStatus.st_uid:
-            print("Error: %s does not own %s and cannot make it writable!")
-            return 1
-        
-        # Make it writable.
+def getCookieJarPath( releasePath, epicsHostArch ):
+    '''Returns the directory for the built cookie of an EPICS release for epicsHostArch'''
+    if os.path.isdir( os.path.join( releasePath, "build" ) ):
+        return os.path.join( releasePath, "O." + epicsHostArch )
+    else:
+        return os.path.join( releasePath, "configure", "O." + epicsHostArch )
+
+def isReleaseBuilt( releasePath, epicsHostArch ):
+    '''Returns True if the built cookie for epicsHostArch exists in releasePath'''
+    return os.path.isfile( os.path.join( getCookieJarPath( releasePath, epicsHostArch ), ".is_built" ) )
+
+def getReleaseLockPath( releasePath ):
+    '''Returns the path of the lock file for building releasePath, ex. asyn/.R4.30.lock for asyn/R4.30'''
+    ( parentDir, releaseName ) = os.path.split( os.path.normpath( releasePath ) )
+    return os.path.join( parentDir, ".%s.lock" % releaseName )
+
+def getReleaseStagingPath( releasePath ):
+    '''Returns the path where a new release is checked out before it's renamed to releasePath'''
+    ( parentDir, releaseName ) = os.path.split( os.path.normpath( releasePath ) )
+    return os.path.join( parentDir, ".%s.staging" % releaseName )
+
+class ReleaseLock( object ):
+    '''
+    Exclusive cross process lock for building the release at releasePath.
+    Uses fcntl.flock on a lock file next to the release, so the lock
+    is dropped by the kernel if the process holding it dies.
+    Use as a context manager:
+        with ReleaseLock( releasePath ):
+            build release
+    '''
+    def __init__( self, releasePath, verbose=False, dryRun=False ):
+        self._releasePath	= releasePath
+        self._lockPath		= getReleaseLockPath( releasePath )
+        self._lockFd		= None
+        self._verbose		= verbose
+        self._dryRun		= dryRun
+
+    def acquire( self ):
+        if self._dryRun:
+            return
+        lockDir = os.path.dirname( self._lockPath )
+        # On NFS, flock is emulated w/ fcntl locks, which need a writable fd for LOCK_EX
         try:
-            os.chmod( dirPath, pathStatus.st_mode | (stat.S_IWUSR | stat.S_IWGRP) )
+            if not os.path.isdir( lockDir ):
+                os.makedirs( lockDir, 0o775 )
+            self._lockFd = os.open( self._lockPath, os.O_RDWR | os.O_CREAT, 0o664 )
+        except PermissionError:
+            # Ex. a lock file created by another user, fine on a local filesystem
+            try:
+                self._lockFd = os.open( self._lockPath, os.O_RDONLY )
+            except OSError as e:
+                raise BuildError( "Unable to open release lock %s: %s" % ( self._lockPath, e ) )
         except OSError as e:
-            print("Error: Unable to make %s writable!" % buildDir)
-            print(e.strerror)
-            raise
-    return 0
+            raise BuildError( "Unable to open release lock %s: %s" % ( self._lockPath, e ) )
+        try:
+            try:
+                fcntl.flock( self._lockFd, fcntl.LOCK_EX | fcntl.LOCK_NB )
+            except BlockingIOError:
+                print("Waiting for another build of %s to finish ..." % ( self._releasePath ))
+                sys.stdout.flush()
+                with traceSpan( 'waitForReleaseLock', release=self._releasePath ):
+                    fcntl.flock( self._lockFd, fcntl.LOCK_EX )
+        except OSError as e:
+            os.close( self._lockFd )
+            self._lockFd = None
+            raise BuildError( "Unable to lock %s for the build of %s: %s" % ( self._lockPath, self._releasePath, e ) )
+        if self._verbose:
+            print("ReleaseLock: Locked %s" % ( self._lockPath ))
+
+    def release( self ):
+        if self._lockFd is not None:
+            fcntl.flock( self._lockFd, fcntl.LOCK_UN )
+            os.close( self._lockFd )
+            self._lockFd = None
+
+    def __enter__( self ):
+        self.acquire()
+        return self
+
+    def __exit__( self, excType, excValue, traceback ):
+        self.release()
+        return False
 
 class BuildError( Exception ):
     pass
@@ -46,11 +113,23 @@ class ValidateError( Exception ):
 class InstallError( Exception ):
     pass
 
-def find_release( packageSpec, repo_url=None, verbose=False ):
+def find_svn_release( packagePath, packageVersion, verbose=False, minimizeRepoAccess=False ):
+    '''Returns ( repo, Releaser ) for packageVersion of packagePath in svn, or ( None, None ) if not found'''
+    (svn_url, svn_branch, svn_tag) = svnFindPackageRelease( packagePath, packageVersion, debug=False, verbose=verbose )
+    if svn_url is None:
+        return ( None, None )
+    if verbose:
+        print("find_release: Found svn_url=%s, svn_path=%s, svn_tag=%s" % ( svn_url, svn_branch, svn_tag ))
+    repo = svnRepo.svnRepo( svn_url, svn_branch, os.path.split(packagePath)[1], svn_tag )
+    return ( repo, Releaser( repo, packagePath, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess ) )
+
+def find_release( packageSpec, repo_url=None, verbose=False, minimizeRepoAccess=False ):
     '''packageSpec should be packageName/Version.  Ex: ADCore/R2.6-0.1.0
        packageSpec can include one or two parent directories to help specify the package,
        of which the last component is the packageName.
-       Ex. ioc/amo/gigECam/R3.1.1, extensions/caqtdm/R0.5'''
+       Ex. ioc/amo/gigECam/R3.1.1, extensions/caqtdm/R0.5
+       If minimizeRepoAccess is True, each repo url is only queried once
+       and the returned Releaser will also minimize repo access.'''
     release = None
     repo = None
     if verbose:
@@ -60,22 +139,17 @@ def find_release( packageSpec, repo_url=None, verbose=False ):
     if repo_url is not None:
         if repo_url.endswith( '.git' ):
             repo = gitRepo.gitRepo( repo_url, None, packageName, packageVersion )
-            release = Releaser( repo, packagePath, None, packageVersion, verbose=verbose )
+            release = Releaser( repo, packagePath, None, packageVersion, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess )
         elif repo_url.find( 'svn' ) >= 0:
             repo = svnRepo.svnRepo( repo_url, repo_url, packageName, packageVersion )
-            release = Releaser( repo, packagePath, None, packageVersion, verbose=verbose )
+            release = Releaser( repo, packagePath, None, packageVersion, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess )
     else:
-        (git_url, git_tag) = gitFindPackageRelease( packagePath, packageVersion, debug=False, verbose=verbose )
+        (git_url, git_tag) = gitFindPackageRelease( packagePath, packageVersion, debug=False, verbose=verbose, useCache=minimizeRepoAccess )
         if git_url is not None:
             repo = gitRepo.gitRepo( git_url, None, packageName, git_tag )
-            release = Releaser( repo, packagePath, None, git_tag, verbose=verbose )
+            release = Releaser( repo, packagePath, None, git_tag, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess )
         if release is None:
-            (svn_url, svn_branch, svn_tag) = svnFindPackageRelease( packagePath, packageVersion, debug=False, verbose=verbose )
-            if svn_url is not None:
-                if verbose:
-                    print("find_release: Found svn_url=%s, svn_path=%s, svn_tag=%s" % ( svn_url, svn_branch, svn_tag ))
-                repo = svnRepo.svnRepo( svn_url, svn_branch, packageName, svn_tag )
-                release = Releaser( repo, packagePath, verbose=verbose )
+            ( repo, release ) = find_svn_release( packagePath, packageVersion, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess )
     if verbose:
         if repo is not None:
             repo.ShowRepo( titleLine="find_release found: " + packageSpec, prefix=" " )
@@ -83,6 +157,27 @@ def find_release( packageSpec, repo_url=None, verbose=False ):
             print("find_release: Could not find packageSpec: %s" % packageSpec)
     return release
 
+def find_releases( packageSpecs, verbose=False, minimizeRepoAccess=False ):
+    '''Like find_release() for a list of packageSpecs, but the git repos for all of them are looked up concurrently.
+       Returns a list w/ a Releaser for each packageSpec, or None if it wasn't found.'''
+    releases = []
+    gitReleases = gitFindPackageReleases( [ os.path.split( packageSpec ) for packageSpec in packageSpecs ],
+                                          verbose=verbose, useCache=minimizeRepoAccess )
+    for ( packageSpec, ( git_url, git_tag ) ) in zip( packageSpecs, gitReleases ):
+        ( packagePath, packageVersion ) = os.path.split( packageSpec )
+        if git_url is None:
+            # The git urls were all tried above, so go straight to svn
+            ( repo, release ) = find_svn_release( packagePath, packageVersion, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess )
+            if verbose and release is None:
+                print("find_release: Could not find packageSpec: %s" % packageSpec)
+            releases.append( release )
+            continue
+        repo = gitRepo.gitRepo( git_url, None, os.path.split(packagePath)[1], git_tag )
+        releases.append( Releaser( repo, packagePath, None, git_tag, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess ) )
+    # Look up the CRAM release dirs for InstallPackage() in one pass
+    getCramReleaseDirs( [ git_release for git_release in gitReleases if git_release[0] is not None ] )
+    return releases
+
 class Releaser(object):
     '''class Releaser( repo, package )
     repo must be a repo object that knows the URL, branch, tag, etc needed to checkout
@@ -92,7 +187,7 @@ class Releaser(object):
     These were grandfathered in as part of refactoring a prior version and may be
     more appropriately made into function parameters or in some cases may not be needed at all.
     '''
-    def __init__( self, repo, packagePath, installDir=None, branch=None, noTag=False, debug=False, verbose=False, keepTmp=False, message=None, dryRun=False, quiet=False, batch=False ):
+    def __init__( self, repo, packagePath, installDir=None, branch=None, noTag=False, debug=False, verbose=False, keepTmp=False, message=None, dryRun=False, quiet=False, batch=False, minimizeRepoAccess=False, buildExecutor=None, artifactCache=None ):
         self._installDir= installDir
         self._repo		= repo
         self._branch	= branch
@@ -110,6 +205,11 @@ class Releaser(object):
         self._message	= message
         self._keepTmp	= keepTmp
         self._noTag		= noTag
+        self._minimizeRepoAccess = minimizeRepoAccess
+        # Build steps may run remotely, other commands always run locally
+        self._buildExecutor	= buildExecutor if buildExecutor else getDefaultBuildExecutor( verbose=verbose )
+        self._localExecutor	= LocalExecutor( maxJobs=os.cpu_count() or 1, debug=debug )
+        self._artifactCache	= artifactCache if artifactCache else getDefaultArtifactCache( verbose=verbose )
         self._installDir= None
         self._ReleasePath= None
         self._CookieJarPath= None
@@ -161,7 +261,10 @@ class Releaser(object):
                 if os.path.exists(self._tmpDir):
                     if self._verbose:
                         print("Removing temporary dir %s ..." % self._tmpDir)
-                    shutil.rmtree( self._tmpDir )
+                    if DEF_ECO_BACKGROUND_REMOVE:
+                        trashTree( self._tmpDir, verbose=self._verbose )
+                    else:
+                        removeTree( self._tmpDir, verbose=self._verbose )
             except:
                 print("failed:\n%s." % (sys.exc_info()[1]))
                 print("\nCould not remove the following directories, remove them manually:")
@@ -176,41 +279,38 @@ class Releaser(object):
     def TagRelease( self, message=None ):
         return self._repo.TagRelease( packagePath=self._packagePath, branch=self._branch, message=message )
 
-    def execute( self, cmd, outputPipe = subprocess.PIPE ):
+    def execute( self, cmd, outputPipe = subprocess.PIPE, buildStep=False ):
+        '''
+        Run the bash cmd and return its output if outputPipe is subprocess.PIPE.
+        Build steps are run by our build executor, which may dispatch them to a build host.
+        Raises RuntimeError on failure.
+        '''
         if self._verbose or self._dryRun:
             print("%s: %s" % ( ("--dryRun--" if self._dryRun else "EXEC"), cmd ))
         if self._dryRun:
             return "--dryRun--"
-        proc = subprocess.Popen( cmd, shell = True, executable = "/bin/bash",
-                                stdout = outputPipe, stderr = outputPipe )
-        (proc_stdout, proc_stderr) = proc.communicate( )
-        if self._debug:
-            print("process returned", proc.returncode)
-        if proc.returncode != 0:
-            errMsg = "Command Failed: %s\n" % ( cmd )
-            if proc_stdout:
-                errMsg += proc_stdout
-            if proc_stderr:
-                errMsg += proc_stderr
-            errMsg += "Return Code: %d\n" % ( proc.returncode )
-            raise RuntimeError(errMsg)
-        return proc_stdout
-
-    def RemoveBuild( self, buildDir ):
+        if buildStep:
+            return self._buildExecutor.execute( cmd, outputPipe )
+        return self._localExecutor.execute( cmd, outputPipe )
+
+    def RemoveBuild( self, buildDir, background=False ):
+        '''
+        Remove buildDir, making its directories writable as needed.
+        If background is True, buildDir is renamed out of the way and removed
+        by a background process that keeps going after we exit.
+        '''
+        if background:
+            if self._verbose:
+                print("\nRemoving build dir in the background: %s ..." % ( buildDir ))
+            trashTree( buildDir, verbose=self._verbose )
+            return
         print("\nRemoving build dir: %s ..." % ( buildDir ))
-        buildRemoved = False
         try:
-            shutil.rmtree( buildDir )
-            buildRemoved = True
-        except:
-            pass
-
-        if not buildRemoved:
-            if makeDirsWritable( buildDir ) == 0:
-                shutil.rmtree( buildDir )
-                buildRemoved = True
-        if buildRemoved:
-            print("Successfully removed build dir: %s ..." % ( buildDir ))
+            removeTree( buildDir, verbose=self._verbose )
+        except OSError as e:
+            print("Unable to remove build dir: %s" % ( e ))
+            return
+        print("Successfully removed build dir: %s ..." % ( buildDir ))
 
     # TODO: Move this to a standalone function usable
     # by any class
@@ -221,7 +321,7 @@ class Releaser(object):
         sys.stdout.flush()
         userId  = os.geteuid()
         groupId = -1
-        groups  = subprocess.check_output( [ "id" ] )
+        groups  = cmd_check_output( [ "id" ] )
         if self._grpOwner is not None:
             if re.search( groups, self._grpOwner ):
                 groupId = grp.getgrname(self._grpOwner).gr_gid 
@@ -258,52 +358,147 @@ class Releaser(object):
                     if groupId >= 0 and groupId != pathStatus.st_gid:
                         os.lchown( filePath, -1, groupId )
 
-    def getCookieJarPath( self ):
-        if self._CookieJarPath:
-            return self._CookieJarPath 
-        # TODO: Derive _EpicsHostArch from the module's RELEASE_SITE file instead of env
-        if os.path.isdir( os.path.join( self._ReleasePath, "build" ) ):
-            return os.path.join( self._ReleasePath, "O." + self._EpicsHostArch )
-        else:
-            return os.path.join( self._ReleasePath, "configure", "O." + self._EpicsHostArch )
-
-    def update_built_cookie( self ):
-        cookieJarPath = self.getCookieJarPath()
+    def getCookieJarPath( self, arch=None ):
+        '''Returns the cookie jar directory for arch, which defaults to the host arch'''
+        if arch is None or arch == self._EpicsHostArch:
+            if self._CookieJarPath:
+                return self._CookieJarPath 
+            # TODO: Derive _EpicsHostArch from the module's RELEASE_SITE file instead of env
+            arch = self._EpicsHostArch
+        return getCookieJarPath( self._ReleasePath, arch )
+
+    def update_built_cookie( self, arch=None ):
+        cookieJarPath = self.getCookieJarPath( arch )
         if not os.path.isdir( cookieJarPath ):
             os.makedirs( cookieJarPath, 0o775 )
-        self.execute( "touch %s" % self.built_cookie_path() )
-        self._CookieJarPath = cookieJarPath
+        self.execute( "touch %s" % self.built_cookie_path( arch ) )
+        if arch is None or arch == self._EpicsHostArch:
+            self._CookieJarPath = cookieJarPath
 
-    def remove_built_cookie( self ):
-        if not os.path.isfile( self.built_cookie_path() ):
+    def remove_built_cookie( self, arch=None ):
+        if not os.path.isfile( self.built_cookie_path( arch ) ):
             return
-        cookieJarPath = self.getCookieJarPath()
+        cookieJarPath = self.getCookieJarPath( arch )
         pathStatus = os.stat( cookieJarPath )
         if not (pathStatus.st_mode & stat.S_IWGRP):
             os.chmod( cookieJarPath, pathStatus.st_mode | (stat.S_IWUSR | stat.S_IWGRP) )
-        self.execute("/bin/rm -f %s" % ( self.built_cookie_path() ))
+        self.execute("/bin/rm -f %s" % ( self.built_cookie_path( arch ) ))
 
-    def built_cookie_path( self ):
-        cookieJarPath = self.getCookieJarPath()
+    def built_cookie_path( self, arch=None ):
+        cookieJarPath = self.getCookieJarPath( arch )
         return os.path.join( cookieJarPath, ".is_built" )
 
+    def build_log_path( self, arch=None ):
+        cookieJarPath = self.getCookieJarPath( arch )
+        return os.path.join( cookieJarPath, "build.log" )
+
+    def getArtifactKeys( self, buildDir, archs ):
+        '''
+        Returns a dict of arch -> ( key, keyInputs ) for each of archs whose build outputs can be cached.
+        Only cross arches are cached, see ArtifactCache.py
+        '''
+        artifactKeys = {}
+        if self._artifactCache is None or self._dryRun:
+            return artifactKeys
+        for arch in archs:
+            if arch == self._EpicsHostArch:
+                continue
+            keyInputs = getArtifactKeyInputs( buildDir, arch, debug=self._debug )
+            if keyInputs is None:
+                if self._verbose:
+                    print("BuildRelease %s: Build outputs can't be cached" % ( buildDir ))
+                break
+            artifactKeys[arch] = ( getArtifactKey( keyInputs ), keyInputs )
+        return artifactKeys
+
+    def restoreArtifacts( self, buildDir, arch, artifactKeys ):
+        '''Returns True if the build outputs for arch were restored from the artifact cache'''
+        if not artifactKeys or arch not in artifactKeys:
+            return False
+        if not self._artifactCache.restore( artifactKeys[arch][0], buildDir ):
+            return False
+        print("Restored %s in %s from the artifact cache" % ( arch, buildDir ))
+        return True
+
+    def storeArtifacts( self, buildDir, arch, artifactKeys ):
+        '''Save the build outputs for arch in the artifact cache'''
+        if not artifactKeys or arch not in artifactKeys:
+            return
+        ( key, keyInputs ) = artifactKeys[arch]
+        self._artifactCache.store( key, buildDir, getArtifactPaths( buildDir, arch ), keyInputs )
+
+    def buildArch( self, buildDir, arch, artifactKeys=None ):
+        '''
+        Build just the specified arch in buildDir, logging the make output to build_log_path( arch ).
+        Adding arch to CROSS_COMPILER_TARGET_ARCHS makes sure make has a target for it.
+        Updates the built cookie for arch and saves its outputs in the artifact cache on success.
+        Raises RuntimeError on failure.
+        '''
+        print("Building %s in %s ..." % ( arch, buildDir ))
+        sys.stdout.flush()
+        cookieJarPath = self.getCookieJarPath( arch )
+        if not os.path.isdir( cookieJarPath ) and not self._dryRun:
+            os.makedirs( cookieJarPath, 0o775 )
+        cmd = "make -C %s" % buildDir
+        if arch != self._EpicsHostArch:
+            cmd += " CROSS_COMPILER_TARGET_ARCHS=%s" % arch
+        cmd += " %s" % arch
+        with traceSpan( 'buildArch', release=buildDir, arch=arch ):
+            if self._dryRun:
+                self.execute( cmd )
+            else:
+                with open( self.build_log_path( arch ), 'w' ) as buildLog:
+                    try:
+                        self.execute( cmd, buildLog, buildStep=True )
+                    except RuntimeError:
+                        raise RuntimeError( "Build of %s FAILED, see %s" % ( arch, self.build_log_path( arch ) ) )
+        self.update_built_cookie( arch )
+        self.storeArtifacts( buildDir, arch, artifactKeys )
+        print("Built %s in %s" % ( arch, buildDir ))
+
+    def buildCrossArchs( self, buildDir, crossArchs, artifactKeys=None ):
+        '''
+        Build each cross arch concurrently.
+        Returns a dict of error messages for the arches that failed.
+        '''
+        failedArchs = {}
+        if len(crossArchs) == 0:
+            return failedArchs
+        with concurrent.futures.ThreadPoolExecutor( max_workers=len(crossArchs) ) as executor:
+            futures = {}
+            for arch in crossArchs:
+                futures[ executor.submit( self.buildArch, buildDir, arch, artifactKeys ) ] = arch
+            for future in concurrent.futures.as_completed( futures ):
+                try:
+                    future.result()
+                except ( RuntimeError, OSError ) as e:
+                    failedArchs[ futures[future] ] = str(e)
+        return failedArchs
+
     def hasBuilt( self ):
         '''Returns True if module has built for any architecture.'''
         hasBuilt = False
         try:
-            findOutput = subprocess.check_output( [ "find", self._ReleasePath, "-name", ".is_built" ] ).splitlines()
+            findOutput = cmd_check_output( [ "find", self._ReleasePath, "-name", ".is_built" ] ).splitlines()
             if len(findOutput) > 0:
                 hasBuilt = True
         except:
             pass
         return hasBuilt
 
-    def BuildRelease( self, buildDir, force=False, rmFailed=False, verbose=False, outputPipe = subprocess.PIPE ):
+    def BuildRelease( self, buildDir, force=False, rmFailed=False, verbose=False, outputPipe = subprocess.PIPE, targetArchs=None ):
+        '''
+        Checkout and build the release in buildDir, building any dependents first.
+        If targetArchs is a list of EPICS target arches, the host arch is built first,
+        then the other arches are built concurrently, each w/ its own built cookie and
+        build log.  An arch that fails doesn't stop the others.
+        '''
         status = 0
         if not buildDir:
             raise BuildError("Build dir not defined!")
         if self._verbose:
             print("BuildRelease: Checking for buildDir %s" % buildDir)
+        stagingDir = None
         if os.path.exists( buildDir ):
             buildDirExists = True
         else:
@@ -312,35 +507,55 @@ class Releaser(object):
                 if self._dryRun:
                     print("os.makedirs %s drwxrwxr-x" % buildDir)
                 else:
-                    os.makedirs( buildDir, 0o775 )
+                    # Check out a new release in a staging dir and rename it to buildDir when complete
+                    # so a partial checkout is never left in buildDir.
+                    stagingDir = getReleaseStagingPath( buildDir )
+                    if os.path.exists( stagingDir ):
+                        self.RemoveBuild( stagingDir, background=DEF_ECO_BACKGROUND_REMOVE )
+                    os.makedirs( stagingDir, 0o775 )
             except OSError:
                 raise BuildError("Cannot create build dir: %s" % ( buildDir ))
 
         if	self._ReleasePath != buildDir:
             self._ReleasePath =  buildDir
 
-        if self._verbose:
-            print("BuildRelease: Checking built cookie %s" % ( self.built_cookie_path() ))
-        if os.path.isfile( self.built_cookie_path() ):
-            if force:
-                self.remove_built_cookie()
-            else:
-                #if self._verbose:
-                print("BuildRelease %s: Already built!" % ( buildDir ))
+        if targetArchs:
+            buildArchs = []
+            for arch in targetArchs:
+                if self._verbose:
+                    print("BuildRelease: Checking built cookie %s" % ( self.built_cookie_path( arch ) ))
+                if force:
+                    self.remove_built_cookie( arch )
+                if not os.path.isfile( self.built_cookie_path( arch ) ) and arch not in buildArchs:
+                    buildArchs.append( arch )
+            if len(buildArchs) == 0:
+                print("BuildRelease %s: Already built for %s!" % ( buildDir, ' '.join(targetArchs) ))
                 return status
+        else:
+            if self._verbose:
+                print("BuildRelease: Checking built cookie %s" % ( self.built_cookie_path() ))
+            if os.path.isfile( self.built_cookie_path() ):
+                if force:
+                    self.remove_built_cookie()
+                else:
+                    #if self._verbose:
+                    print("BuildRelease %s: Already built!" % ( buildDir ))
+                    return status
 
-        # TODO: Add a --minimizeRepoAccess option that suppresses all but one git request if possible
         print("\nBuildRelease: %s ..." % ( buildDir ))
         sys.stdout.flush()
         sys.stderr.flush()
         try:
             # Checkout release to build dir
-            self._repo.CheckoutRelease( buildDir, verbose=self._verbose, dryRun=self._dryRun )
-        except RuntimeError as e:
-            print(e)
-            raise BuildError("BuildRelease %s: Checkout FAILED" % buildDir)
-        except gitRepo.gitError as e:
+            with traceSpan( 'checkout', release=buildDir ):
+                self._repo.CheckoutRelease( stagingDir if stagingDir else buildDir, verbose=self._verbose, dryRun=self._dryRun,
+                                            minimizeRepoAccess=self._minimizeRepoAccess )
+            if stagingDir:
+                os.rename( stagingDir, buildDir )
+        except ( RuntimeError, OSError, gitRepo.gitError ) as e:
             print(e)
+            if stagingDir and os.path.exists( stagingDir ):
+                self.RemoveBuild( stagingDir, background=DEF_ECO_BACKGROUND_REMOVE )
             raise BuildError("BuildRelease %s: Checkout FAILED" % buildDir)
 
         # See if it's built for any architecture
@@ -352,72 +567,105 @@ class Releaser(object):
             outputPipe = subprocess.PIPE
         try:
             # Check Dependendents
-            print("\nChecking dependents for %s ..." % ( buildDir ))
-            buildDep = getEpicsPkgDependents( buildDir )
-            if 'base' in buildDep:
-                # Find the EPICS base version for this release
-                epics_base_ver = buildDep['base']
-
-                # Find EPICS_MODULE_TOP for this release
-                # Note: Do not use determine_epics_modules_top() here as it gets base from env
-                epics_site_top = determine_epics_site_top()
-                if VersionToRelNumber(epics_base_ver) > 3.1412:
-                    epics_modules_top = os.path.join( epics_site_top, epics_base_ver, 'modules'	)
-                else:
-                    epics_modules_top = os.path.join( epics_site_top, 'modules', 'R3-14-12' )
-                if not os.path.isdir( epics_modules_top ):
-                    epics_modules_top = os.path.join( epics_site_top, 'modules' )
-
-                # Check each dependent module release and build if needed
-                for dep in buildDep:
-                    if dep == 'base':
-                        continue	# Just check module dependents
-                    package = "%s/%s" % ( dep, buildDep[dep] )
-                    if verbose:
-                        print("BuildRelease: Checking dep: package=%s" % ( package ))
-                    release = find_release( package, verbose=self._verbose )
-                    if release is not None:
-                        result = release.InstallPackage( epics_modules_top )
-                        if result != 0:
-                            status = result
+            with traceSpan( 'dependents', release=buildDir ):
+                print("\nChecking dependents for %s ..." % ( buildDir ))
+                buildDep = getEpicsPkgDependents( buildDir )
+                if 'base' in buildDep:
+                    # Find the EPICS base version for this release
+                    epics_base_ver = buildDep['base']
+
+                    # Find EPICS_MODULE_TOP for this release
+                    # Note: Do not use determine_epics_modules_top() here as it gets base from env
+                    epics_site_top = determine_epics_site_top()
+                    if VersionToRelNumber(epics_base_ver) > 3.1412:
+                        epics_modules_top = os.path.join( epics_site_top, epics_base_ver, 'modules'	)
+                    else:
+                        epics_modules_top = os.path.join( epics_site_top, 'modules', 'R3-14-12' )
+                    if not os.path.isdir( epics_modules_top ):
+                        epics_modules_top = os.path.join( epics_site_top, 'modules' )
+
+                    # Check each dependent module release and build if needed
+                    for dep in buildDep:
+                        if dep == 'base':
+                            continue	# Just check module dependents
+                        package = "%s/%s" % ( dep, buildDep[dep] )
+                        if verbose:
+                            print("BuildRelease: Checking dep: package=%s" % ( package ))
+                        if self._minimizeRepoAccess:
+                            # No need to find the repo if it's already built
+                            depReleasePath = os.path.join( epics_modules_top, dep, buildDep[dep] )
+                            depArchs = targetArchs if targetArchs else [ self._EpicsHostArch ]
+                            if all( isReleaseBuilt( depReleasePath, arch ) for arch in depArchs ):
+                                print("BuildRelease %s: Already built!" % ( depReleasePath ))
+                                continue
+                        release = find_release( package, verbose=self._verbose, minimizeRepoAccess=self._minimizeRepoAccess )
+                        if release is not None:
+                            result = release.InstallPackage( epics_modules_top, targetArchs=targetArchs )
+                            if result != 0:
+                                status = result
 
             print("\nBuilding Release in %s ..." % ( buildDir ))
             sys.stdout.flush()
             sys.stderr.flush()
-            if		os.path.isfile( os.path.join( buildDir, 'makefile' )) \
-                or	os.path.isfile( os.path.join( buildDir, 'Makefile' )) \
-                or	'modules' in buildDir:
-                buildOutput = self.execute( "make -C %s" % buildDir, outputPipe )
-
-            # Build succeeded!   Update the built_cookie
-            self.update_built_cookie()
-            if self._verbose:
+            with traceSpan( 'build', release=buildDir ):
+                hasMakefile = ( os.path.isfile( os.path.join( buildDir, 'makefile' ))
+                            or	os.path.isfile( os.path.join( buildDir, 'Makefile' ))
+                            or	'modules' in buildDir )
+                failedArchs = {}
+                artifactKeys = {}
+                if targetArchs:
+                    # Host tools are needed by the cross builds, so build the host first
+                    if self._EpicsHostArch in buildArchs:
+                        if hasMakefile:
+                            self.buildArch( buildDir, self._EpicsHostArch )
+                        else:
+                            self.update_built_cookie( self._EpicsHostArch )
+                    crossArchs = [ arch for arch in buildArchs if arch != self._EpicsHostArch ]
+                    if hasMakefile:
+                        # Restore any cross arches built before w/ the same inputs
+                        artifactKeys = self.getArtifactKeys( buildDir, crossArchs )
+                        for arch in list( crossArchs ):
+                            if self.restoreArtifacts( buildDir, arch, artifactKeys ):
+                                self.update_built_cookie( arch )
+                                crossArchs.remove( arch )
+                    if hasMakefile:
+                        failedArchs = self.buildCrossArchs( buildDir, crossArchs, artifactKeys )
+                    else:
+                        for arch in crossArchs:
+                            self.update_built_cookie( arch )
+                else:
+                    if hasMakefile:
+                        # A full make installs more than per arch outputs, so it isn't cached
+                        buildOutput = self.execute( "make -C %s" % buildDir, outputPipe, buildStep=True )
+
+                    # Build succeeded!   Update the built_cookie
+                    self.update_built_cookie()
+            if len(failedArchs) > 0:
+                status = -1
+                for arch in sorted( failedArchs ):
+                    print("BuildRelease %s: %s" % ( buildDir, failedArchs[arch] ))
+            elif self._verbose:
                 print("BuildRelease %s: SUCCESS" % ( buildDir ))
         except RuntimeError as e:
             print(e)
             if hasBuilt == False and not buildDirExists:
-                cmdList = [ "rm", "-rf",    buildDir + "-FAILED" ]
-                subprocess.call( cmdList )
+                if os.path.exists( buildDir + "-FAILED" ):
+                    self.RemoveBuild( buildDir + "-FAILED", background=DEF_ECO_BACKGROUND_REMOVE )
                 if rmFailed:
-                    cmdList = [ "rm", "-rf",    buildDir ]
+                    self.RemoveBuild( buildDir, background=DEF_ECO_BACKGROUND_REMOVE )
                 else:
-                    cmdList = [ "mv", buildDir, buildDir + "-FAILED" ]
+                    os.rename( buildDir, buildDir + "-FAILED" )
                     buildDir += "-FAILED"
-                subprocess.call( cmdList )
             raise BuildError("BuildRelease FAILED in %s" % ( buildDir ))
 
         sys.stdout.flush()
         sys.stderr.flush()
-        self.fixPermissions( buildDir )
+        with traceSpan( 'fixPermissions', release=buildDir ):
+            self.fixPermissions( buildDir )
 
-        try:
-            if os.path.isdir( buildDir + "-FAILED" ):
-                # rm any stale -FAILED on success
-                cmdList = [ "rm", "-rf",    buildDir + "-FAILED" ]
-                subprocess.call( cmdList )
-        except RuntimeError as e:
-            print(e)
-            pass
+        if os.path.isdir( buildDir + "-FAILED" ):
+            # rm any stale -FAILED on success
+            self.RemoveBuild( buildDir + "-FAILED", background=DEF_ECO_BACKGROUND_REMOVE )
         return status
 
     def DoTestBuild( self ):
@@ -436,9 +684,10 @@ class Releaser(object):
             pass
         return status
 
-    def InstallPackage( self, installTop=None, force=False, rmFailed=False ):
+    def InstallPackage( self, installTop=None, force=False, rmFailed=False, targetArchs=None ):
         '''Use InstallPackage to automatically determine the buildDir from installTop and the repo specs.
-        If you already know where to build you can just call BuildRelease() directly.'''
+        If you already know where to build you can just call BuildRelease() directly.
+        targetArchs is an optional list of EPICS target arches to build, see BuildRelease()'''
         if self._verbose:
             self._repo.ShowRepo( titleLine="InstallPackage: " + self._packageName, prefix="	" )
             print(self)
@@ -504,10 +753,7 @@ class Releaser(object):
                 print("InstallPackage Error: Invalid installTop:", installTop)
                 return -1
             # Canonicalize installTop
-            cmdList = [ "readlink", "-e", installTop ]
-            cmdOutput = subprocess.check_output( cmdList ).splitlines()
-            if len(cmdOutput) == 1:
-                installTop = cmdOutput[0]
+            installTop = os.path.realpath( installTop )
 
             if installTop.endswith( '/' + self._packageName ):
                 self._installDir = os.path.join( installTop, self._repo.GetTag() )
@@ -520,7 +766,11 @@ class Releaser(object):
             self._grpOwner = DEF_PCDS_GROUP_OWNER
 
         try:
-            result = self.BuildRelease( self._installDir, force=force, rmFailed=rmFailed, verbose=self._verbose )
+            # Only one process at a time can build a release.  Others wait, then
+            # find it already built or finish what's left, ex. an arch that failed.
+            with traceSpan( 'InstallPackage', release=self._installDir ), \
+                 ReleaseLock( self._installDir, verbose=self._verbose, dryRun=self._dryRun ):
+                result = self.BuildRelease( self._installDir, force=force, rmFailed=rmFailed, verbose=self._verbose, targetArchs=targetArchs )
             if result != 0:
                 status = result
             if self._verbose:
@@ -0,0 +1,307 @@
+'''
+Persisted inventory of the EPICS releases under a site top, for epics-query.
+
+Each release dir is saved w/ its package, version, base version, and the
+versions of the packages it depends on from its configure/RELEASE.
+Releases are found by walking the site top down to DEF_ECO_INVENTORY_DEPTH
+levels, w/o descending into the release dirs themselves.
+
+Each walked directory is saved w/ its mtime and each release w/ the
+signature of its configure/RELEASE, so a refresh only has to stat them
+and re-read the ones that changed.
+
+Templated IOC releases, which have a build dir and a .cfg file per IOC
+instance, are saved w/ the parent release and mtime of each .cfg file.
+A refresh only re-reads the .cfg files that changed.
+
+In memory, the inventory is indexed by package name and by dependency,
+so the releases that use a package, directly or via other releases,
+can be found w/o looking at every release.  A templated IOC release
+counts as depending on the parent release of each of its IOCs.'''
+
+import os
+import json
+import time
+import hashlib
+from repo_defaults import *
+from version_utils import *
+
+class SiteInventory( object ):
+    '''
+    SiteInventory( siteTop )
+    Releases are keyed by their path relative to siteTop.  Each one has
+        package:    ex. modules/asyn, ioc/common/gigECam, base
+        name:       last part of package, ex. asyn
+        version:    ex. R4.39-1.0.0
+        base:       EPICS base version, or None if unknown
+        depends:    dict of package name -> version, w/o base
+        signature:  configure/RELEASE signature when it was read
+    Templated IOC releases also have
+        iocs:       dict of ioc name -> { 'parent': parentRelease, 'cfg': cfgFileName, 'mtime': cfgMtime }
+        dirMtime:   mtime of the release dir when its .cfg files were listed
+    '''
+    inventoryVersion = 2
+
+    def __init__( self, siteTop, inventoryPath=None, verbose=False ):
+        self._siteTop       = os.path.abspath( siteTop )
+        self._inventoryPath = inventoryPath
+        self._verbose       = verbose
+        self._dirs          = {}    # relDir -> mtime_ns
+        self._releases      = {}    # relPath -> release dict
+        self._updated       = 0
+        self._byName        = {}    # name -> set of relPath
+        self._dependents    = {}    # ( name, version ) -> set of relPath that depend on it
+        self._iocsByParent  = {}    # parent relPath or path -> list of ( relPath, iocName )
+        if self._inventoryPath is None:
+            topHash = hashlib.md5( self._siteTop.encode() ).hexdigest()[:12]
+            self._inventoryPath = os.path.join( DEF_ECO_CACHE_DIR, 'siteInventory-%s.json' % topHash )
+        self.load()
+
+    def load( self ):
+        '''Load the persisted inventory if it matches our site top.'''
+        try:
+            with open( self._inventoryPath, 'r' ) as f:
+                inventory = json.load( f )
+        except ( IOError, OSError, ValueError ):
+            return
+        if inventory.get( 'version' ) != SiteInventory.inventoryVersion or inventory.get( 'siteTop' ) != self._siteTop:
+            return
+        self._dirs      = inventory['dirs']
+        self._releases  = inventory['releases']
+        self._updated   = inventory['updated']
+        self._buildIndexes()
+
+    def save( self ):
+        '''Persist the inventory.  Failures are not fatal, the inventory just stays in memory.'''
+        inventory = { 'version': SiteInventory.inventoryVersion, 'siteTop': self._siteTop,
+                      'updated': self._updated, 'dirs': self._dirs, 'releases': self._releases }
+        tmpPath = '%s.%d' % ( self._inventoryPath, os.getpid() )
+        try:
+            if not os.path.isdir( os.path.dirname( self._inventoryPath ) ):
+                os.makedirs( os.path.dirname( self._inventoryPath ), 0o775 )
+            with open( tmpPath, 'w' ) as f:
+                json.dump( inventory, f )
+            os.replace( tmpPath, self._inventoryPath )
+        except ( IOError, OSError ) as e:
+            if self._verbose:
+                print("SiteInventory: Unable to save %s: %s" % ( self._inventoryPath, e ))
+
+    def isStale( self, maxAge=DEF_ECO_INVENTORY_MAX_AGE ):
+        return time.time() - self._updated > maxAge
+
+    def refresh( self ):
+        '''Rescan the directories that were changed or added and re-read any changed releases.'''
+        if not os.path.isdir( self._siteTop ):
+            return
+        changed = False
+        if '' not in self._dirs:
+            self._dirs      = {}
+            self._releases  = {}
+        for relDir in sorted( self._dirs ):
+            if relDir not in self._dirs:
+                # Parent was removed
+                continue
+            try:
+                mtime = os.stat( os.path.join( self._siteTop, relDir ) ).st_mtime_ns
+            except OSError:
+                self._removeDir( relDir )
+                changed = True
+                continue
+            if mtime != self._dirs[relDir]:
+                self._scanDir( relDir )
+                changed = True
+        if '' not in self._dirs:
+            self._scanDir( '' )
+            changed = True
+        for relPath in list( self._releases ):
+            release = self._releases.get( relPath )
+            if release is None:
+                continue
+            signature = self._releaseSignature( relPath )
+            if signature is None:
+                del self._releases[relPath]
+                changed = True
+            elif signature != release['signature']:
+                self._readRelease( relPath )
+                changed = True
+            elif 'iocs' in release and self._refreshIocConfigs( relPath ):
+                changed = True
+        self._updated = time.time()
+        if changed:
+            self._buildIndexes()
+            if self._verbose:
+                print("SiteInventory: Updated inventory of %d releases under %s" % ( len(self._releases), self._siteTop ))
+        self.save()
+
+    def _releaseSignature( self, relPath ):
+        '''Returns the signature of the release's configure/RELEASE or build dir as a list, or None'''
+        releaseDir = os.path.join( self._siteTop, relPath )
+        signature = fileSignature( os.path.join( releaseDir, 'configure', 'RELEASE' ) )
+        if signature is None:
+            signature = fileSignature( os.path.join( releaseDir, 'build' ) )
+        return list( signature ) if signature is not None else None
+
+    def _removeDir( self, relDir ):
+        prefix = relDir + '/' if relDir else ''
+        for d in [ d for d in self._dirs if d == relDir or d.startswith( prefix ) ]:
+            del self._dirs[d]
+        for r in [ r for r in self._releases if r.startswith( prefix ) ]:
+            del self._releases[r]
+
+    def _scanDir( self, relDir ):
+        '''List relDir, adding the releases in it and scanning any new subdirs.'''
+        dirPath = os.path.join( self._siteTop, relDir )
+        try:
+            self._dirs[relDir] = os.stat( dirPath ).st_mtime_ns
+            entries = [ e for e in os.scandir( dirPath ) if e.is_dir() and not e.name.startswith( '.' ) ]
+        except OSError:
+            self._removeDir( relDir )
+            return
+        names = set( [ e.name for e in entries ] )
+        prefix = relDir + '/' if relDir else ''
+        # Forget subdirs and releases that are gone
+        for d in [ d for d in self._dirs if d.startswith( prefix ) and d != relDir and d[len(prefix):].split('/')[0] not in names ]:
+            del self._dirs[d]
+        for r in [ r for r in self._releases if r.startswith( prefix ) and r[len(prefix):].split('/')[0] not in names ]:
+            del self._releases[r]
+        depth = len( relDir.split( '/' ) ) if relDir else 0
+        for entry in entries:
+            relPath = prefix + entry.name
+            if isReleaseCandidate( entry.name ) and self._releaseSignature( relPath ) is not None:
+                if relPath not in self._releases:
+                    self._readRelease( relPath )
+            elif depth + 1 < DEF_ECO_INVENTORY_DEPTH and relPath not in self._dirs \
+                 and entry.name not in [ 'CVS', 'O.Common', 'configure', 'build' ] and not entry.name.startswith( 'O.' ):
+                self._scanDir( relPath )
+
+    def getPackage( self, relPath ):
+        '''Returns the package for a release path, ex. modules/asyn for R7.0.3.1-2.0/modules/asyn/R4.39-1.0.0'''
+        package = os.path.dirname( relPath )
+        parts = package.split( '/' )
+        # Drop the base version dir in front of modules
+        if len(parts) > 2 and parts[1] == 'modules' and isReleaseCandidate( parts[0] ):
+            package = '/'.join( parts[1:] )
+        return package
+
+    def _readRelease( self, relPath ):
+        releaseDir = os.path.join( self._siteTop, relPath )
+        package = self.getPackage( relPath )
+        depends = getEpicsPkgDependents( releaseDir )
+        base = depends.pop( 'base', None )
+        if package == 'base':
+            base = os.path.basename( relPath )
+        self._releases[relPath] = { 'package': package, 'name': os.path.basename( package ),
+                                    'version': os.path.basename( relPath ), 'base': base,
+                                    'depends': depends, 'signature': self._releaseSignature( relPath ) }
+        if os.path.isdir( os.path.join( releaseDir, 'build' ) ):
+            self._releases[relPath]['iocs'] = {}
+            self._refreshIocConfigs( relPath )
+
+    def _refreshIocConfigs( self, relPath ):
+        '''Re-read the .cfg files of a templated IOC release that were added or changed.  Returns True if any were.'''
+        releaseDir = os.path.join( self._siteTop, relPath )
+        release = self._releases[relPath]
+        iocs = release['iocs']
+        changed = False
+        try:
+            dirMtime = os.stat( releaseDir ).st_mtime_ns
+            if dirMtime != release.get( 'dirMtime' ):
+                # .cfg files were added or removed
+                release['dirMtime'] = dirMtime
+                cfgNames = [ f for f in os.listdir( releaseDir ) if f.endswith( '.cfg' ) ]
+                for iocName in [ i for i in iocs if iocs[i]['cfg'] not in cfgNames ]:
+                    del iocs[iocName]
+                for cfgName in cfgNames:
+                    if cfgName[:-4] not in iocs:
+                        iocs[cfgName[:-4]] = { 'cfg': cfgName, 'mtime': None, 'parent': None }
+                changed = True
+        except OSError:
+            return False
+        for ( iocName, ioc ) in list( iocs.items() ):
+            cfgPath = os.path.join( releaseDir, ioc['cfg'] )
+            try:
+                mtime = os.stat( cfgPath ).st_mtime_ns
+            except OSError:
+                del iocs[iocName]
+                changed = True
+                continue
+            if mtime != ioc['mtime']:
+                ioc['mtime']  = mtime
+                ioc['parent'] = getIocConfigParent( cfgPath )
+                changed = True
+        return changed
+
+    def getParentKey( self, parentRelease ):
+        '''Returns parentRelease relative to the site top if it's under it, else the normalized path'''
+        parentRelease = os.path.normpath( parentRelease )
+        if parentRelease.startswith( self._siteTop + '/' ):
+            return parentRelease[ len(self._siteTop) + 1: ]
+        return parentRelease
+
+    def _buildIndexes( self ):
+        self._byName        = {}
+        self._dependents    = {}
+        self._iocsByParent  = {}
+        for ( relPath, release ) in self._releases.items():
+            self._byName.setdefault( release['name'], set() ).add( relPath )
+            for ( depName, depVersion ) in release['depends'].items():
+                self._dependents.setdefault( ( depName, depVersion ), set() ).add( relPath )
+            for ( iocName, ioc ) in release.get( 'iocs', {} ).items():
+                if not ioc['parent']:
+                    continue
+                parentKey = self.getParentKey( ioc['parent'] )
+                self._iocsByParent.setdefault( parentKey, [] ).append( ( relPath, iocName ) )
+                parentName = os.path.basename( self.getPackage( parentKey ) )
+                self._dependents.setdefault( ( parentName, os.path.basename( parentKey ) ), set() ).add( relPath )
+
+    def getSiteTop( self ):
+        return self._siteTop
+
+    def getReleases( self ):
+        '''Returns the dict of relPath -> release'''
+        return self._releases
+
+    def getReleasesByName( self, name ):
+        '''Returns the set of relPaths for releases of the named package'''
+        return self._byName.get( name, set() )
+
+    def getIocInstances( self, parentSpec ):
+        '''
+        Returns a sorted list of ( relPath, iocName, cfgPath ) for the templated IOC instances
+        whose parent release matches parentSpec.  parentSpec can be the full path of the
+        parent release or any trailing part of it, ex. ioc/common/gigECam/R1.20.5 or gigECam/R1.20.5
+        '''
+        parentSpec = self.getParentKey( parentSpec ).strip( '/' )
+        instances = []
+        for ( parentKey, iocs ) in self._iocsByParent.items():
+            if parentKey == parentSpec or parentKey.endswith( '/' + parentSpec ):
+                for ( relPath, iocName ) in iocs:
+                    cfgPath = os.path.join( self._siteTop, relPath, self._releases[relPath]['iocs'][iocName]['cfg'] )
+                    instances.append( ( relPath, iocName, cfgPath ) )
+        return sorted( instances )
+
+    def getDependencyVersions( self, depName ):
+        '''Returns the list of versions of depName that any release depends on'''
+        return [ depVersion for ( name, depVersion ) in self._dependents if name == depName ]
+
+    def getDependents( self, depName, depVersions, transitive=False ):
+        '''
+        Returns the set of relPaths for releases that depend on any of depVersions of depName.
+        If transitive, releases that depend on those releases, and so on, are included.
+        '''
+        found = set()
+        toCheck = [ ( depName, depVersion ) for depVersion in depVersions ]
+        checked = set()
+        while toCheck:
+            dep = toCheck.pop()
+            if dep in checked:
+                continue
+            checked.add( dep )
+            for relPath in self._dependents.get( dep, () ):
+                if relPath in found:
+                    continue
+                found.add( relPath )
+                if transitive:
+                    release = self._releases[relPath]
+                    toCheck.append( ( release['name'], release['version'] ) )
+        return found
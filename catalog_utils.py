@@ -0,0 +1,186 @@
+'''
+Utilities for the package catalog compiled from the git modulelist.txt
+and CVSROOT/modules files.
+
+Each modules file is parsed once and the result is saved as a marshal'ed
+catalog next to the source file, or under DEF_ECO_CACHE_DIR if that directory
+isn't writable.  The catalog is rebuilt whenever the source file changes.'''
+
+import os
+import re
+import marshal
+import hashlib
+from collections import namedtuple
+from repo_defaults import *
+from macro_utils import fileSignature, macroNameRefRegExp
+from version_utils import expandMacros
+
+# Pre-compile regular expressions for speed
+cvsDirPathRegExp    = re.compile( r"-d (\S+)" )
+cvsSubModuleRegExp  = re.compile( r"&(\S+)" )
+
+catalogVersion = 1
+
+# vcsType is 'git' or 'cvs'
+# dirPath and subModules are the CVS -d and & module options
+PackageEntry = namedtuple( 'PackageEntry', [ 'vcsType', 'location', 'dirPath', 'subModules' ] )
+
+def _parseGitModuleLines( lines, sourcePath, envDeps, verbose=False ):
+    '''Parse modulelist.txt lines: packageName packageLocation'''
+    packages = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            continue
+        parts = line.split()
+        if(len(parts) < 2):
+            print("Error parsing ", sourcePath, "Cannot break", line, "into columns with enough fields using spaces/tabs")
+            continue
+        packageName = parts[0]
+        for macroName in macroNameRefRegExp.findall( parts[1] ):
+            envDeps[macroName] = os.environ.get( macroName )
+        packageLocation = expandMacros( parts[1], os.environ )
+        packages[packageName] = ( 'git', packageLocation, '.', () )
+    return packages
+
+def _parseCVSModuleLines( lines, sourcePath, envDeps, verbose=False ):
+    '''Parse CVSROOT/modules lines'''
+    packages = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            continue
+
+        # Spear CVS repo uses these CVS module features
+        # Example: If CVSROOT/modules contains
+        # foo   path/to/foo &bar
+        # bar   -d subDir/bar path/to/bar
+        # Then:
+        # % cvs co foo
+        # is equivalent to
+        # % cvs co path/to/foo MAIN_TRUNK
+        # % cd MAIN_TRUNK
+        # % cvs co path/to/bar subDir/bar
+
+        # See if a directory path is specified
+        dirPath = "."
+        dirPathMatch  = cvsDirPathRegExp.search( line )
+        if dirPathMatch:
+            dirPath = dirPathMatch.group(1)
+            line = line.replace( dirPathMatch.group(0), "" )
+
+        # See if any submodules are specified
+        subModules = cvsSubModuleRegExp.findall( line )
+        if subModules:
+            line = cvsSubModuleRegExp.sub( "", line )
+
+        # We should have at most 2 whitespace separated parts left: packageName packageLocation
+        parts = line.split()
+        if(len(parts) < 2):
+            if verbose:
+                print("Error parsing ", sourcePath, "Cannot break", line, "into columns with enough fields using spaces/tabs")
+            continue
+
+        packageName = parts[0]
+        packageLocation = parts[1]
+        packages[packageName] = ( 'cvs', packageLocation, dirPath, tuple(subModules) )
+    return packages
+
+_catalogParsers = { 'git': _parseGitModuleLines, 'cvs': _parseCVSModuleLines }
+
+def getCatalogPaths( sourcePath ):
+    '''Returns the list of paths where the compiled catalog for sourcePath may be stored, preferred first'''
+    sourcePath = os.path.abspath( sourcePath )
+    ( sourceDir, sourceName ) = os.path.split( sourcePath )
+    pathHash = hashlib.md5( sourcePath.encode() ).hexdigest()[:12]
+    return [    os.path.join( sourceDir, '.%s.catalog' % sourceName ),
+                os.path.join( DEF_ECO_CACHE_DIR, '%s-%s.catalog' % ( sourceName, pathHash ) ) ]
+
+def _isCatalogCurrent( catalog, vcsType, sourcePath, signature ):
+    if not isinstance( catalog, dict ) or catalog.get( 'version' ) != catalogVersion:
+        return False
+    if catalog.get( 'vcsType' ) != vcsType or catalog.get( 'source' ) != sourcePath:
+        return False
+    if catalog.get( 'signature' ) != signature:
+        return False
+    for macroName, value in catalog['envDeps'].items():
+        if os.environ.get( macroName ) != value:
+            return False
+    return True
+
+def _readCatalog( catalogPath ):
+    try:
+        with open( catalogPath, 'rb' ) as f:
+            return marshal.load( f )
+    except ( IOError, OSError, EOFError, ValueError, TypeError ):
+        return None
+
+def _writeCatalog( catalog, catalogPaths, verbose=False ):
+    '''Save the catalog to the first writable catalog path'''
+    for catalogPath in catalogPaths:
+        tmpPath = '%s.%d' % ( catalogPath, os.getpid() )
+        try:
+            catalogDir = os.path.dirname( catalogPath )
+            if not os.path.isdir( catalogDir ):
+                os.makedirs( catalogDir, 0o775 )
+            with open( tmpPath, 'wb' ) as f:
+                marshal.dump( catalog, f )
+            os.replace( tmpPath, catalogPath )
+            return catalogPath
+        except ( IOError, OSError ):
+            if os.path.exists( tmpPath ):
+                os.remove( tmpPath )
+    if verbose:
+        print("Unable to save package catalog for %s" % catalog['source'])
+    return None
+
+_catalogCache = {}
+
+def loadModulesCatalog( vcsType, sourcePath, verbose=False ):
+    '''
+    Returns a dict of packageName -> PackageEntry for the git or cvs modules file sourcePath.
+    The compiled catalog is used if current, otherwise sourcePath is parsed and the catalog rebuilt.
+    '''
+    sourcePath = os.path.abspath( sourcePath )
+    signature  = fileSignature( sourcePath )
+    if signature is None:
+        return {}
+    signature = list( signature )
+
+    cacheKey = ( vcsType, sourcePath )
+    catalog  = _catalogCache.get( cacheKey )
+    if catalog is None or not _isCatalogCurrent( catalog, vcsType, sourcePath, signature ):
+        catalog = None
+        catalogPaths = getCatalogPaths( sourcePath )
+        for catalogPath in catalogPaths:
+            candidate = _readCatalog( catalogPath )
+            if candidate is not None and _isCatalogCurrent( candidate, vcsType, sourcePath, signature ):
+                catalog = candidate
+                break
+        if catalog is None:
+            with open( sourcePath, 'r' ) as f:
+                lines = f.readlines()
+            envDeps  = {}
+            packages = _catalogParsers[vcsType]( lines, sourcePath, envDeps, verbose=verbose )
+            catalog  = {    'version': catalogVersion, 'vcsType': vcsType, 'source': sourcePath,
+                            'signature': signature, 'envDeps': envDeps, 'packages': packages }
+            _writeCatalog( catalog, catalogPaths, verbose=verbose )
+        _catalogCache[cacheKey] = catalog
+
+    return { name: PackageEntry( *entry ) for name, entry in catalog['packages'].items() }
+
+def getPackageCatalog( gitModulesFile=None, cvsModulesFile=None, verbose=False ):
+    '''
+    Returns a unified dict of packageName -> PackageEntry.
+    Packages found in both files use the git entry.
+    '''
+    packageCatalog = {}
+    if cvsModulesFile:
+        packageCatalog.update( loadModulesCatalog( 'cvs', cvsModulesFile, verbose=verbose ) )
+    if gitModulesFile:
+        packageCatalog.update( loadModulesCatalog( 'git', gitModulesFile, verbose=verbose ) )
+    return packageCatalog
@@ -0,0 +1,294 @@
+'''
+Instrumented subprocess calls for eco_tools.
+
+The external commands eco_tools runs, git, svn, cvs, make, find, etc,
+go through cmd_call(), cmd_check_call() and cmd_check_output() here,
+which work like their subprocess counterparts but also record the command,
+cwd, duration, and exit status.  Commands run some other way, ex. w/ Popen
+to stream their output, can be added w/ recordCmd().
+cmd_async_output() is the asyncio counterpart of cmd_check_output(), so
+commands that wait on remote repos can be overlapped w/ asyncio.gather(),
+w/ at most DEF_ECO_REPO_JOBS_PER_HOST of them running at once per host.
+traceSpan() records a named phase, ex. a Releaser checkout or build,
+which nests the commands and spans inside it.
+
+    enableProfile() prints a summary of the time spent per command family
+    when the process exits, ex. for the epics-build --profile option.
+
+    ECO_TRACE=file.json writes every command and span to file.json when
+    the process exits, in the Chrome trace event format.
+    Load it in chrome://tracing or https://ui.perfetto.dev'''
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import asyncio
+import weakref
+import threading
+import contextlib
+import subprocess
+from repo_defaults import *
+
+# Options that take an argument before the git, svn, or cvs sub-command
+_cmdOptionsWithArg = {
+    'git':	[ '-C', '-c', '--git-dir', '--work-tree', '--namespace' ],
+    'svn':	[ '--username', '--password', '--config-dir', '--config-option' ],
+    'cvs':	[ '-d', '-e', '-s', '-T', '-z' ],
+}
+
+# Upper bounds in sec for the duration histogram buckets
+_histBounds	= [ 0.01, 0.1, 1.0, 10.0 ]
+_histTitles	= [ '<10ms', '<100ms', '<1s', '<10s', '>=10s' ]
+
+_lock			= threading.Lock()
+_startTime		= time.perf_counter()
+_profile		= False
+_families		= {}
+_spanStats		= {}
+_traceEvents	= []
+_traceFile		= DEF_ECO_TRACE_FILE
+if _traceFile:
+    # Only this process writes the trace, so child eco_tools processes don't overwrite it
+    os.environ.pop( "ECO_TRACE", None )
+
+def isRecording():
+    '''Returns True if commands and spans are being recorded'''
+    return _profile or bool(_traceFile)
+
+def enableProfile( enable=True ):
+    '''Print a summary of command timings by family when the process exits'''
+    global _profile
+    _profile = enable
+
+def enableTrace( traceFile ):
+    '''Write a Chrome trace of all commands and spans to traceFile when the process exits'''
+    global _traceFile
+    _traceFile = traceFile
+
+def getCmdFamily( cmdList ):
+    '''
+    Returns the command family used to group timings, ex. "git ls-remote", "svn ls", or "make".
+    cmdList can be a list of args or a shell command string.
+    Commands run via bash -c or ssh are grouped by the command they run.
+    '''
+    if isinstance( cmdList, str ):
+        words = cmdList.split()
+    else:
+        words = [ str(arg) for arg in cmdList ]
+    if len(words) == 0:
+        return '?'
+    program = os.path.basename( words[0] )
+    if program in [ 'bash', 'sh' ] and '-c' in words[1:]:
+        shellCmd = words[ words.index( '-c' ) + 1: ]
+        if shellCmd:
+            return getCmdFamily( ' '.join( shellCmd ) )
+    if program == 'ssh' and len(words) > 2:
+        # The remote command follows the host, which is the first word w/o a leading -
+        remote = [ word for word in words[1:] if not word.startswith( '-' ) ]
+        if len(remote) > 1:
+            return getCmdFamily( ' '.join( remote[1:] ) )
+    if program not in _cmdOptionsWithArg:
+        return program
+    optionsWithArg = _cmdOptionsWithArg[program]
+    iWord = 1
+    while iWord < len(words):
+        word = words[iWord]
+        if word in optionsWithArg:
+            iWord += 2
+        elif word.startswith( '-' ):
+            iWord += 1
+        else:
+            return "%s %s" % ( program, word )
+    return program
+
+def _addTraceEvent( name, cat, start, duration, args, tid=None ):
+    if tid is None:
+        tid = threading.current_thread().ident
+    _traceEvents.append( {	'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                            'ts': int( ( start - _startTime ) * 1e6 ), 'dur': int( duration * 1e6 ),
+                            'args': args } )
+
+def recordCmd( cmdList, cwd, start, status, tid=None ):
+    '''
+    Record a command that started at time.perf_counter() start and just finished w/ exit status.
+    status is None if the command couldn't be run.
+    tid is the trace row for the command, which defaults to the current thread.
+    '''
+    if not isRecording():
+        return
+    duration = time.perf_counter() - start
+    family = getCmdFamily( cmdList )
+    if cwd is None:
+        cwd = os.getcwd()
+    if isinstance( cmdList, str ):
+        cmdString = cmdList
+    else:
+        cmdString = ' '.join( [ str(arg) for arg in cmdList ] )
+    with _lock:
+        if family not in _families:
+            _families[family] = { 'count': 0, 'total': 0.0, 'max': 0.0, 'failed': 0, 'hist': [ 0 ] * len(_histTitles) }
+        stats = _families[family]
+        stats['count'] += 1
+        stats['total'] += duration
+        stats['max'] = max( stats['max'], duration )
+        if status != 0:
+            stats['failed'] += 1
+        iBucket = 0
+        while iBucket < len(_histBounds) and duration >= _histBounds[iBucket]:
+            iBucket += 1
+        stats['hist'][iBucket] += 1
+        if _traceFile:
+            _addTraceEvent( family, 'cmd', start, duration, { 'cmd': cmdString, 'cwd': cwd, 'status': status }, tid=tid )
+
+@contextlib.contextmanager
+def traceSpan( name, **args ):
+    '''
+    Context manager that records the time spent in a named phase, ex.
+        with traceSpan( 'checkout', release=buildDir ):
+            ...
+    args are saved w/ the span in the trace.
+    '''
+    if not isRecording():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        with _lock:
+            if name not in _spanStats:
+                _spanStats[name] = { 'count': 0, 'total': 0.0 }
+            _spanStats[name]['count'] += 1
+            _spanStats[name]['total'] += duration
+            if _traceFile:
+                _addTraceEvent( name, 'phase', start, duration, dict( [ ( key, str(value) ) for ( key, value ) in args.items() ] ) )
+
+def _runCmd( function, cmdList, *args, **kwargs ):
+    start = time.perf_counter()
+    status = None
+    try:
+        result = function( cmdList, *args, **kwargs )
+        status = result if function is subprocess.call else 0
+        return result
+    except subprocess.CalledProcessError as e:
+        status = e.returncode
+        raise
+    finally:
+        recordCmd( cmdList, kwargs.get( 'cwd' ), start, status )
+
+def cmd_call( cmdList, *args, **kwargs ):
+    '''Run cmdList via subprocess.call and record its timing.  Returns command status'''
+    return _runCmd( subprocess.call, cmdList, *args, **kwargs )
+
+def cmd_check_call( cmdList, *args, **kwargs ):
+    '''
+    Run cmdList via subprocess.check_call and record its timing.
+    May throw subprocess.CalledProcessError or OSError exceptions
+    '''
+    return _runCmd( subprocess.check_call, cmdList, *args, **kwargs )
+
+def cmd_check_output( cmdList, *args, **kwargs ):
+    '''
+    Run cmdList via subprocess.check_output and record its timing.  Returns cmd output
+    May throw subprocess.CalledProcessError or OSError exceptions
+    '''
+    return _runCmd( subprocess.check_output, cmdList, *args, **kwargs )
+
+def getUrlHost( url ):
+    '''
+    Returns the host a repo url accesses, ex. "github.com" for https://github.com/org/repo.git
+    or git@github.com:org/repo.git, or "localhost" for a file url or local path.
+    '''
+    if not url:
+        return 'localhost'
+    urlMatch = re.match( r'^[A-Za-z][\w+.-]*://(?:[^@/]*@)?([^:/]*)', url )
+    if urlMatch is None:
+        # scp style url, user@host:path
+        urlMatch = re.match( r'^(?:[^@/]*@)?([^:/]{2,}):', url )
+    if urlMatch is None or not urlMatch.group(1):
+        return 'localhost'
+    return urlMatch.group(1)
+
+# asyncio.Semaphore for each host by event loop, as a semaphore can only be used in one loop
+_hostSemaphores = weakref.WeakKeyDictionary()
+
+def getHostSemaphore( host ):
+    '''Returns the asyncio.Semaphore limiting the commands running at once for host in the running event loop'''
+    loop = asyncio.get_running_loop()
+    semaphores = _hostSemaphores.setdefault( loop, {} )
+    if host not in semaphores:
+        semaphores[host] = asyncio.Semaphore( DEF_ECO_REPO_JOBS_PER_HOST )
+    return semaphores[host]
+
+async def cmd_async_output( cmdList, host='localhost', cwd=None, stderr=None, universal_newlines=False ):
+    '''
+    Run cmdList in an asyncio subprocess and record its timing, ex.
+        outputs = await asyncio.gather( cmd_async_output( cmd1, host1 ), cmd_async_output( cmd2, host2 ) )
+    host is the remote host the command accesses, see getUrlHost().
+    Waits for one of the DEF_ECO_REPO_JOBS_PER_HOST slots for host before starting.
+    stdin is /dev/null as concurrent commands can't share the terminal for prompts.
+    Returns cmd output
+    May throw subprocess.CalledProcessError or OSError exceptions
+    '''
+    async with getHostSemaphore( host ):
+        start = time.perf_counter()
+        status = None
+        try:
+            proc = await asyncio.create_subprocess_exec( *cmdList, cwd=cwd, stdin=subprocess.DEVNULL,
+                                                         stdout=subprocess.PIPE, stderr=stderr )
+            ( output, errOutput ) = await proc.communicate()
+            status = proc.returncode
+        finally:
+            # Concurrent commands get their own trace rows so they don't look nested
+            recordCmd( cmdList, cwd, start, status, tid=id( asyncio.current_task() ) )
+    if universal_newlines:
+        output = output.decode( errors='replace' )
+    if status != 0:
+        raise subprocess.CalledProcessError( status, cmdList, output )
+    return output
+
+def showProfile( outFile=sys.stderr ):
+    '''Print the command timings by family, most total time first, and the time spent in each span'''
+    with _lock:
+        families  = sorted( _families.items(), key=lambda item: item[1]['total'], reverse=True )
+        spanStats = sorted( _spanStats.items(), key=lambda item: item[1]['total'], reverse=True )
+    totalCount = sum( [ stats['count'] for ( family, stats ) in families ] )
+    totalTime  = sum( [ stats['total'] for ( family, stats ) in families ] )
+    outFile.write( "\neco_tools profile: %d commands, %.3f sec in commands, %.3f sec elapsed\n"
+                    % ( totalCount, totalTime, time.perf_counter() - _startTime ) )
+    if families:
+        outFile.write( "%-24s %6s %10s %10s %10s %6s  %s\n" % ( 'Command', 'Count', 'Total(s)', 'Mean(ms)', 'Max(ms)', 'Failed',
+                                                                 ' '.join( [ "%6s" % title for title in _histTitles ] ) ) )
+    for ( family, stats ) in families:
+        outFile.write( "%-24s %6d %10.3f %10.1f %10.1f %6d  %s\n" % ( family, stats['count'], stats['total'],
+                        stats['total'] * 1000 / stats['count'], stats['max'] * 1000, stats['failed'],
+                        ' '.join( [ "%6d" % count for count in stats['hist'] ] ) ) )
+    if spanStats:
+        outFile.write( "%-24s %6s %10s\n" % ( 'Phase', 'Count', 'Total(s)' ) )
+    for ( name, stats ) in spanStats:
+        outFile.write( "%-24s %6d %10.3f\n" % ( name, stats['count'], stats['total'] ) )
+    outFile.flush()
+
+def writeTrace( traceFile ):
+    '''Write the recorded commands and spans to traceFile in the Chrome trace event format'''
+    with _lock:
+        traceEvents = list( _traceEvents )
+    traceEvents.append( { 'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                          'args': { 'name': ' '.join( [ os.path.basename( sys.argv[0] ) ] + sys.argv[1:] ) } } )
+    with open( traceFile, 'w' ) as f:
+        json.dump( { 'traceEvents': traceEvents, 'displayTimeUnit': 'ms' }, f )
+
+def _atExit():
+    if _profile:
+        showProfile()
+    if _traceFile:
+        try:
+            writeTrace( _traceFile )
+        except OSError as e:
+            sys.stderr.write( "Unable to write ECO_TRACE file %s: %s\n" % ( _traceFile, e.strerror ) )
+
+atexit.register( _atExit )
@@ -21,7 +21,7 @@ def createCramPackageInfo(packageName, apptype):
     with open(packageInfofile, 'w') as pkginfof:
         json.dump(packageInfo, pkginfof)
 
-    subprocess.check_call(['git', 'add', '.cram/packageinfo'])
+    cmd_check_call(['git', 'add', '.cram/packageinfo'])
     
 def determineCramAppType():
     '''Ask the user the cram type of the package'''
@@ -41,26 +41,46 @@ def determineCramAppType():
                                     ).strip()
     return apptype
 
-def getCramReleaseDir( url=None, refName=None ):
-    packageInfo = None
-    packageInfoFile = '.cram/packageinfo'
-    if url:
-        if not refName:
-            print("getCramReleaseDir error: No refName for url", url)
+class CramConfig(object):
+    '''
+    Parsed CRAM facilities config, ex. DEF_LCLS_CRAM_CFG.
+    Maps each facility name to its config, which maps each app type
+    to its settings, ex. config.facilities['Dev']['HIOC']['releaseFolder']
+    '''
+    def __init__( self, filePath, signature, facilities ):
+        self.filePath	= filePath
+        self.signature	= signature
+        self.facilities	= facilities
+
+    def getReleaseFolder( self, appType, facility='Dev' ):
+        '''Returns the releaseFolder for appType, or None if not configured'''
+        try:
+            return self.facilities[facility][appType]['releaseFolder']
+        except ( KeyError, TypeError ):
             return None
-        packageInfoContent = gitGetRemoteFile( url, refName, packageInfoFile )
-        if packageInfoContent:
-            packageInfo = json.loads( packageInfoContent )
-    else:
-        if os.path.isfile( packageInfoFile ):
-            try:
-                with open( packageInfoFile, 'r' ) as pkgInfoFp:
-                    packageInfo = json.load( pkgInfoFp )
-            except:
-                pass
-    if not packageInfo:
-        return None
 
+    def getReleaseDir( self, packageInfo, facility='Dev' ):
+        '''Returns the release dir for a .cram/packageinfo dict, or None'''
+        try:
+            releaseFolder = self.getReleaseFolder( packageInfo['type'], facility=facility )
+            if releaseFolder is None:
+                return None
+            return releaseFolder + '/' + packageInfo['name']
+        except ( KeyError, TypeError ):
+            return None
+
+# Parsed CRAM configs by path, reused until the file changes
+_cramConfigCache = {}
+
+# .cram/packageinfo dicts by ( url, refName ), or None if the release doesn't have one
+_cramPackageInfoCache = {}
+
+def getCramConfig():
+    '''
+    Returns a CramConfig for the user's CRAM facilities file, DEF_LCLS_CRAM_USER,
+    or DEF_LCLS_CRAM_CFG if there isn't one.  The file is only parsed again if it changes.
+    Returns None if neither file can be read.
+    '''
     facilityConfigFile = None
     if os.path.isfile( DEF_LCLS_CRAM_USER ):
         facilityConfigFile = DEF_LCLS_CRAM_USER
@@ -68,24 +88,81 @@ def getCramReleaseDir( url=None, refName=None ):
         facilityConfigFile = DEF_LCLS_CRAM_CFG
     if not facilityConfigFile:
         return None
-    
-    facilityConfigDict = None
+
+    signature = fileSignature( facilityConfigFile )
+    cacheKey = os.path.abspath( facilityConfigFile )
+    cramConfig = _cramConfigCache.get( cacheKey )
+    if cramConfig is not None and cramConfig.signature == signature:
+        return cramConfig
+
+    facilities = {}
     try:
         with open( facilityConfigFile, 'r' ) as facilityFp:
-            facilityConfig = json.load( facilityFp )
-            facilityConfigDict = {}
-            for facility in facilityConfig:
-                facilityConfigDict[ facility['name'] ] = facility
+            for facility in json.load( facilityFp ):
+                facilities[ facility['name'] ] = facility
     except:
         pass
-    if not facilityConfigDict:
+    if not facilities:
         return None
+    cramConfig = CramConfig( facilityConfigFile, signature, facilities )
+    _cramConfigCache[cacheKey] = cramConfig
+    return cramConfig
 
-    releaseDir = None
-    try:
-        releaseDir = facilityConfigDict['Dev'][ packageInfo['type'] ]['releaseFolder']
-        releaseDir += '/'
-        releaseDir += packageInfo['name']
-    except:
-        pass
-    return releaseDir
+def getCramPackageInfo( url=None, refName=None ):
+    '''
+    Returns the .cram/packageinfo dict for refName in the git repo url,
+    or for the current directory if url is None.  Returns None if not found.
+    Tags don't change, so the result for each url and refName is cached.
+    '''
+    packageInfoFile = '.cram/packageinfo'
+    if not url:
+        if os.path.isfile( packageInfoFile ):
+            try:
+                with open( packageInfoFile, 'r' ) as pkgInfoFp:
+                    return json.load( pkgInfoFp )
+            except:
+                pass
+        return None
+
+    if ( url, refName ) not in _cramPackageInfoCache:
+        packageInfo = None
+        packageInfoContent = gitGetRemoteFile( url, refName, packageInfoFile )
+        if packageInfoContent:
+            try:
+                packageInfo = json.loads( packageInfoContent )
+            except ValueError:
+                pass
+        _cramPackageInfoCache[ ( url, refName ) ] = packageInfo
+    return _cramPackageInfoCache[ ( url, refName ) ]
+
+def getCramReleaseDir( url=None, refName=None ):
+    '''Returns the CRAM release dir for refName in the git repo url,
+    or for the current directory if url is None.  Returns None if it isn't a CRAM package.'''
+    if url and not refName:
+        print("getCramReleaseDir error: No refName for url", url)
+        return None
+    packageInfo = getCramPackageInfo( url, refName )
+    if not packageInfo:
+        return None
+    cramConfig = getCramConfig()
+    if not cramConfig:
+        return None
+    return cramConfig.getReleaseDir( packageInfo )
+
+def getCramReleaseDirs( urlRefs ):
+    '''
+    Returns a dict of ( url, refName ) -> CRAM release dir, or None, for a list of ( url, refName ),
+    ex. for all the releases in a build plan.  The CRAM config is only checked once, and the
+    packageinfo for each release is cached for later getCramReleaseDir() calls.
+    '''
+    releaseDirs = dict( [ ( urlRef, None ) for urlRef in urlRefs ] )
+    cramConfig = getCramConfig()
+    if not cramConfig:
+        return releaseDirs
+    for ( url, refName ) in releaseDirs:
+        if not url or not refName:
+            continue
+        packageInfo = getCramPackageInfo( url, refName )
+        if packageInfo:
+            releaseDirs[ ( url, refName ) ] = cramConfig.getReleaseDir( packageInfo )
+    return releaseDirs
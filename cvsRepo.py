@@ -6,6 +6,7 @@ import subprocess
 #import Releaser
 import Repo
 from repo_defaults import *
+from cmd_utils import *
 from cvs_utils import *
 from site_utils import *
 from version_utils import *
@@ -68,7 +69,7 @@ class cvsRepo( Repo.Repo ):
             print("cvs_url:        ", cvs_url)
         return defaultPackage
 
-    def CheckoutRelease( self, buildDir, verbose=False, dryRun=False ):
+    def CheckoutRelease( self, buildDir, verbose=False, dryRun=False, minimizeRepoAccess=False ):
         if verbose or dryRun:
             print("Checking out: %s\nto build dir: %s ..." % ( self._url, buildDir ))
         outputPipe = None
@@ -79,7 +80,7 @@ class cvsRepo( Repo.Repo ):
             return
         try:
             cmdList = [ "cvs", "co", self._url, buildDir ]
-            subprocess.check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
+            cmd_check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
         except RuntimeError:
             raise Releaser.BuildError("CheckoutRelease: cvs co failed for %s %s" % ( self._url, buildDir ))
 
@@ -89,7 +90,7 @@ class cvsRepo( Repo.Repo ):
             print("RemoveTag: --dryRun--")
             return
         cmdList = [ "cvs", "tag", "-d", self._tag ]
-        subprocess.check_call( cmdList )
+        cmd_check_call( cmdList )
         print("Successfully removed release tag %s." % ( self._tag ))
 
     def TagRelease( self, package=None, release=None, branch=None, message="", verbose=True, dryRun=False ):
@@ -105,5 +106,5 @@ class cvsRepo( Repo.Repo ):
             return
 
         cmdList = [ "cvs", "tag", release, branch ]
-        subprocess.check_call( cmdList )
+        cmd_check_call( cmdList )
 
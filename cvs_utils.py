@@ -2,11 +2,13 @@
 Utilities for cvs repos'''
 
 import os
-import re
 import sys
+import time
 import subprocess
 import fileinput
 from repo_defaults import *
+from catalog_utils import *
+from cmd_utils import *
 
 def cvsPathExists( cvsPath, revision=None, debug=False ):
     try:
@@ -16,7 +18,7 @@ def cvsPathExists( cvsPath, revision=None, debug=False ):
             repoCmd = [ 'cvs', 'ls', cvsPath ]
         if debug:
             print("cvsPathExists check_output: %s" % ' '.join( repoCmd ))
-        contents = subprocess.check_output( repoCmd, stderr = subprocess.STDOUT )
+        contents = cmd_check_output( repoCmd, stderr = subprocess.STDOUT )
         # No need to check contents
         # If no exception, the path exists
         return True
@@ -26,10 +28,13 @@ def cvsPathExists( cvsPath, revision=None, debug=False ):
         return False
 
 def cvsGetRemoteTags( packageName, verbose=False ):
-    p1 = subprocess.Popen(['cvs', '-Q', 'rlog', '-h', packageName], stdout=subprocess.PIPE)
+    rlogCmd = ['cvs', '-Q', 'rlog', '-h', packageName]
+    start = time.perf_counter()
+    p1 = subprocess.Popen(rlogCmd, stdout=subprocess.PIPE)
     p2 = subprocess.Popen(['awk', '-F"[.:]"', '/^\t/&&$(NF-1)!=0{print $1}'], stdin=p1.stdout, stdout=subprocess.PIPE)
     p1.stdout.close()  # Allow p1 to receive a SIGPIPE if p2 exits.
     output = p2.communicate()[0]
+    recordCmd( rlogCmd, None, start, p1.wait() )
 
     plaintags = set()
     for line in output.split('\n'):
@@ -54,7 +59,7 @@ def cvsGetWorkingBranch( debug=False ):
     repo_tag    = None
     try:
         repoCmd = [ 'cvs', 'info', '.' ]
-        statusInfo = subprocess.check_output( repoCmd, stderr=subprocess.STDOUT )
+        statusInfo = cmd_check_output( repoCmd, stderr=subprocess.STDOUT )
         statusLines = statusInfo.splitlines()
         for line in statusLines:
             if line is None:
@@ -109,55 +114,9 @@ def parseCVSModulesTxt( cvsRepoRoot=None, verbose=False ):
             print("CVS modules file not accessible: Unable to load CVS module list.")
         return package2Location
     
-    with open(cvsModulesTxtFile, 'r') as f:
-        lines = f.readlines()
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith('#'):
-            continue
-
-        # Spear CVS repo uses these CVS module features
-        # Example: If CVSROOT/modules contains
-        # foo   path/to/foo &bar
-        # bar   -d subDir/bar path/to/bar
-        # Then:
-        # % cvs co foo
-        # is equivalent to
-        # % cvs co path/to/foo MAIN_TRUNK
-        # % cd MAIN_TRUNK
-        # % cvs co path/to/bar subDir/bar
-
-        # See if a directory path is specified
-        dirPath = "."
-        dirPathRegExp = re.compile( r"-d (\S+)" )
-        dirPathMatch  = dirPathRegExp.search( line )
-        if dirPathMatch:
-            dirPath = dirPathMatch.group(1)
-            line = line.replace( dirPathMatch.group(0), "" )
-
-        # See if any submodules are specified
-        subModules = []
-        subModuleRegExp = re.compile( r"&(\S+)" )
-        while True:
-            subModuleMatch  = subModuleRegExp.search( line )
-            if not subModuleMatch:
-                break
-            subModules.append( subModuleMatch.group(1) )
-            line = line.replace( subModuleMatch.group(0), "" )
-
-        # We should have at most 2 whitespace separated parts left: packageName packageLocation
-        parts = line.split()
-        if(len(parts) < 2):
-            if verbose:
-                print("Error parsing ", cvsModulesTxtFile, "Cannot break", line, "into columns with enough fields using spaces/tabs")
-            continue
-
-        packageName = parts[0]
-        packageLocation = parts[1]
-        package2Location[packageName] = packageLocation
+    for packageName, entry in loadModulesCatalog( 'cvs', cvsModulesTxtFile, verbose=verbose ).items():
+        package2Location[packageName] = entry.location
 
-    # Note: could return ( package2Location, dirPath, subModules ) if we intended to do something w/ dirPath or subModules
+    # Note: the catalog also has the dirPath and subModules for each package
     return package2Location
 
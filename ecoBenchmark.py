@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+#==============================================================
+#
+#  ecoBenchmark.py:  Time the eco_tools hot paths against a synthetic site
+#
+#  Create the site first w/ makeSyntheticSite.py, then:
+#      ecoBenchmark.py --site /tmp/site
+#      ecoBenchmark.py --site /tmp/site --only getEpicsPkgDependents --repeat 10
+#      ecoBenchmark.py --site /tmp/site --json after.json
+#
+#  Each benchmark is run --number times per timing, w/ --repeat timings.
+#  The best and mean time per run are reported, as recommended for timeit.
+#  Anything the eco_tools functions print while being timed is discarded.
+#
+#==============================================================
+import os
+import io
+import sys
+import json
+import shutil
+import timeit
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+ecoToolsDir = os.path.dirname( os.path.abspath( __file__ ) )
+
+def setupSite( siteTop ):
+    '''Read site.json and set up the environment for the site.  Must be called before importing eco_tools modules'''
+    with open( os.path.join( siteTop, 'site.json' ), 'r' ) as f:
+        siteInfo = json.load( f )
+    os.environ.update( siteInfo['env'] )
+    for envVar in [ 'EPICS_BASE', 'EPICS_MODULES_TOP', 'EPICS_TOP', 'GIT_REPO_ROOT' ]:
+        os.environ.pop( envVar, None )
+    # The artifact cache doesn't apply to dry runs
+    os.environ['ECO_ARTIFACT_CACHE_SIZE'] = '0'
+    if ecoToolsDir not in sys.path:
+        sys.path.insert( 0, ecoToolsDir )
+    return siteInfo
+
+def getBenchmarks( siteInfo, scratchDir ):
+    '''Returns a list of ( name, function ) to time'''
+    import version_utils
+    import git_utils
+    import whatsAffected
+    import Releaser
+    import gitRepo
+
+    modulesTop  = siteInfo['modulesTop']
+    modules     = sorted( siteInfo['modules'] )
+    releaseDirs = [ os.path.join( modulesTop, m, r ) for m in modules for r in siteInfo['modules'][m] ]
+    # The module w/ the most dependents
+    lastModule  = max( modules, key=lambda m: ( len( siteInfo['depends'][m] ), m ) )
+    lastRelease = siteInfo['modules'][lastModule][-1]
+
+    def expandPackagePath():
+        for m in modules:
+            version_utils.ExpandPackagePath( modulesTop, m )
+
+    def getPkgReleaseList():
+        for m in modules:
+            version_utils.getPkgReleaseList( modulesTop, m )
+
+    def getEpicsPkgDependents():
+        for releaseDir in releaseDirs:
+            version_utils.getEpicsPkgDependents( releaseDir )
+
+    def epicsVersions():
+        subprocess.check_call( [ sys.executable, os.path.join( ecoToolsDir, 'epics-versions.py' ), '-v' ] + modules[:5],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+
+    def gitFindPackageRelease():
+        for m in modules[:10]:
+            git_utils.gitFindPackageRelease( 'modules/' + m, siteInfo['modules'][m][-1] )
+
+    def gitFindPackageReleases():
+        git_utils.gitFindPackageReleases( [ ( 'modules/' + m, siteInfo['modules'][m][-1] ) for m in modules[:10] ] )
+
+    def assessImpact():
+        curDir = os.getcwd()
+        os.chdir( modulesTop )
+        try:
+            whatsAffected.assessImpact( os.path.join( modulesTop, 'modulelist.txt' ), modules[0] )
+        finally:
+            os.chdir( curDir )
+
+    # Dry run build of a copy of that module, whose dependents are all built
+    buildDir = os.path.join( scratchDir, lastModule, lastRelease )
+    shutil.copytree( os.path.join( modulesTop, lastModule, lastRelease ), buildDir )
+    shutil.rmtree( os.path.join( buildDir, 'configure', 'O.' + os.environ['EPICS_HOST_ARCH'] ) )
+    repoPath = os.path.join( os.environ['GIT_TOP'], 'package', 'epics', 'modules', lastModule + '.git' )
+
+    def buildReleaseDryRun():
+        repo = gitRepo.gitRepo( repoPath, lastRelease, lastModule, lastRelease )
+        release = Releaser.Releaser( repo, 'modules/' + lastModule, dryRun=True, keepTmp=False )
+        # Run outside the caller's working dir, which may be in a git working tree
+        curDir = os.getcwd()
+        os.chdir( scratchDir )
+        try:
+            release.BuildRelease( buildDir )
+        finally:
+            os.chdir( curDir )
+
+    return [    ( 'ExpandPackagePath',		expandPackagePath ),
+                ( 'getPkgReleaseList',		getPkgReleaseList ),
+                ( 'getEpicsPkgDependents',	getEpicsPkgDependents ),
+                ( 'epics-versions -v',		epicsVersions ),
+                ( 'gitFindPackageRelease',	gitFindPackageRelease ),
+                ( 'gitFindPackageReleases',	gitFindPackageReleases ),
+                ( 'assessImpact',			assessImpact ),
+                ( 'BuildRelease --dryRun',	buildReleaseDryRun ) ]
+
+def runBenchmark( function, repeat, number ):
+    '''Returns a list of the time per run for each of repeat timings'''
+    timer = timeit.Timer( function )
+    with contextlib.redirect_stdout( io.StringIO() ):
+        times = timer.repeat( repeat=repeat, number=number )
+    return [ t / number for t in times ]
+
+def process_options( argv ):
+    parser = argparse.ArgumentParser( description='Time eco_tools hot paths against a site created by makeSyntheticSite.py.' )
+    parser.add_argument( '--site',      required=True, help='Top of the synthetic site.' )
+    parser.add_argument( '--only',      action='append', default=[], help='Only run benchmarks whose name contains this.  May be repeated.' )
+    parser.add_argument( '--repeat',    type=int, default=5, help='Number of timings per benchmark.' )
+    parser.add_argument( '--number',    type=int, default=1, help='Number of runs per timing.' )
+    parser.add_argument( '--json',      help='Also save the results to this file.' )
+    return parser.parse_args( argv )
+
+def main( argv=None ):
+    options  = process_options( argv )
+    siteInfo = setupSite( options.site )
+    scratchDir = tempfile.mkdtemp( prefix='ecoBenchmark-' )
+    results = {}
+    try:
+        for ( name, function ) in getBenchmarks( siteInfo, scratchDir ):
+            if options.only and not any( [ only in name for only in options.only ] ):
+                continue
+            times = runBenchmark( function, options.repeat, options.number )
+            results[name] = { 'best': min( times ), 'mean': sum( times ) / len( times ), 'times': times }
+            print("%-24s best %9.3f ms   mean %9.3f ms" % ( name, min( times ) * 1000, results[name]['mean'] * 1000 ))
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree( scratchDir, ignore_errors=True )
+
+    if options.json:
+        with open( options.json, 'w' ) as f:
+            json.dump( { 'site': siteInfo['top'], 'repeat': options.repeat, 'number': options.number, 'results': results }, f, indent=1 )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main() )
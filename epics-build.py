@@ -29,6 +29,8 @@ import Repo
 import gitRepo
 import svnRepo
 import Releaser 
+import ArtifactCache
+from cmd_utils import *
 from git_utils import *
 from svn_utils import *
 from version_utils import *
@@ -47,7 +49,7 @@ def build_modules( options ):
             status = 1
         else:
             for release in releases:
-                result = release.InstallPackage( installTop=options.top, force=options.force, rmFailed=options.rmFailed )
+                result = release.InstallPackage( installTop=options.top, force=options.force, rmFailed=options.rmFailed, targetArchs=options.archs )
                 if status == 0:
                     status = result
     except:
@@ -58,15 +60,15 @@ def build_modules( options ):
  
 def find_releases( options ):
     releases = []
-    for package in options.packages:
-        release = Releaser.find_release( package, verbose=options.verbose )
+    foundReleases = Releaser.find_releases( options.packages, verbose=options.verbose, minimizeRepoAccess=options.minimizeRepoAccess )
+    for ( package, release ) in zip( options.packages, foundReleases ):
         if release is None:
             print("Error: Could not find packageSpec: %s" % package)
         else:
             releases += [ release ]
     return releases
 
-def buildDependencies( pkgTop, verbose=False ):
+def buildDependencies( pkgTop, verbose=False, minimizeRepoAccess=False, targetArchs=None ):
     status = 0
     # Check Dependendents
     print("Checking dependents for %s" % ( pkgTop ))
@@ -75,11 +77,11 @@ def buildDependencies( pkgTop, verbose=False ):
         if dep == 'base':
             continue    # Just check module dependents
         package = "%s/%s" % ( dep, buildDep[dep] )
-        release = Releaser.find_release( package, verbose=verbose )
+        release = Releaser.find_release( package, verbose=verbose, minimizeRepoAccess=minimizeRepoAccess )
         if release is None:
             print("Error: Could not find package %s" % package)
             continue
-        result = release.InstallPackage( )
+        result = release.InstallPackage( targetArchs=targetArchs )
         if result != 0:
             status = 1
     return status
@@ -110,6 +112,12 @@ def process_options(argv):
     parser.add_argument( '--dep',            action='store',  help='Build dependencies for specified directory.' )
     parser.add_argument( '--force',          action='store_true',  help='Force rebuild.' )
     parser.add_argument( '--rmFailed',       action='store_true',  help='Remove failed builds.' )
+    parser.add_argument( '-a', '--arch',     dest='archs', action='append', \
+                        help='EPICS target arch to build. Repeat for more arches, which are built concurrently after the host arch.', default=None )
+    parser.add_argument( '--minimizeRepoAccess', action='store_true', help='Query each repo at most once and skip fetching tags already in a checkout.' )
+    parser.add_argument( '--noArtifactCache', action='store_true', help='Always run make instead of restoring build outputs from the artifact cache, which is only on if ECO_ARTIFACT_CACHE_SIZE is set.' )
+    parser.add_argument( '--artifactCacheStats', action='store_true', help='Show artifact cache hit and miss statistics when done.' )
+    parser.add_argument( '--profile',        action='store_true', help='Show the time spent in each kind of external command when done.' )
     parser.add_argument( '-v', '--verbose',  action="store_true", help='show more verbose output.' )
     parser.add_argument( '--version',        action="version", version=eco_tools_version )
 
@@ -119,6 +127,10 @@ def process_options(argv):
 
 def main(argv=None):
     options = process_options(argv)
+    if options.profile:
+        enableProfile()
+    if options.noArtifactCache:
+        ArtifactCache.enableArtifactCache( False )
 
     if (options.input_file_path):
         try:
@@ -145,14 +157,22 @@ def main(argv=None):
         in_file.close()
 
     if options.dep:
-        result = buildDependencies( options.dep, verbose=options.verbose )
+        result = buildDependencies( options.dep, verbose=options.verbose, minimizeRepoAccess=options.minimizeRepoAccess, targetArchs=options.archs )
         if result != 0:
+            showArtifactCacheStats( options )
             return  
     elif len( options.packages ) == 0:
         print('Error: No module/release packages specified!')
         return  
 
-    return build_modules( options )
+    status = build_modules( options )
+    showArtifactCacheStats( options )
+    return status
+
+def showArtifactCacheStats( options ):
+    artifactCache = ArtifactCache.getDefaultArtifactCache( verbose=options.verbose )
+    if options.artifactCacheStats and artifactCache is not None:
+        artifactCache.showStats()
 
 if __name__ == '__main__':
     status = main()
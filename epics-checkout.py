@@ -50,7 +50,11 @@ import readline
 import shutil
 import tempfile
 import re
+import bisect
+import threading
+import concurrent.futures
 
+from cmd_utils import *
 from cram_utils import *
 from cvs_utils import *
 from git_utils import *
@@ -64,8 +68,105 @@ from eco_version import eco_tools_version
 git_package2Location = parseGitModulesTxt()
 cvs_modules2Location = parseCVSModulesTxt()
 
-# TODO: 1. Breakout packageName completer code into it's own function
-# TODO: 2. Combine assemble_env_inputs_from_term and assemble_env_inputs_from_file into one function w/ a from_file boolean
+class PrefixCompleter( object ):
+    '''
+    readline completer for a list of words.
+    The words are kept sorted so the matches for a prefix are found w/ bisect.
+    If onUnique is provided, it's called w/ the word when a prefix has only one match.
+    '''
+    def __init__( self, words, onUnique=None ):
+        self._words     = sorted( set( words ) )
+        self._onUnique  = onUnique
+        self._matches   = []
+
+    def matches( self, prefix ):
+        '''Returns the sorted list of words starting w/ prefix'''
+        lo = bisect.bisect_left( self._words, prefix )
+        hi = lo
+        while hi < len(self._words) and self._words[hi].startswith( prefix ):
+            hi += 1
+        return self._words[lo:hi]
+
+    def complete( self, text, state ):
+        if state == 0:
+            self._matches = self.matches( text )
+            if len(self._matches) == 1 and self._onUnique:
+                self._onUnique( self._matches[0] )
+        if state < len(self._matches):
+            return self._matches[state]
+        return None
+
+def getPackageTags( packageSpec, verbose=False ):
+    '''
+    Find the repo for packageSpec and get its tags.
+    Returns ( repoPath, dirName, tags )
+    repoPath is None unless the package is in modulelist.txt or CVSROOT/modules.
+    '''
+    packageName = os.path.split(packageSpec)[1]
+    dirName     = ""
+    repoPath    = None
+    tags        = []
+    if packageSpec in git_package2Location:
+        repoPath = git_package2Location[packageSpec]
+        tags = gitGetRemoteTags( repoPath, verbose=verbose )
+    elif packageName in git_package2Location:
+        repoPath = git_package2Location[packageName]
+        tags = gitGetRemoteTags( repoPath, verbose=verbose )
+    elif packageName in cvs_modules2Location and os.path.isdir( DEF_CVS_ROOT ):
+        # cvs REPO
+        dirName = 'MAIN_TRUNK'
+        tags = cvsGetRemoteTags( packageName )
+        repoPath = cvs_modules2Location[packageName]
+    else:
+        pathToGitRepo = determinePathToGitRepo( packageSpec, verbose=verbose )
+        if pathToGitRepo:
+            if "svn" in pathToGitRepo:
+                # svn REPO
+                dirName = "current"
+                tags = svnGetRemoteTags( pathToGitRepo, verbose=verbose )
+            else:
+                # git REPO
+                dirName = packageName + "-git"
+                tags = gitGetRemoteTags( pathToGitRepo, verbose=verbose )
+    return ( repoPath, dirName, tags )
+
+class TagPrefetcher( object ):
+    '''Runs getPackageTags on background threads so the tags are ready for the tag prompt'''
+    def __init__( self ):
+        self._lock      = threading.Lock()
+        self._threads   = {}
+        self._results   = {}
+
+    def prefetch( self, packageSpec ):
+        with self._lock:
+            if packageSpec in self._threads:
+                return
+            thread = threading.Thread( target=self._fetch, args=( packageSpec, ), daemon=True )
+            self._threads[packageSpec] = thread
+        thread.start()
+
+    def _fetch( self, packageSpec ):
+        try:
+            result = getPackageTags( packageSpec )
+        except Exception:
+            # getTags() will retry in the foreground and report the error
+            result = None
+        with self._lock:
+            self._results[packageSpec] = result
+
+    def getTags( self, packageSpec, verbose=False ):
+        '''Returns the getPackageTags() result for packageSpec, waiting for a prefetch if needed'''
+        with self._lock:
+            thread = self._threads.get( packageSpec )
+        if thread is not None:
+            thread.join()
+            with self._lock:
+                result = self._results.get( packageSpec )
+            if result is not None:
+                return result
+        return getPackageTags( packageSpec, verbose=verbose )
+
+# TODO: Combine assemble_env_inputs_from_term and assemble_env_inputs_from_file into one function w/ a from_file boolean
 # Determine the package and tag to checkout
 def assemble_env_inputs_from_term(options):
 
@@ -75,16 +176,14 @@ def assemble_env_inputs_from_term(options):
         packageSpec = options.module
         packageName = os.path.split(packageSpec)[1]
 
-    packageNames = set().union(list(git_package2Location.keys()), list(cvs_modules2Location.keys()))
-
-    def packageNameCompleter(text, state):
-        options = [x for x in packageNames if x.startswith(text)]
-        try:
-            return options[state]
-        except IndexError:
-            return None
+    tagPrefetcher = TagPrefetcher()
+    if packageName and not getattr( options, 'tag', None ):
+        tagPrefetcher.prefetch( packageSpec )
 
-    readline.set_completer(packageNameCompleter)
+    # Start fetching the tags as soon as the package name completes to a unique match
+    packageNameCompleter = PrefixCompleter( list(git_package2Location.keys()) + list(cvs_modules2Location.keys()),
+                                            onUnique=tagPrefetcher.prefetch )
+    readline.set_completer(packageNameCompleter.complete)
     readline.parse_and_bind("tab: complete")
 
     while not packageName:
@@ -102,43 +201,17 @@ def assemble_env_inputs_from_term(options):
     if hasattr(options, 'tag') and options.tag:
         tagName = options.tag
     else:
-        tags = []
-        if packageSpec in git_package2Location:
-            repoPath = git_package2Location[packageSpec]
-        elif packageName in git_package2Location:
-            repoPath = git_package2Location[packageName]
-        elif packageName in cvs_modules2Location and os.path.isdir( DEF_CVS_ROOT ):            
-            # cvs REPO
-            if not dirName:
-                dirName = 'MAIN_TRUNK'
-            tags = cvsGetRemoteTags( packageName )
-            repoPath = cvs_modules2Location[packageName]
-        else:
-            pathToGitRepo = determinePathToGitRepo( packageSpec, verbose=options.verbose )
-            if pathToGitRepo:
-                if "svn" in pathToGitRepo:
-                    # svn REPO
-                    if not dirName:
-                        dirName = "current"
-                    tags = svnGetRemoteTags( pathToGitRepo, verbose=options.verbose )
-                else:
-                    # git REPO
-                    if not dirName:
-                        dirName = packageName + "-git"
-                    tags = gitGetRemoteTags( pathToGitRepo, verbose=options.verbose )
-
-        if len(tags) > 0:            
-            def tagCompleter(text, state):
-                options = [x for x in tags if x.startswith(text)]
-                try:
-                    return options[state]
-                except IndexError:
-                    return None
-            readline.set_completer(tagCompleter)
+        ( repoPath, dirName, tags ) = tagPrefetcher.getTags( packageSpec, verbose=options.verbose )
+
+        if len(tags) > 0:
+            tagCompleter = PrefixCompleter( tags )
+            readline.set_completer(tagCompleter.complete)
             readline.set_completer_delims(" \t\n")
             readline.parse_and_bind("tab: complete")
 
         if not options.batch:
+            if not dirName:
+                dirName = packageName + "-git"
             prompt1 = 'Enter name of tag or [RETURN] to create a sandbox named %s>' % dirName
             tagName = input(prompt1).strip()
 
@@ -171,8 +244,12 @@ def assemble_env_inputs_from_term(options):
 
     checkOutModule( packageSpec, repoPath, tagName, destinationPath, options )
 
-# Determine the package and tag to checkout
-def assemble_env_inputs_from_file(packageSpec, tagName, options):
+def resolveFileEntry( packageSpec, tagName, options ):
+    '''
+    Determine the repo, tag, and destination for a packageSpec and tag
+    read from a module list file.
+    Returns ( repoPath, tagName, destinationPath )
+    '''
     repoPath	= None
     packageName = os.path.split(packageSpec)[1]
     if packageSpec in cvs_modules2Location and os.path.isdir( DEF_CVS_ROOT ):            
@@ -213,40 +290,35 @@ def assemble_env_inputs_from_file(packageSpec, tagName, options):
         if options.createParent or dirName != (packageName + "-git"):
             destinationPath = os.path.join( packageName, dirName )
 
+    return ( repoPath, tagName, destinationPath )
+
+# Determine the package and tag to checkout
+def assemble_env_inputs_from_file(packageSpec, tagName, options):
+    ( repoPath, tagName, destinationPath ) = resolveFileEntry( packageSpec, tagName, options )
     checkOutModule( packageSpec, repoPath, tagName, destinationPath, options, from_file=True )
- 
-def checkOutModule(packageSpec, repoPath, tag, destinationPath, options, from_file=False ):
-    '''Checkout the module from GIT/CVS. 
-    We first check to see if GIT has the module; if so, we clone the repo from git and do a headless checkout for the selected tag.
-    Otherwise, we issue a command to CVS.
-    '''
 
+class CheckoutError( Exception ):
+    pass
+
+def checkOutPackage( packageSpec, repoPath, tag, destinationPath, strategy=None, verbose=False ):
+    '''
+    Checkout the package from GIT/SVN/CVS to destinationPath w/o changing the current directory.
+    strategy is the git clone strategy, defaults to DEF_GIT_SANDBOX_STRATEGY
+    Raises CheckoutError on failure.
+    '''
     packageName = os.path.split(packageSpec)[1]
-    if tag == '':
-        print("Checkout %s to sandbox directory %s" % ( packageName, destinationPath ))
-    else:
-        print("Checkout %s, tag %s, to directory %s" % ( packageName, tag, destinationPath ))
-    if not options.batch:
-        confirmResp = input( 'Proceed (Y/n)?' )
-        if len(confirmResp) != 0 and confirmResp != "Y" and confirmResp != "y":
-            print("Aborting.....")
-            sys.exit(0)
 
     # TODO: Can we update existing dir using repo?
     if os.path.exists(destinationPath):
-        print('Directory already exists!  Aborting.....')
-        sys.exit(1)
+        raise CheckoutError( 'Directory %s already exists!' % destinationPath )
 
     parent_dir = os.path.dirname( destinationPath )
     if len(parent_dir) > 0 and parent_dir != '.' and not os.path.exists(parent_dir):
         try:
             os.makedirs(parent_dir, 0o775)
         except OSError as e:
-            sys.stderr.write( 'Unable to create directory: %s\n' % parent_dir )
-            sys.exit(1)
-
-    # Remember current dir
-    curDir = os.getcwd()
+            if not os.path.isdir(parent_dir):
+                raise CheckoutError( 'Unable to create directory: %s' % parent_dir )
 
     #
     # TODO: Move this git vs svn vs cvs stuff to the Repo class and it's subclasses
@@ -257,97 +329,208 @@ def checkOutModule(packageSpec, repoPath, tag, destinationPath, options, from_fi
         # See if we can find it in with the git repos
         repoPath = determinePathToGitRepo(packageSpec)
     if not repoPath:
-        print("Unable to determine repo path for %s" % packageSpec)
-        return
+        raise CheckoutError( "Unable to determine repo path for %s" % packageSpec )
 
-    if "git" not in repoPath and "svn" not in repoPath and cvs_modules2Location is not None:
-        # Do CVS checkout
-        if (tag == 'MAIN_TRUNK'):
-            cmd='cvs checkout -P -d ' + destinationPath + ' ' + packageSpec    
-            print(cmd)
-        else:
-            cmd='cvs checkout -P -r '+ tag +' -d '+ destinationPath +' ' + packageSpec    
-            print(cmd)
-        os.system(cmd)
-        if not os.path.isdir(destinationPath):
-            sys.stderr.write( "Error: unable to do cvs checkout of %s\n" % packageSpec )
-            sys.exit(1)
-        os.chdir(destinationPath)
-    else:
-        pathToSvnRepo = None
-        if  repoPath.startswith("file:///"):
-            pathToSvnRepo = repoPath
-        if  repoPath.startswith("svn:///"):
-            pathToSvnRepo = repoPath.replace("svn:///", "file:///")
-        if  pathToSvnRepo:
-            if ( not tag or tag == 'current' ):
-                pathToSvnRepo = pathToSvnRepo.replace("tags","trunk")
+    try:
+        if "git" not in repoPath and "svn" not in repoPath and cvs_modules2Location is not None:
+            # Do CVS checkout
+            if (tag == 'MAIN_TRUNK'):
+                cmd=[ 'cvs', 'checkout', '-P', '-d', destinationPath, packageSpec ]
             else:
-                pathToSvnRepo = pathToSvnRepo.replace( "trunk/pcds/epics/extensions","epics/tags/extensions" )
-                pathToSvnRepo = pathToSvnRepo.replace( "trunk/pcds/epics/modules","epics/tags/modules" )
-                pathToSvnRepo = pathToSvnRepo.replace( "trunk","tags" )
-                pathToSvnRepo = pathToSvnRepo.replace( "current",tag )
-            cmd=[ 'svn', 'checkout', pathToSvnRepo, destinationPath ]
-            print(cmd)
-            subprocess.check_call(cmd)
+                cmd=[ 'cvs', 'checkout', '-P', '-r', tag, '-d', destinationPath, packageSpec ]
+            print(' '.join(cmd))
+            cmd_call(cmd)
             if not os.path.isdir(destinationPath):
-                sys.stderr.write( "Error: unable to do svn checkout of %s\n" % packageName )
-                sys.exit(1)
-            os.chdir(destinationPath)
+                raise CheckoutError( "Error: unable to do cvs checkout of %s" % packageSpec )
         else:
-            print(packageName, "is a git package.\nCloning the repository at", repoPath)
-            if os.path.exists(destinationPath):
-                print("The folder", os.path.abspath(destinationPath), "already exists. If you intended to update the checkout, please do a git pull to pull in the latest changes.")
-                print("Aborting.....")
-                sys.exit(1)
-            # TODO: Verify the tag exists before we clone the repo for better user error msg and to avoid broken release dirs
-            branch = None
-            depth  = None
-            if (tag != ''):
-                branch = tag
-                # Don't do shallow clone for eco as users may want to fix bugs, retag, and push from there.
-                # depth  = DEF_GIT_RELEASE_DEPTH
-            cloneUpstreamRepo( repoPath, destinationPath, '', branch=branch, depth=depth, verbose=options.verbose )
-            os.chdir(destinationPath)
-            if (tag != ''):
-                # Do a headless checkout to the specified tag
-                cmd=['git', 'checkout', tag]
+            pathToSvnRepo = None
+            if  repoPath.startswith("file:///"):
+                pathToSvnRepo = repoPath
+            if  repoPath.startswith("svn:///"):
+                pathToSvnRepo = repoPath.replace("svn:///", "file:///")
+            if  pathToSvnRepo:
+                if ( not tag or tag == 'current' ):
+                    pathToSvnRepo = pathToSvnRepo.replace("tags","trunk")
+                else:
+                    pathToSvnRepo = pathToSvnRepo.replace( "trunk/pcds/epics/extensions","epics/tags/extensions" )
+                    pathToSvnRepo = pathToSvnRepo.replace( "trunk/pcds/epics/modules","epics/tags/modules" )
+                    pathToSvnRepo = pathToSvnRepo.replace( "trunk","tags" )
+                    pathToSvnRepo = pathToSvnRepo.replace( "current",tag )
+                cmd=[ 'svn', 'checkout', pathToSvnRepo, destinationPath ]
                 print(cmd)
-                subprocess.check_call(cmd)
-            #else: TODO Checkout a default branch if one isn't already selected.
-            # 1. current release branch
-            # 2. trunk
-            # 3. slac-trunk
-            # 4. lcls-trunk
-            # 5. pcds-trunk
-
-    # See if we need to create or update a RELEASE_SITE file
-    # Not needed if this is an EPICS base package
-    # If the package has a configure/RELEASE file, make sure we either have
-    # a valid RELEASE_SITE in TOP/../..
-    # or provide and/or update TOP/RELEASE_SITE as needed
-
+                cmd_check_call(cmd)
+                if not os.path.isdir(destinationPath):
+                    raise CheckoutError( "Error: unable to do svn checkout of %s" % packageName )
+            else:
+                print(packageName, "is a git package.\nCloning the repository at", repoPath)
+                # TODO: Verify the tag exists before we clone the repo for better user error msg and to avoid broken release dirs
+                branch = None
+                if (tag != ''):
+                    branch = tag
+                # Default to a full clone for eco as users may want to fix bugs, retag, and push from there.
+                if strategy is None:
+                    strategy = DEF_GIT_SANDBOX_STRATEGY
+                cloneUpstreamRepo( repoPath, destinationPath, '', branch=branch, strategy=strategy, verbose=verbose )
+                if (tag != ''):
+                    # Do a headless checkout to the specified tag
+                    cmd=['git', '-C', destinationPath, 'checkout', tag]
+                    print(cmd)
+                    cmd_check_call(cmd)
+                #else: TODO Checkout a default branch if one isn't already selected.
+                # 1. current release branch
+                # 2. trunk
+                # 3. slac-trunk
+                # 4. lcls-trunk
+                # 5. pcds-trunk
+    except ( OSError, RuntimeError, subprocess.CalledProcessError ) as e:
+        raise CheckoutError( "Error: unable to checkout %s: %s" % ( packageSpec, e ) )
+
+def needsReleaseSite( topDir ):
+    '''
+    See if we need to create or update a RELEASE_SITE file
+    Not needed if this is an EPICS base package
+    If the package has a configure/RELEASE file, make sure we either have
+    a valid RELEASE_SITE in TOP/../..
+    or provide and/or update TOP/RELEASE_SITE as needed
+    '''
     # Check if any configuration file has included ../../RELEASE_SITE and if
     # ../../RELEASE_SITE exists.
-    hasDotDotRelease = (hasIncludeDotDotReleaseSite() and
-                       os.path.isfile( os.path.join( curDir, destinationPath, 
-                                                  '..', '..', 'RELEASE_SITE' )))
-
-    if  (       not isBaseTop(      os.path.join( curDir, destinationPath ) )
-            and     isEpicsPackage( os.path.join( curDir, destinationPath ) )
-            and not hasDotDotRelease
-            # Step on a RELEASE_SITE pulled from the repo? No for PCDS, Yes for LCLS
-            # TODO: Add a user prompt here w/ appropriate default
-            and (   not isPCDSPath( curDir )
-                or  not os.path.isfile( os.path.join(curDir, destinationPath, 'RELEASE_SITE') ) ) ):
+    topDir = os.path.abspath( topDir )
+    hasDotDotRelease = (hasIncludeDotDotReleaseSite( topDir ) and
+                       os.path.isfile( os.path.join( topDir, '..', '..', 'RELEASE_SITE' )))
+
+    return  (       not isBaseTop( topDir )
+                and     isEpicsPackage( topDir )
+                and not hasDotDotRelease
+                # Step on a RELEASE_SITE pulled from the repo? No for PCDS, Yes for LCLS
+                # TODO: Add a user prompt here w/ appropriate default
+                and (   not isPCDSPath( os.getcwd() )
+                    or  not os.path.isfile( os.path.join( topDir, 'RELEASE_SITE' ) ) ) )
+
+def checkOutModule(packageSpec, repoPath, tag, destinationPath, options, from_file=False ):
+    '''Checkout the module from GIT/CVS. 
+    We first check to see if GIT has the module; if so, we clone the repo from git and do a headless checkout for the selected tag.
+    Otherwise, we issue a command to CVS.
+    '''
+
+    packageName = os.path.split(packageSpec)[1]
+    if tag == '':
+        print("Checkout %s to sandbox directory %s" % ( packageName, destinationPath ))
+    else:
+        print("Checkout %s, tag %s, to directory %s" % ( packageName, tag, destinationPath ))
+    if not options.batch:
+        confirmResp = input( 'Proceed (Y/n)?' )
+        if len(confirmResp) != 0 and confirmResp != "Y" and confirmResp != "y":
+            print("Aborting.....")
+            sys.exit(0)
+
+    if not repoPath:
+        # See if we can find it in with the git repos
+        repoPath = determinePathToGitRepo(packageSpec)
+    if not repoPath:
+        print("Unable to determine repo path for %s" % packageSpec)
+        return
+
+    try:
+        checkOutPackage( packageSpec, repoPath, tag, destinationPath, strategy=options.strategy, verbose=options.verbose )
+    except CheckoutError as e:
+        sys.stderr.write( '%s\nAborting.....\n' % e )
+        sys.exit(1)
+
+    if needsReleaseSite( destinationPath ):
         if from_file:
             inputs = assemble_release_site_inputs( batch=True )
         else:
             inputs = assemble_release_site_inputs( batch=options.batch )
-        export_release_site_file( inputs, debug=options.debug )
+        export_release_site_file( inputs, topDir=destinationPath, debug=options.debug )
 
-    # Restore current working dir
-    os.chdir(curDir)
+def readModuleListFile( inputFilePath ):
+    '''Read ( packageSpec, tag ) pairs, one per line, from a module list file'''
+    entries = []
+    with open( inputFilePath, 'r' ) as in_file:
+        for line in in_file:
+            # Remove comments
+            line = line.partition('#')[0]
+
+            # Turn 'a = b' into a key/value pair and remove leading and trailing whitespace
+            (key, sep, value) = line.partition(' ')
+            key = key.strip()
+            value = value.strip()
+            if not key:
+                continue
+            entries.append( ( key, value ) )
+    return entries
+
+def checkOutModuleList( entries, options ):
+    '''
+    Checkout each ( packageSpec, tag ) entry.
+    Repos and destinations are resolved for all entries first,
+    then the checkouts are done concurrently w/ up to options.jobs at a time.
+    Prints a report for each module and returns the number of failed checkouts.
+    '''
+    # Resolve all the entries up front
+    checkouts = [ ]
+    results   = { }
+    destinationPaths = { }
+    for ( packageSpec, tagName ) in entries:
+        ( repoPath, tagName, destinationPath ) = resolveFileEntry( packageSpec, tagName, options )
+        iCheckout = len(checkouts)
+        checkouts.append( ( packageSpec, repoPath, tagName, destinationPath ) )
+        if not repoPath:
+            results[iCheckout] = "Unable to determine repo path for %s" % packageSpec
+        elif destinationPath in destinationPaths:
+            results[iCheckout] = "Same destination as %s" % destinationPaths[destinationPath]
+        elif os.path.exists( destinationPath ):
+            results[iCheckout] = "Directory %s already exists!" % destinationPath
+        else:
+            destinationPaths[destinationPath] = packageSpec
+
+    for iCheckout, checkout in enumerate( checkouts ):
+        ( packageSpec, repoPath, tagName, destinationPath ) = checkout
+        if iCheckout not in results:
+            print("Checkout %s, tag %s, to directory %s" % ( packageSpec, tagName, destinationPath ))
+    if not options.batch:
+        confirmResp = input( 'Proceed (Y/n)?' )
+        if len(confirmResp) != 0 and confirmResp != "Y" and confirmResp != "y":
+            print("Aborting.....")
+            return 0
+
+    releaseSiteLock   = threading.Lock()
+    releaseSiteInputs = { }
+    def checkOutEntry( checkout ):
+        ( packageSpec, repoPath, tagName, destinationPath ) = checkout
+        checkOutPackage( packageSpec, repoPath, tagName, destinationPath, strategy=options.strategy, verbose=options.verbose )
+        if needsReleaseSite( destinationPath ):
+            with releaseSiteLock:
+                if not releaseSiteInputs:
+                    releaseSiteInputs.update( assemble_release_site_inputs( batch=True ) )
+            export_release_site_file( releaseSiteInputs, topDir=destinationPath, debug=options.debug )
+        return None
+
+    with concurrent.futures.ThreadPoolExecutor( max_workers=max( 1, options.jobs ) ) as executor:
+        futures = { }
+        for iCheckout, checkout in enumerate( checkouts ):
+            if iCheckout not in results:
+                futures[ executor.submit( checkOutEntry, checkout ) ] = iCheckout
+        for future in concurrent.futures.as_completed( futures ):
+            try:
+                results[ futures[future] ] = future.result()
+            except CheckoutError as e:
+                results[ futures[future] ] = str(e)
+            except Exception as e:
+                results[ futures[future] ] = "Unexpected error: %s" % e
+
+    nFailed = 0
+    print("\nCheckout report:")
+    for iCheckout, checkout in enumerate( checkouts ):
+        ( packageSpec, repoPath, tagName, destinationPath ) = checkout
+        if results[iCheckout] is None:
+            print("    %-24s %-24s OK: %s" % ( packageSpec, tagName, destinationPath ))
+        else:
+            nFailed += 1
+            print("    %-24s %-24s FAILED: %s" % ( packageSpec, tagName, results[iCheckout] ))
+    print("%d of %d modules checked out" % ( len(checkouts) - nFailed, len(checkouts) ))
+    return nFailed
 
 def initGitBareRepo( options ):
     '''Initialize a bare repo in the user specified folder'''
@@ -467,12 +650,18 @@ def process_options(argv):
     parser.add_option('-m', '--module',  action='callback', dest='module', help='Module to checkout, optionally add the tag to use', type='string', callback=module_callback)
     parser.add_option('-d', '--destination',  action='store', dest='destination', help='Checkout the package to this folder. Uses cvs -d. For example, eco -d CATER_12345 on MAIN_TRUNK checks out MAIN_TRUNK into a folder called CATER_12345. This option is ignored in batch mode.', type='string')
     # parser.add_option('-t', '--tag',  action='store', dest='tag', help='CVS tag to checkout - defaults to MAIN_TRUNK', type='string', default='MAIN_TRUNK')
+    parser.add_option('-j', '--jobs',  action='store', dest='jobs', type='int', default=DEF_ECO_CHECKOUT_JOBS, help='Max number of concurrent checkouts for a module list file. Default %d' % DEF_ECO_CHECKOUT_JOBS)
+    parser.add_option('-s', '--strategy',  action='store', dest='strategy', type='choice', choices=gitCloneStrategies, default=DEF_GIT_SANDBOX_STRATEGY,
+                      help='git clone strategy, one of %s. Default %s' % ( ', '.join(gitCloneStrategies), DEF_GIT_SANDBOX_STRATEGY ) )
     parser.add_option( '--debug', action='store_true', dest='debug', help='print debugging output')
+    parser.add_option( '--profile', action='store_true', dest='profile', help='show the time spent in each kind of external command when done')
 
     parser.set_defaults(verbose=False,
         db_file=None)
 
     (options, args) = parser.parse_args(argv)
+    if options.profile:
+        enableProfile()
 
     if len(args) == 1:
         options.input_file_path = os.path.normcase(args[0])
@@ -493,30 +682,13 @@ def main(argv=None):
             commands[options.input_file_path]( options )
             return
         try:
-            in_file = open(options.input_file_path, 'r')
+            entries = readModuleListFile( options.input_file_path )
         except IOError as e:
             sys.stderr.write('Could not open module specification file "%s": %s\n' % (options.input_file_path, e.strerror))
             return None
 
-        # Read in pairs (package release) one per line
-        for line in in_file:
-            # Remove comments
-            line = line.partition('#')[0]
-
-            # Turn 'a = b' into a key/value pair and remove leading and trailing whitespace
-            (key, sep, value) = line.partition(' ')
-            key = key.strip()
-            value = value.strip()
-
-            print('key is: ' + key)
-            print('value is: ' + value)
-
-            assemble_env_inputs_from_file(key,value,options)
-           
-            print('done with ' + line)
-            # repeat above for all lines in file
-
-        in_file.close()
+        if checkOutModuleList( entries, options ) > 0:
+            return 1
 
     else:
         assemble_env_inputs_from_term(options)
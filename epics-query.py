@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#==============================================================
+#
+#  epics-query.py:  Find the releases under an EPICS site top that match a query
+#
+#  Examples:
+#      epics-query "package ~ ioc/* and uses asyn < R4.35 and base ~ R7.0.3*"
+#      epics-query "depends ADCore >= R3.9 and not name = ADSimDetector"
+#      epics-query --ndjson "uses mod003 = R1.2.0"
+#      epics-query --parent ioc/common/gigECam/R1.20.5
+#
+#  Queries run against an inventory of the site's releases and their
+#  dependencies, which is saved in the eco_tools cache dir and refreshed
+#  when it's older than DEF_ECO_INVENTORY_MAX_AGE seconds.
+#  See query_utils.py for the query syntax.
+#
+#==============================================================
+import os
+import sys
+import json
+import argparse
+from repo_defaults import *
+from cmd_utils import *
+from site_utils import *
+from query_utils import *
+from SiteInventory import SiteInventory
+
+def process_options( argv ):
+    parser = argparse.ArgumentParser( description='Find the EPICS releases that match a query, ex. "package ~ ioc/* and uses asyn < R4.35".',
+                                      epilog='Fields: name, package, path w/ = != ~.  version, base w/ = != ~ < <= > >=.  '
+                                             'Dependencies: depends PKG [op VERSION], uses PKG [op VERSION] for direct or transitive.  '
+                                             'Combine w/ and, or, not and parentheses.' )
+    parser.add_argument( 'query', nargs='*', help='Query expression.  Multiple args are joined w/ spaces.' )
+    parser.add_argument( '--parent', action='append', default=[],
+                         help='Show the templated IOC instances whose parent is this release, ex. ioc/common/gigECam/R1.20.5.  May be repeated.' )
+    parser.add_argument( '--top', help='EPICS site top to search.  Defaults to EPICS_SITE_TOP.' )
+    parser.add_argument( '--refresh', action='store_true', help='Rescan the site for changed releases before the query.' )
+    parser.add_argument( '--ndjson', action='store_true', help='Show one JSON object per release.' )
+    parser.add_argument( '-v', '--verbose', action='store_true', help='Show the dependencies of each release.' )
+    parser.add_argument( '--profile', action='store_true', help='Show the time spent in each kind of external command when done.' )
+    return parser.parse_args( argv )
+
+def main( argv=None ):
+    options = process_options( argv )
+    if options.profile:
+        enableProfile()
+
+    siteTop = options.top if options.top else determine_epics_site_top()
+    if not siteTop or not os.path.isdir( siteTop ):
+        print("epics-query Error: Unable to determine the EPICS site top.  Set EPICS_SITE_TOP or use --top.")
+        return 1
+    if not options.query and not options.parent:
+        print("epics-query Error: Need a query or --parent")
+        return 1
+    expr = None
+    try:
+        if options.query:
+            expr = parseQuery( ' '.join( options.query ) )
+    except QueryError as e:
+        print("epics-query Error: %s" % e)
+        return 1
+
+    inventory = SiteInventory( siteTop, verbose=options.verbose )
+    if options.refresh or inventory.isStale():
+        inventory.refresh()
+
+    for parentSpec in options.parent:
+        instances = inventory.getIocInstances( parentSpec )
+        for ( relPath, iocName, cfgPath ) in instances:
+            if options.ndjson:
+                print(json.dumps( { 'ioc': iocName, 'release': os.path.join( inventory.getSiteTop(), relPath ),
+                                    'cfg': cfgPath, 'parent': inventory.getReleases()[relPath]['iocs'][iocName]['parent'] },
+                                  sort_keys=True ))
+            else:
+                print("%20s %s" % ( iocName, cfgPath ))
+        if not options.ndjson:
+            print("%d IOC instances of %s" % ( len(instances), parentSpec ))
+    if expr is None:
+        return 0
+
+    releases = inventory.getReleases()
+    matches = sorted( evalQuery( inventory, expr ),
+                      key=lambda relPath: ( releases[relPath]['package'], VersionToRelKey( releases[relPath]['version'] ) ) )
+    for relPath in matches:
+        release = releases[relPath]
+        if options.ndjson:
+            print(json.dumps( { 'path': os.path.join( inventory.getSiteTop(), relPath ), 'package': release['package'],
+                                'version': release['version'], 'base': release['base'], 'depends': release['depends'] },
+                              sort_keys=True ))
+            continue
+        print("%18s/%-20s %18s/%s" % ( release['package'], release['version'], "base", release['base'] or '?' ))
+        if options.verbose:
+            for depName in sorted( release['depends'] ):
+                print("%20s%18s %19s/%s" % ( '', depName, depName, release['depends'][depName] ))
+    if not options.ndjson:
+        print("%d releases matched" % len(matches))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -16,6 +16,7 @@ import subprocess
 import stat
 import os
 import subprocess
+from cmd_utils import *
 from cram_utils import *
 from git_utils import *
 from svn_utils import *
@@ -214,12 +215,16 @@ try:
                         help="do not erase the temp build directory" )
     parser.add_option(	"",	  "--batch", dest="batch", action="store_true",
                         help="do not prompt for confirmation" )
+    parser.add_option(	"",	  "--profile", dest="profile", action="store_true",
+                        help="show the time spent in each kind of external command when done" )
     # Future options
     #add_option( "--repo", "repository address."
     #add_option( "--prefix", "path to the root of the release area"
 
     # Parse the command line arguments
     ( opt, args ) = parser.parse_args()
+    if opt.profile:
+        enableProfile()
 
     if not opt.release:
         raise ValidateError( "Release tag not specified!" )
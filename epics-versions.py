@@ -1,19 +1,19 @@
 #!/usr/bin/env python3
 
-import re
 import sys
 import optparse
-import subprocess
-import fileinput
 import glob
 import os
 import pprint
 import signal
 import traceback
-import subprocess
+import json
+import concurrent.futures
 
 from repo_defaults import *
+from cmd_utils import *
 from site_utils import *
+from git_utils import *
 from version_utils import *
 from pkgNamesToMacroNames import *
 from eco_version import eco_tools_version
@@ -67,8 +67,8 @@ debugScript         = False
 # Create a pretty printer for nicer diagnostics
 pp  = pprint.PrettyPrinter( indent=4 )
 
-# Pre-compile regular expressions for speed
-parentRegExp        = re.compile( r"RELEASE\s*=\s*(\S*)\s*$" )
+# Directory listings shared by all the ExpandPackagePath() calls
+dirCache            = DirCache()
 
 class ValidateError( Exception ):
     pass
@@ -118,17 +118,11 @@ def ReportDependents( module, pkgDependents, wide=False, recurse=True ):
 
 def ReportRelease( pkgPath, release, priorModule, opt ):
     ''' Get the module and version from the release string. '''
-    cmdList = [ "readlink", "-e", release ]
-    cmdOutput = subprocess.check_output( cmdList ).splitlines()
-    if len(cmdOutput) == 1:
-        release = str(cmdOutput[0])
+    release = os.path.realpath( release )
     ( relPath, moduleVersion ) = os.path.split( release )
     # Simplify the module path by removing the default module release
     # portion of the path
-    cmdList = [ "readlink", "-e", pkgPath ]
-    cmdOutput = subprocess.check_output( cmdList ).splitlines()
-    if len(cmdOutput) == 1:
-        pkgPath = str(cmdOutput[0])
+    pkgPath = os.path.realpath( pkgPath )
     #relPath = relPath.replace( "slac.stanford.edu", "slac" )
     relPath = relPath.replace( pkgPath + "/", "" )
 
@@ -184,43 +178,177 @@ def ReportRelease( pkgPath, release, priorModule, opt ):
         # Show parent release for each ioc
         configFiles = glob.glob( os.path.join( release, "*.cfg" ) )
         for configFile in configFiles:
-            for line in fileinput.input( configFile ):
-                match = parentRegExp.search( line )
-                if match:
-                    iocName = os.path.basename(configFile).replace( '.cfg', '' )
-                    parentRelease = match.group(1)
-                    # Grab the last 4 directories
-                    # i.e. ioc/common/gigECam/R1.20.5
-                    parentName    = os.path.dirname( parentRelease )
-                    parentRelease = os.path.basename( parentRelease )
-                    for i in [0,1,2]:
-                        (parentName, parentTail) = os.path.split( parentName )
-                        if not parentName:
-                            break
-                        parentRelease = os.path.join( parentTail, parentRelease ) 
-                    if opt.wide:
-                        # Don't print newline in wide mode 
-                        print(" %s/%s" % ( iocName, parentRelease ), end=' ')
-                    else:
-                        print("%-4s %20s/%s" % ( '', iocName, parentRelease ))
+            parentRelease = getIocConfigParent( configFile )
+            if parentRelease:
+                iocName = os.path.basename(configFile).replace( '.cfg', '' )
+                # Grab the last 4 directories
+                # i.e. ioc/common/gigECam/R1.20.5
+                parentName    = os.path.dirname( parentRelease )
+                parentRelease = os.path.basename( parentRelease )
+                for i in [0,1,2]:
+                    (parentName, parentTail) = os.path.split( parentName )
+                    if not parentName:
+                        break
+                    parentRelease = os.path.join( parentTail, parentRelease ) 
+                if opt.wide:
+                    # Don't print newline in wide mode 
+                    print(" %s/%s" % ( iocName, parentRelease ), end=' ')
+                else:
+                    print("%-4s %20s/%s" % ( '', iocName, parentRelease ))
         if opt.wide:
             print()
 
     return module
 
+def ReportRepoRelease( pkgSpec, opt ):
+    '''
+    Report on a release from its git repo, w/o a checkout.
+    pkgSpec is PKG/TAG, or just PKG for the newest tag.
+    Returns the number of releases reported.
+    '''
+    # See if pkgSpec is just a package w/o a tag
+    ( packagePath, tag, urls ) = gitPackageRepoUrls( pkgSpec, 'HEAD', verbose=opt.debug )
+    urls = [ url for url in urls if os.path.isdir( url ) ]
+    if urls:
+        tags = getRepoReleaseTags( urls[0], opt )
+        if not tags:
+            print("%s: No tags found in %s" % ( pkgSpec, urls[0] ))
+            return 0
+        tag = tags[-1]
+    else:
+        ( packagePath, tag ) = os.path.split( pkgSpec )
+    ( repo_url, repo_tag ) = gitFindPackageRelease( packagePath, tag, debug=opt.debug, verbose=opt.debug )
+    if repo_url is None:
+        print("%s/%s: Release not found in git." % ( packagePath, tag ))
+        return 0
+    if not os.path.isdir( repo_url ):
+        print("%s/%s: --repo needs a local git repo, not %s" % ( packagePath, tag, repo_url ))
+        return 0
+
+    module = os.path.split( packagePath )[1]
+    siteMacros = getSiteReleaseMacros( opt.base )
+    if 'EPICS_MODULES' in siteMacros:
+        topDir = os.path.join( siteMacros['EPICS_MODULES'], module, repo_tag )
+    else:
+        topDir = os.path.join( os.getcwd(), module, repo_tag )
+    pkgDependents = gitGetPkgDependents( repo_url, repo_tag, topDir, siteMacros=siteMacros, debug=opt.debug )
+    baseVer = pkgDependents.get( 'base', '?' )
+    if opt.wide:
+        print("%s/%s base/%s" % ( module, repo_tag, baseVer ), end=' ')
+    else:
+        print("%18s/%-20s %18s/%s" % ( module, repo_tag, "base", baseVer ))
+    if opt.verbose:
+        ReportDependents( module, pkgDependents, wide=opt.wide, recurse=False )
+    if opt.wide:
+        print()
+
+    if opt.verbose:
+        # Show the order the dependencies could be built in
+        ( releases, buildOrder ) = gitGetDependencyPlan( packagePath, repo_tag, verbose=opt.debug )
+        print("Build order for %s/%s:" % ( module, repo_tag ))
+        for level in range( len(buildOrder) ):
+            print("%4d: %s" % ( level + 1, ' '.join( [ '%s/%s' % release for release in buildOrder[level] ] ) ))
+    return 1
+
+def getRepoReleaseTags( repo_url, opt ):
+    '''Returns the list of tags in a git repo, oldest release first'''
+    tags = [ t for t in gitGetRemoteTags( repo_url, debug=opt.debug ) if not t.endswith( '^{}' ) ]
+    return sorted( tags, key=lambda t: ( VersionToRelNumber( t ), t ) )
+
+def ReportRepoHistory( pkgSpec, opt ):
+    '''
+    Report how the dependencies of a package changed from tag to tag, read from its git repo.
+    Tags w/ the same dependencies as the prior tag are only shown w/ --all.
+    Returns the number of tags reported.
+    '''
+    ( packagePath, tag, urls ) = gitPackageRepoUrls( pkgSpec, 'HEAD', verbose=opt.debug )
+    urls = [ url for url in urls if os.path.isdir( url ) ]
+    if not urls:
+        print("%s: No local git repo found." % pkgSpec)
+        return 0
+    tags = getRepoReleaseTags( urls[0], opt )
+    module = os.path.split( packagePath )[1]
+    siteMacros = getSiteReleaseMacros( opt.base )
+    topDir = os.path.join( siteMacros.get( 'EPICS_MODULES', os.getcwd() ), module, '$TAG' )
+    history = gitGetPkgDependentsHistory( urls[0], tags, topDir, siteMacros=siteMacros, debug=opt.debug )
+
+    if not opt.ndjson:
+        print("%s: %d tags in %s" % ( module, len(tags), urls[0] ))
+    priorDependents = None
+    for ( tag, pkgDependents ) in history:
+        if opt.base and pkgDependents.get( 'base' ) != opt.base:
+            continue
+        prior   = priorDependents if priorDependents is not None else {}
+        added   = dict( [ ( d, v ) for ( d, v ) in pkgDependents.items() if d not in prior ] )
+        removed = dict( [ ( d, v ) for ( d, v ) in prior.items() if d not in pkgDependents ] )
+        changed = dict( [ ( d, [ prior[d], v ] ) for ( d, v ) in pkgDependents.items()
+                          if d in prior and prior[d] != v ] )
+        if priorDependents is not None and not ( added or removed or changed ) and not opt.showAll:
+            continue
+        priorDependents = pkgDependents
+        if opt.ndjson:
+            print(json.dumps( { 'module': module, 'tag': tag, 'depends': pkgDependents,
+                                'added': added, 'removed': removed, 'changed': changed }, sort_keys=True ))
+            continue
+        changes  = [ '+%s/%s' % ( d, added[d] ) for d in sorted( added ) ]
+        changes += [ '-%s/%s' % ( d, removed[d] ) for d in sorted( removed ) ]
+        changes += [ '%s/%s->%s' % ( d, changed[d][0], changed[d][1] ) for d in sorted( changed ) ]
+        if not changes:
+            changes = [ '(no change)' ]
+        print("%18s/%-20s %s" % ( module, tag, ' '.join( changes ) ))
+    return len(history)
+
 def ExpandPackageForTopVariants( siteTop, package, opt ):
     if "modules" in siteTop or "modules" in package:
         # All modules already checked for
         return []
-    topVariants = [ siteTop ]
-    for topVariant in defEpicsTopVariants:
-        topVariants.append( os.path.join( siteTop, topVariant ) )
-
+    # Skip top variants that are symlinks to ones already listed
+    topVariants = []
+    for topDir in [ siteTop ] + [ os.path.join( siteTop, topVariant ) for topVariant in defEpicsTopVariants ]:
+        if dirCache.isdir( topDir ) and os.path.realpath( topDir ) not in [ os.path.realpath( t ) for t in topVariants ]:
+            topVariants.append( topDir )
+
+    # Search the top variants concurrently, but keep the releases in topVariants order
+    with concurrent.futures.ThreadPoolExecutor( max_workers=DEF_ECO_SCAN_JOBS ) as executor:
+        variantReleases = list( executor.map( lambda topDir: ExpandPackagePath( topDir, package, base=opt.base,
+                                                                                debug=opt.debug, dirCache=dirCache ),
+                                              topVariants ) )
     releases = []
-    for topDir in topVariants:
-        releases += ExpandPackagePath( topDir, package, base=opt.base, debug=opt.debug )
+    realReleases = set()
+    for release in [ release for found in variantReleases for release in found ]:
+        if os.path.realpath( release ) not in realReleases:
+            realReleases.add( os.path.realpath( release ) )
+            releases.append( release )
     return releases
 
+def ScanPackagesForTop( topDir, packages, opt ):
+    '''Fill dirCache w/ the directories ExpandPackagesForTop() will need, w/o reporting anything'''
+    for package in packages:
+        if package in defEpicsTopVariants:
+            continue
+        if not ExpandPackagePath( topDir, package, base=opt.base, debug=opt.debug, dirCache=dirCache ):
+            ExpandPackageForTopVariants( topDir, package, opt )
+
+def getEpicsTopsForSite( site_top, skipTops ):
+    '''
+    Returns the list of <site_top>/<dir>/modules directories, leaving out any
+    whose real path is in skipTops.  Adds the real path of each one to skipTops.
+    '''
+    epicsTops = []
+    listing = dirCache.listdir( site_top )
+    if listing is None:
+        return epicsTops
+    for dir in listing[0]:
+        epicsTop = os.path.join( site_top, dir, 'modules' )
+        if not dirCache.isdir( epicsTop ):
+            continue
+        realTop = os.path.realpath( epicsTop )
+        if realTop in skipTops:
+            continue
+        skipTops.add( realTop )
+        epicsTops.append( epicsTop )
+    return epicsTops
+
 def isEpicsTopVariant( topDir ):
     for topVariant in defEpicsTopVariants:
         if topDir.endswith( topVariant ):
@@ -242,7 +370,7 @@ def ExpandPackagesForTop( topDir, packages, opt ):
                 numReleasesForTop += 1
             continue
         elif package not in defEpicsTopVariants:
-            releases += ExpandPackagePath( topDir, package, base=opt.base, debug=opt.debug )
+            releases += ExpandPackagePath( topDir, package, base=opt.base, debug=opt.debug, dirCache=dirCache )
         #elif isEpicsTopVariant( topDir ):
         elif topDir.endswith(package):
             for dirPath, dirs, files in os.walk( topDir, topdown=True ):
@@ -251,7 +379,7 @@ def ExpandPackagesForTop( topDir, packages, opt ):
                 for dir in dirs[:]:
                     # Remove from list so we don't search recursively
                     dirs.remove( dir )
-                    releases += ExpandPackagePath( topDir, dir, base=opt.base, debug=opt.debug )
+                    releases += ExpandPackagePath( topDir, dir, base=opt.base, debug=opt.debug, dirCache=dirCache )
 
         # validate the package specification
         if len(releases) == 0 or not os.path.isdir( releases[0] ):
@@ -294,6 +422,8 @@ try:
                                             "\tepics-versions IOCManager\n"
                                             "\tepics-versions -a iocAdmin\n"
                                             "\tepics-versions ioc/xpp\n"
+                                            "\tepics-versions --repo -v ADCore/R3.9-1.0.0\n"
+                                            "\tepics-versions --history asyn\n"
                                             "\tWith no args, shows dependencies for current directory.\n"
                                             "\tepics-versions\n"
                                             "\tFor help: epics-versions --help" )
@@ -326,11 +456,25 @@ try:
     parser.add_option(  "--allTops", dest="allTops", action="store_true",
                         help="Search all accessible known EPICS release locations\n" )
 
+    parser.add_option(  "--repo", dest="repo", action="store_true",
+                        help="Read each PKG/TAG or PKG (newest tag) from its git repo w/o a checkout\n" )
+
+    parser.add_option(  "--history", dest="history", action="store_true",
+                        help="Show the dependency changes for each tag of each PKG, read from its git repo\n" )
+
+    parser.add_option(  "--ndjson", dest="ndjson", action="store_true",
+                        help="Show --history as one JSON object per line\n" )
+
+    parser.add_option(  "--profile", dest="profile", action="store_true",
+                        help="Show the time spent in each kind of external command when done\n" )
+
     # Future options
     #add_option(    "--prefix", "path to the root of the release area"
 
     # Parse the command line arguments
     ( opt, args ) = parser.parse_args()
+    if opt.profile:
+        enableProfile()
 
     # validate the arglist
     if not args or not args[0]:
@@ -354,6 +498,20 @@ try:
             epics_base_ver = 'unknown-base-ver'
 
     releaseCount = 0
+    if opt.history:
+        for pkgSpec in args:
+            releaseCount += ReportRepoHistory( pkgSpec, opt )
+        if releaseCount == 0:
+            raise ValidateError( "Unable to find any git tags for: %s" % ' '.join( args ) )
+        sys.exit(0)
+
+    if opt.repo:
+        for pkgSpec in args:
+            releaseCount += ReportRepoRelease( pkgSpec, opt )
+        if releaseCount == 0:
+            raise ValidateError( "Unable to find any git releases for: %s" % ' '.join( args ) )
+        sys.exit(0)
+
     # See which epicsTop to search
     if not opt.epicsTop and os.path.isdir( epics_site_top ):
         # --top not specified, start from epics_site_top
@@ -378,27 +536,21 @@ try:
 
     # If we haven't found a default or --allTops, try any we can find
     if opt.allTops or releaseCount == 0:
-        for site_top in [ DEF_EPICS_TOP_LCLS, DEF_EPICS_TOP_MCC, DEF_EPICS_TOP_PCDS, DEF_EPICS_TOP_AFS ]:
-            # if site_top == epics_site_top:
-                # Already shown
-            # 	continue
-            #releaseCount += ExpandPackagesForTop( site_top, args, opt )
-            #continue
-            for dirPath, dirs, files in os.walk( site_top, topdown=True ):
-                if len( dirs ) == 0:
-                    continue
-                for dir in dirs[:]:
-                    # Remove from list so we don't search recursively
-                    dirs.remove( dir )
-                    epicsTop = os.path.join( site_top, dir, 'modules' ) 
-                    if not os.path.isdir( epicsTop ):
-                        continue
-                    if opt.epicsTop and epicsTop == opt.epicsTop:
-                        # Already done this one
-                        continue
+        # Tops already done, or reached via another path, are skipped
+        skipTops = set()
+        if opt.epicsTop:
+            skipTops.add( os.path.realpath( opt.epicsTop ) )
+        siteTops = [ DEF_EPICS_TOP_LCLS, DEF_EPICS_TOP_MCC, DEF_EPICS_TOP_PCDS, DEF_EPICS_TOP_AFS ]
+        epicsTopsBySite = [ getEpicsTopsForSite( site_top, skipTops ) for site_top in siteTops ]
+        with concurrent.futures.ThreadPoolExecutor( max_workers=DEF_ECO_SCAN_JOBS ) as executor:
+            for epicsTops in epicsTopsBySite:
+                # Scan all the tops for this site concurrently, then report them in order
+                scans = [ executor.submit( ScanPackagesForTop, epicsTop, args, opt ) for epicsTop in epicsTops ]
+                concurrent.futures.wait( scans )
+                for epicsTop in epicsTops:
                     releaseCount += ExpandPackagesForTop( epicsTop, args, opt )
-            if not opt.allTops and releaseCount > 0:
-                break
+                if not opt.allTops and releaseCount > 0:
+                    break
 
     if releaseCount == 0:
         errorMsg = "Unable to find any releases for these modules:"
@@ -0,0 +1,175 @@
+'''
+Utilities for removing large directory trees, ex. EPICS release builds.
+
+removeTree() fixes permissions and deletes in a single scandir pass over
+the tree, w/ the directories scanned in parallel so slow unlinks on
+network filesystems overlap.  trashTree() renames a tree out of the way
+and removes it in a background process that outlives the caller.
+
+Can also be run as a script to remove trees: python fs_utils.py path ...'''
+
+import os
+import sys
+import stat
+import time
+import subprocess
+import concurrent.futures
+from repo_defaults import *
+
+trashPrefix = '.eco-trash-'
+
+# Directories need read, write and search permission to remove their contents
+dirModeRemovable = stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR
+
+def _clearDir( dirPath ):
+    '''
+    Make dirPath removable, then unlink everything in it but subdirectories.
+    Returns ( subDirs, errors ) where errors is a list of ( path, OSError )
+    '''
+    subDirs = []
+    errors  = []
+    try:
+        mode = os.lstat( dirPath ).st_mode
+        if ( mode & dirModeRemovable ) != dirModeRemovable:
+            os.chmod( dirPath, mode | dirModeRemovable )
+        with os.scandir( dirPath ) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir( follow_symlinks=False ):
+                        subDirs.append( entry.path )
+                    else:
+                        os.unlink( entry.path )
+                except OSError as e:
+                    errors.append( ( entry.path, e ) )
+    except OSError as e:
+        errors.append( ( dirPath, e ) )
+    return ( subDirs, errors )
+
+def removeTree( topPath, jobs=DEF_ECO_REMOVE_JOBS, verbose=False ):
+    '''
+    Remove topPath and everything under it, making directories writable as needed.
+    Symlinks are removed, never followed.  Up to jobs directories are cleared at once.
+    Raises OSError for the first path that couldn't be removed, after removing all it can.
+    '''
+    if not os.path.isdir( topPath ) or os.path.islink( topPath ):
+        if os.path.lexists( topPath ):
+            os.unlink( topPath )
+        return
+    if verbose:
+        print("removeTree: Removing %s ..." % topPath)
+
+    allDirs = [ topPath ]
+    errors  = []
+    with concurrent.futures.ThreadPoolExecutor( max_workers=max( 1, jobs ) ) as executor:
+        pending = set( [ executor.submit( _clearDir, topPath ) ] )
+        while pending:
+            ( done, pending ) = concurrent.futures.wait( pending, return_when=concurrent.futures.FIRST_COMPLETED )
+            for future in done:
+                ( subDirs, dirErrors ) = future.result()
+                errors += dirErrors
+                allDirs += subDirs
+                for subDir in subDirs:
+                    pending.add( executor.submit( _clearDir, subDir ) )
+
+    # The directories are empty now, so remove them deepest first
+    allDirs.sort( key=lambda dirPath: dirPath.count( os.sep ), reverse=True )
+    for dirPath in allDirs:
+        try:
+            os.rmdir( dirPath )
+        except OSError as e:
+            errors.append( ( dirPath, e ) )
+
+    if errors:
+        ( path, e ) = errors[0]
+        if verbose:
+            for ( path, e ) in errors:
+                print("removeTree: Unable to remove %s: %s" % ( path, e.strerror ))
+        raise OSError( e.errno, "%s (%d paths not removed)" % ( e.strerror, len(errors) ), path )
+
+def _removerPidPath( trashPath ):
+    '''Returns the path of the file holding the pid of the background process removing trashPath'''
+    return trashPath + '.pid'
+
+def _removePidFile( trashPath ):
+    try:
+        os.unlink( _removerPidPath( trashPath ) )
+    except OSError:
+        pass
+
+def _isTrashOrphaned( trashPath ):
+    '''
+    Returns True if no process is removing trash dir trashPath.
+    Checks the remover's pid file, or the pid of the process that created
+    the trash dir if the remover hasn't been started yet.
+    '''
+    try:
+        with open( _removerPidPath( trashPath ) ) as pidFile:
+            pid = int( pidFile.read().strip() )
+    except ( OSError, ValueError ):
+        pid = None
+    try:
+        if pid is None:
+            pid = int( os.path.basename( trashPath )[len(trashPrefix):].split( '-' )[0] )
+        os.kill( pid, 0 )
+    except ( ValueError, IndexError, ProcessLookupError ):
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def trashTree( topPath, verbose=False ):
+    '''
+    Rename topPath to a trash dir next to it and remove it in a detached background process,
+    so the caller doesn't wait on the removal and a new tree can be created at topPath right away.
+    Trash left behind by removals that were killed in the same parent dir is removed as well.
+    Falls back to removeTree() if topPath can't be renamed or the remover can't be started.
+    '''
+    if not os.path.lexists( topPath ):
+        return
+    ( parentDir, name ) = os.path.split( os.path.normpath( os.path.abspath( topPath ) ) )
+    trashPath = os.path.join( parentDir, '%s%d-%d-%s' % ( trashPrefix, os.getpid(), int( time.time() * 1000 ), name ) )
+    try:
+        os.rename( topPath, trashPath )
+    except OSError:
+        removeTree( topPath, verbose=verbose )
+        return
+
+    trashPaths = [ trashPath ]
+    for entryName in os.listdir( parentDir ):
+        if not entryName.startswith( trashPrefix ):
+            continue
+        entryPath = os.path.join( parentDir, entryName )
+        if entryName.endswith( '.pid' ):
+            # Remove pid files left behind by a remover killed after its trash dir was gone
+            if not os.path.lexists( entryPath[:-len('.pid')] ) and _isTrashOrphaned( entryPath[:-len('.pid')] ):
+                _removePidFile( entryPath[:-len('.pid')] )
+        elif entryPath != trashPath and _isTrashOrphaned( entryPath ):
+            trashPaths.append( entryPath )
+    if verbose:
+        print("trashTree: Removing %s in the background" % ' '.join( trashPaths ))
+    try:
+        remover = subprocess.Popen( [ sys.executable, os.path.abspath( __file__ ) ] + trashPaths,
+                                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    cwd='/', start_new_session=True )
+    except OSError:
+        for path in trashPaths:
+            removeTree( path, verbose=verbose )
+        return
+    # Record the remover's pid so other callers don't treat the trash as orphaned after we exit
+    for path in trashPaths:
+        try:
+            with open( _removerPidPath( path ), 'w' ) as pidFile:
+                pidFile.write( "%d\n" % remover.pid )
+        except OSError:
+            pass
+
+if __name__ == '__main__':
+    status = 0
+    for path in sys.argv[1:]:
+        try:
+            removeTree( path )
+            _removePidFile( path )
+        except OSError as e:
+            print(e)
+            status = 1
+    sys.exit( status )
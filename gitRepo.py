@@ -5,6 +5,7 @@ import shutil
 import subprocess
 
 import Repo
+from cmd_utils import *
 from git_utils import *
 from site_utils import *
 from version_utils import *
@@ -34,7 +35,15 @@ class gitRepo( Repo.Repo ):
     def GetTag( self ):
         return self._tag
 
-    def CheckoutRelease( self, buildDir, verbose=True, quiet=False, dryRun=False, depth=None ):
+    def CheckoutRelease( self, buildDir, verbose=True, quiet=False, dryRun=False, depth=None, strategy=None, minimizeRepoAccess=False ):
+        '''
+        Checkout self._tag to buildDir, cloning the repo if needed.
+        strategy selects the clone strategy, one of gitCloneStrategies.
+        Defaults to DEF_GIT_RELEASE_STRATEGY for tags and DEF_GIT_SANDBOX_STRATEGY otherwise,
+        or a shallow clone if depth is provided.
+        If minimizeRepoAccess is True, the local refs are read in one batch
+        and the tag is only fetched if it isn't already in the local repo.
+        '''
         if verbose:
             print("Checking out: %s\nto build dir: %s ..." % ( self._url, buildDir ))
         if dryRun:
@@ -46,21 +55,28 @@ class gitRepo( Repo.Repo ):
             outputPipe = subprocess.PIPE
 
         curDir = os.getcwd()
-        if os.path.isdir( os.path.join( buildDir, '.git' ) ):
+        ( headSha, tagSha, branchSha ) = ( None, None, None )
+        if os.path.isdir( os.path.join( buildDir, '.git' ) ) and minimizeRepoAccess:
+            ( headSha, tagSha, branchSha ) = gitGetLocalRefs( buildDir, self._tag )
+            if headSha is not None and headSha == tagSha:
+                # Already checked out
+                return
+            os.chdir( buildDir )
+        elif os.path.isdir( os.path.join( buildDir, '.git' ) ):
             try:
                 # See if the tag is already checked out
                 # Get the current HEAD SHA
                 os.chdir( buildDir )
                 curSha = None
                 cmdList = [ "git", "rev-parse", "HEAD" ]
-                gitOutput = subprocess.check_output( cmdList ).splitlines()
+                gitOutput = cmd_check_output( cmdList ).splitlines()
                 if len(gitOutput) == 1:
                     curSha = gitOutput[0]
 
                 # Get the tag SHA
                 tagSha = None
                 cmdList = [ "git", "rev-parse", self._tag ]
-                gitOutput = subprocess.check_output( cmdList ).splitlines()
+                gitOutput = cmd_check_output( cmdList ).splitlines()
                 if len(gitOutput) == 1:
                     tagSha = gitOutput[0]
 
@@ -85,9 +101,16 @@ class gitRepo( Repo.Repo ):
                         depth = DEF_GIT_RELEASE_DEPTH
                     else:
                         depth = None
+                if strategy is None and not depth:
+                    if self._tag:
+                        strategy = DEF_GIT_RELEASE_STRATEGY
+                    else:
+                        strategy = DEF_GIT_SANDBOX_STRATEGY
                 # Clone the repo
-                cloneUpstreamRepo( self._url, buildDir, '', branch=self._tag, depth=depth )
+                cloneUpstreamRepo( self._url, buildDir, '', branch=self._tag, depth=depth, strategy=strategy )
                 os.chdir( buildDir )
+                if minimizeRepoAccess:
+                    ( headSha, tagSha, branchSha ) = gitGetLocalRefs( '.', self._tag )
             except RuntimeError as e:
                 print(e)
                 os.chdir(curDir)
@@ -98,40 +121,48 @@ class gitRepo( Repo.Repo ):
                 raise gitError("CheckoutRelease CalledProcessError: Failed to clone %s in %s" % ( self._url, buildDir ))
 
         # See if we've already created a branch for this tag
-        branchSha = None
-        try:
-            cmdList = [ "git", "show-ref", '-s', 'refs/heads/%s' % self._tag ]
-            gitOutput = subprocess.check_output( cmdList ).splitlines()
-            if len(gitOutput) == 1:
-                branchSha = gitOutput[0]
-        except subprocess.CalledProcessError as e:
-            pass
+        if not minimizeRepoAccess:
+            branchSha = None
+            try:
+                cmdList = [ "git", "show-ref", '-s', 'refs/heads/%s' % self._tag ]
+                gitOutput = cmd_check_output( cmdList ).splitlines()
+                if len(gitOutput) == 1:
+                    branchSha = gitOutput[0]
+            except subprocess.CalledProcessError as e:
+                pass
 
         try:
-            # Refresh the tags
-            # TODO: May fail if git repo is read-only
-            if verbose:
-                print("CheckoutRelease running: git fetch origin refs/tags/%s" % self._tag)
-            cmdList = [ "git", "fetch", "origin", "refs/tags/" + self._tag ]
-            subprocess.check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
-
-            tagSha = gitGetTagSha( self._tag )
+            if minimizeRepoAccess and tagSha is not None:
+                if verbose:
+                    print("CheckoutRelease: tag %s already fetched" % self._tag)
+            else:
+                # Refresh the tags
+                # TODO: May fail if git repo is read-only
+                if verbose:
+                    print("CheckoutRelease running: git fetch origin refs/tags/%s" % self._tag)
+                cmdList = [ "git", "fetch", "origin", "refs/tags/" + self._tag ]
+                cmd_check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
+                if minimizeRepoAccess:
+                    ( headSha, tagSha, branchSha ) = gitGetLocalRefs( '.', self._tag )
+
+            if not minimizeRepoAccess:
+                tagSha = gitGetTagSha( self._tag )
 
             if branchSha and branchSha != tagSha:
                 # Rename the branch to put it aside till we delete it later
                 cmdList = [ "git", "branch", "-m", self._tag, 'obs-' + self._tag ]
-                subprocess.check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
+                cmd_check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
 
             # Checkout the tag
             #cmdList = [ "git", "checkout", '-q', 'refs/tags/%s' % self._tag ]
             cmdList = [ "git", "checkout", '-q', self._tag ]
-            subprocess.check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
+            cmd_check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
 
             if branchSha != tagSha:
                 if branchSha:
                     # Delete the obsolete branch
                     cmdList = [ "git", "branch", "-D", 'obs-' + self._tag ]
-                    subprocess.check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
+                    cmd_check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
 
                 # Create a branch from the tag for easier status checks if it doesn't already exist
                 # or if the old one didn't match the tag
@@ -164,8 +195,8 @@ class gitRepo( Repo.Repo ):
             tag = self._tag
         if verbose:
             print("\nRemoving %s release tag %s ..." % ( package, tag ))
-        subprocess.check_call( [ "git", "tag", "-d", tag ] )
-        subprocess.check_call( [ 'git', 'push', '--delete', 'origin', tag ] )
+        cmd_check_call( [ "git", "tag", "-d", tag ] )
+        cmd_check_call( [ 'git', 'push', '--delete', 'origin', tag ] )
         print("Successfully removed %s release tag %s." % ( package, tag ))
 
     def PushBranch( self, branchName=None, verbose=True, dryRun=False ):
@@ -181,7 +212,7 @@ class gitRepo( Repo.Repo ):
             return
         if verbose:
             print("Pushing branch %s ..." % ( branchName ))
-        subprocess.check_call( [ 'git', 'push', 'origin', branchName ] )
+        cmd_check_call( [ 'git', 'push', 'origin', branchName ] )
 
     def PushTag( self, release, verbose=True, dryRun=False ):
         if dryRun:
@@ -190,7 +221,7 @@ class gitRepo( Repo.Repo ):
 
         if verbose:
             print("Pushing tag %s ..." % ( release ))
-        subprocess.check_call( [ 'git', 'push', 'origin', release ] )
+        cmd_check_call( [ 'git', 'push', 'origin', release ] )
 
     def TagRelease( self, packagePath=None, release=None, branch=None, message="", verbose=True, dryRun=False ):
         if release is None:
@@ -203,7 +234,7 @@ class gitRepo( Repo.Repo ):
             print("Tagging %s release %s ..." % ( packagePath, release ))
         comment = "Release %s/%s: %s" % ( packagePath, release, message )
         cmdList = [ "git", "tag", release, 'HEAD', "-m", comment ]
-        subprocess.check_call( cmdList )
-        subprocess.check_call( [ 'git', 'push', '-u', 'origin' ] )
-        subprocess.check_call( [ 'git', 'push', 'origin', release ] )
+        cmd_check_call( cmdList )
+        cmd_check_call( [ 'git', 'push', '-u', 'origin' ] )
+        cmd_check_call( [ 'git', 'push', 'origin', release ] )
 
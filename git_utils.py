@@ -3,12 +3,23 @@ Utilities for creating GIT bare repos and such'''
 
 import os
 import re
+import time
+import atexit
+import asyncio
+import fnmatch
+import glob
+import threading
 import fileinput
+import hashlib
+import json
 import subprocess
 import sys
 from repo_defaults import *
+from cmd_utils import *
+from catalog_utils import *
 from svn_utils import *
 from version_utils import *
+from site_utils import *
 
 import gc
 
@@ -30,25 +41,17 @@ def parseGitModulesTxt():
     if not os.path.isfile( gitModulesTxtFile ):
         return {}
     package2Location = {}
-    with open(gitModulesTxtFile, 'r') as f:
-        lines = f.readlines()
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith('#'):
-            continue
-        parts = line.split()
-        if(len(parts) < 2):
-            print("Error parsing ", gitModulesTxtFile, "Cannot break", line, "into columns with enough fields using spaces/tabs")
-            continue
-        packageName = parts[0]
-        packageLocation = expandMacros( parts[1], os.environ )
-        package2Location[packageName] = packageLocation
+    for packageName, entry in loadModulesCatalog( 'git', gitModulesTxtFile ).items():
+        package2Location[packageName] = entry.location
     return package2Location
 
 git_package2Location = parseGitModulesTxt()
 
+def getSitePackageCatalog( verbose=False ):
+    '''Returns the unified packageName -> PackageEntry catalog for modulelist.txt and CVSROOT/modules'''
+    cvsRoot = os.environ.get( 'CVSROOT', DEF_CVS_ROOT )
+    return getPackageCatalog( gitModulesTxtFile, os.path.join( cvsRoot, 'CVSROOT', 'modules' ), verbose=verbose )
+
 def determineGitRoot( ):
     '''Get the root folder for GIT repos at SLAC'''
     gitRoot = DEF_AFS_GIT_REPOS
@@ -59,6 +62,205 @@ def determineGitRoot( ):
         gitRoot = os.environ["GIT_TOP"]
     return gitRoot
 
+class GitRepoIndex( object ):
+    '''
+    Persisted index of the bare repos under a git root.
+    Each scanned directory is saved w/ its mtime and the *.git repos it holds,
+    so a refresh only has to stat each directory and re-list the ones that changed.
+    Lookups are by package name or any trailing path of a repo, ex.
+        asyn, modules/asyn, epics/modules/asyn
+    Names from modulelist.txt and CVSROOT/modules are also accepted as aliases.
+    The index is shared by the threads checking out releases, so refresh(),
+    save() and lookup() hold a lock while they use it.
+    '''
+    indexVersion = 1
+    # Min seconds between the refreshes done by lookup() misses, ex. for svn or cvs packages
+    refreshInterval = 60.0
+
+    def __init__( self, gitRoot, indexPath=None, verbose=False ):
+        self._gitRoot   = gitRoot
+        self._indexPath = indexPath
+        self._verbose   = verbose
+        self._dirs      = {}    # relDir -> mtime_ns
+        self._repos     = {}    # relDir -> [ repoDir, ... ]
+        self._keys      = {}    # packagePath -> relRepoPath
+        self._aliases   = None
+        self._refreshTime = None    # time.time() of the last refresh
+        # Reentrant as refresh() saves and lookup() refreshes
+        self._lock      = threading.RLock()
+        if self._indexPath is None:
+            rootHash = hashlib.md5( os.path.abspath( gitRoot ).encode() ).hexdigest()[:12]
+            self._indexPath = os.path.join( DEF_ECO_CACHE_DIR, 'gitRepoIndex-%s.json' % rootHash )
+        self.load()
+
+    def load( self ):
+        '''Load the persisted index if it matches our git root.'''
+        try:
+            with open( self._indexPath, 'r' ) as f:
+                index = json.load( f )
+        except ( IOError, OSError, ValueError ):
+            return
+        if index.get( 'version' ) != GitRepoIndex.indexVersion or index.get( 'gitRoot' ) != self._gitRoot:
+            return
+        self._dirs  = index['dirs']
+        self._repos = index['repos']
+        self._buildKeys()
+
+    def save( self ):
+        '''Persist the index.  Failures are not fatal, the index just stays in memory.'''
+        with self._lock:
+            index = { 'version': GitRepoIndex.indexVersion, 'gitRoot': self._gitRoot,
+                      'dirs': self._dirs, 'repos': self._repos }
+            tmpPath = '%s.%d' % ( self._indexPath, os.getpid() )
+            try:
+                if not os.path.isdir( os.path.dirname( self._indexPath ) ):
+                    os.makedirs( os.path.dirname( self._indexPath ), 0o775 )
+                with open( tmpPath, 'w' ) as f:
+                    json.dump( index, f )
+                os.replace( tmpPath, self._indexPath )
+            except ( IOError, OSError ) as e:
+                if self._verbose:
+                    print("GitRepoIndex: Unable to save %s: %s" % ( self._indexPath, e ))
+
+    def refresh( self ):
+        '''Stat each indexed directory and rescan the ones that were changed or added.'''
+        with self._lock:
+            self._refresh()
+            self._refreshTime = time.time()
+
+    def _refresh( self ):
+        if not os.path.isdir( self._gitRoot ):
+            return
+        changed = False
+        if '' not in self._dirs:
+            self._dirs  = {}
+            self._repos = {}
+        for relDir in sorted( self._dirs ):
+            if relDir not in self._dirs:
+                # Parent was removed
+                continue
+            try:
+                mtime = os.stat( os.path.join( self._gitRoot, relDir ) ).st_mtime_ns
+            except OSError:
+                self._removeDir( relDir )
+                changed = True
+                continue
+            if mtime != self._dirs[relDir]:
+                self._scanDir( relDir )
+                changed = True
+        if '' not in self._dirs:
+            self._scanDir( '' )
+            changed = True
+        if changed:
+            self._buildKeys()
+            if self._verbose:
+                print("GitRepoIndex: Updated index of %d repos under %s" % ( sum( len(r) for r in self._repos.values() ), self._gitRoot ))
+            self.save()
+
+    def _scanDir( self, relDir ):
+        dirPath = os.path.join( self._gitRoot, relDir )
+        try:
+            mtime   = os.stat( dirPath ).st_mtime_ns
+            entries = list( os.scandir( dirPath ) )
+        except OSError:
+            self._removeDir( relDir )
+            return
+        self._dirs[relDir] = mtime
+        repos   = []
+        subDirs = []
+        for entry in entries:
+            if entry.name == 'from-svn' or entry.name == 'from-cvs':
+                # Don't search these import directories
+                continue
+            try:
+                if entry.name.endswith( '.git' ):
+                    if entry.name != '.git' and entry.is_dir():
+                        repos.append( entry.name )
+                elif entry.is_dir( follow_symlinks=False ):
+                    subDirs.append( entry.name )
+            except OSError:
+                continue
+        self._repos[relDir] = sorted( repos )
+        for subDir in subDirs:
+            relSubDir = os.path.join( relDir, subDir )
+            if relSubDir not in self._dirs:
+                self._scanDir( relSubDir )
+
+    def _removeDir( self, relDir ):
+        prefix = relDir + '/'
+        for d in [ d for d in self._dirs if d == relDir or d.startswith( prefix ) ]:
+            del self._dirs[d]
+            self._repos.pop( d, None )
+
+    def _buildKeys( self ):
+        '''Map each trailing path of each repo to the repo, favoring the shallowest repo.'''
+        repoPaths = [ ]
+        for relDir, repos in self._repos.items():
+            for repo in repos:
+                repoPaths.append( os.path.join( relDir, repo ) )
+        repoPaths.sort( key=lambda p: ( p.count( '/' ), p ) )
+        self._keys = {}
+        for repoPath in repoPaths:
+            parts = repoPath[:-len('.git')].split( '/' )
+            for i in range( len(parts) ):
+                self._keys.setdefault( '/'.join( parts[i:] ), repoPath )
+
+    def _getAliases( self ):
+        if self._aliases is None:
+            self._aliases = {}
+            for packageName, entry in getSitePackageCatalog().items():
+                location = entry.location
+                if location.startswith( self._gitRoot + '/' ):
+                    location = location[len(self._gitRoot) + 1:]
+                if location.endswith( '.git' ):
+                    location = location[:-len('.git')]
+                self._aliases[packageName] = location.strip( '/' )
+        return self._aliases
+
+    def _lookup( self, packagePath ):
+        key = packagePath.strip( '/' )
+        if key.endswith( '.git' ):
+            key = key[:-len('.git')]
+        if key in self._keys:
+            return self._keys[key]
+        alias = self._getAliases().get( key )
+        if alias:
+            if alias in self._keys:
+                return self._keys[alias]
+            # CVS locations don't always match the git path, try the package name
+            aliasName = os.path.basename( alias )
+            if aliasName in self._keys:
+                return self._keys[aliasName]
+        return None
+
+    def lookup( self, packagePath ):
+        '''Return the path to the bare repo for packagePath, or None if not found'''
+        with self._lock:
+            repoPath = self._lookup( packagePath )
+            if repoPath is not None and not os.path.isdir( os.path.join( self._gitRoot, repoPath ) ):
+                # Stale entry
+                repoPath = None
+            if repoPath is None and ( self._refreshTime is None
+                                      or time.time() - self._refreshTime >= GitRepoIndex.refreshInterval ):
+                # Only stats each directory, and rescans the new or changed ones
+                self.refresh()
+                repoPath = self._lookup( packagePath )
+        if repoPath is None:
+            return None
+        return os.path.join( self._gitRoot, repoPath )
+
+_gitRepoIndexes = {}
+_gitRepoIndexesLock = threading.Lock()
+
+def getGitRepoIndex( gitRoot=None, verbose=False ):
+    '''Return the shared GitRepoIndex for gitRoot, which defaults to determineGitRoot()'''
+    if gitRoot is None:
+        gitRoot = determineGitRoot()
+    with _gitRepoIndexesLock:
+        if gitRoot not in _gitRepoIndexes:
+            _gitRepoIndexes[gitRoot] = GitRepoIndex( gitRoot, verbose=verbose )
+        return _gitRepoIndexes[gitRoot]
+
 def git_call( gitCommand, gitDir=None, debug=False, *args, ** kwargs ):
     '''
     Run the specified git command via subprocess.call
@@ -79,7 +281,7 @@ def git_call( gitCommand, gitDir=None, debug=False, *args, ** kwargs ):
         cmdList.insert( 1, [ '--git-dir', gitDir ] )
     if debug:
         print("git_call running: %s" % ' '.join( cmdList ))
-    callStatus = subprocess.call( cmdList, *args, **kwargs )
+    callStatus = cmd_call( cmdList, *args, **kwargs )
     if debug:
         print("git_call  status:", callStatus)
     return callStatus
@@ -105,7 +307,7 @@ def git_check_call( gitCommand, gitDir=None, debug=False, *args, ** kwargs ):
         cmdList.insert( 1, [ '--git-dir', gitDir ] )
     if debug:
         print("git_check_call running: %s" % ' '.join( cmdList ))
-    callStatus = subprocess.check_call( cmdList, *args, **kwargs )
+    callStatus = cmd_check_call( cmdList, *args, **kwargs )
     if debug:
         print("git_check_call  status:", callStatus)
     return callStatus
@@ -134,45 +336,387 @@ def git_check_output( gitCommand, gitDir=None, debug=False, *args, ** kwargs ):
     if debug:
         print("git_check_output running: %s" % ' '.join( cmdList ))
 
-    git_output = subprocess.check_output( cmdList, *args, **kwargs )
+    git_output = cmd_check_output( cmdList, *args, **kwargs )
 
     if debug:
         print(git_output)
     return git_output
 
+async def git_output( gitCommand, gitDir=None, url=None, debug=False, **kwargs ):
+    '''
+    asyncio counterpart of git_check_output(), so git commands can be overlapped, ex.
+        outputs = await asyncio.gather( git_output( [ 'ls-remote', url1 ], url=url1 ),
+                                        git_output( [ 'ls-remote', url2 ], url=url2 ) )
+    url is the remote repo the command accesses, if any.  At most DEF_ECO_REPO_JOBS_PER_HOST
+    commands run at once for each host, see cmd_async_output() for kwargs.
+    Returns cmd output
+    May throw subprocess.CalledProcessError or OSError exceptions
+    '''
+    if isinstance( gitCommand, str ):
+        cmdList = gitCommand.split()
+    else:
+        cmdList = list( gitCommand )
+    if len(cmdList) == 0 or cmdList[0] != 'git':
+        cmdList.insert( 0, 'git' )
+    if gitDir is not None:
+        cmdList.insert( 1, '--git-dir=%s' % gitDir )
+    if debug:
+        print("git_output running: %s" % ' '.join( cmdList ))
+    git_output = await cmd_async_output( cmdList, host=getUrlHost( url ), **kwargs )
+    if debug:
+        print(git_output)
+    return git_output
+
+class GitCatFileReader( object ):
+    '''
+    Reads files from a local git repo via a long-lived git cat-file --batch process,
+    so each file costs a request on its pipe instead of a git process and repo open.
+    Reads are serialized, and the process is restarted if it exits.
+    '''
+    def __init__( self, repoPath ):
+        self._repoPath	= repoPath
+        self._lock		= threading.Lock()
+        self._proc		= None
+        self.lastUsed	= time.time()
+
+    def _start( self ):
+        self._proc = subprocess.Popen( [ 'git', '--git-dir=%s' % self._repoPath, 'cat-file', '--batch' ],
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL )
+
+    def read( self, refName, filePath ):
+        '''
+        Returns the contents of filePath at refName as bytes, or None if it isn't a file at refName.
+        May throw OSError if git can't be run or exits, ex. if repoPath isn't a git repo.
+        '''
+        gitObject = self.readObject( '%s:%s' % ( refName, filePath ) )
+        if gitObject is None or gitObject[1] != 'blob':
+            return None
+        return gitObject[2]
+
+    def readObject( self, objectSpec ):
+        '''
+        Returns ( objectSha, objectType, contents ) for a git object, ex. "R1.0:configure/RELEASE",
+        "R1.0^{tree}", or a sha.  Returns None if not found.
+        May throw OSError if git can't be run or exits, ex. if repoPath isn't a git repo.
+        '''
+        if '\n' in objectSpec:
+            return None
+        with self._lock:
+            self.lastUsed = time.time()
+            start = time.perf_counter()
+            status = None
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self._start()
+                self._proc.stdin.write( objectSpec.encode() + b'\n' )
+                self._proc.stdin.flush()
+                # Response is "<sha> <type> <size>\n<contents>\n" or "<objectSpec> missing\n"
+                header = self._proc.stdout.readline()
+                if not header:
+                    self.close()
+                    raise OSError( "git cat-file exited reading %s" % self._repoPath )
+                if header.endswith( b' missing\n' ) or header.endswith( b' ambiguous\n' ):
+                    status = 1
+                    return None
+                ( objectSha, objectType, objectSize ) = header.split()
+                contents = self._proc.stdout.read( int(objectSize) )
+                self._proc.stdout.read( 1 )
+                status = 0
+                return ( objectSha.decode(), objectType.decode(), contents )
+            finally:
+                recordCmd( [ 'git', '--git-dir=%s' % self._repoPath, 'cat-file', '--batch', objectSpec ], None, start, status )
+
+    def close( self ):
+        '''Stop the git cat-file process.  It's restarted by the next read()'''
+        proc = self._proc
+        self._proc = None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait( timeout=5 )
+        except ( OSError, subprocess.TimeoutExpired ):
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+# Pool of GitCatFileReader by repo path, see read_blob()
+_catFileReaders		= {}
+_catFileReadersLock	= threading.Lock()
+_catFileReaper		= None
+
+def _reapCatFileReaders():
+    '''Close the readers idle for DEF_GIT_CAT_FILE_IDLE_TIMEOUT, until the pool is empty'''
+    global _catFileReaper
+    while True:
+        time.sleep( max( 1.0, DEF_GIT_CAT_FILE_IDLE_TIMEOUT / 2.0 ) )
+        with _catFileReadersLock:
+            for ( repoPath, reader ) in list( _catFileReaders.items() ):
+                if time.time() - reader.lastUsed >= DEF_GIT_CAT_FILE_IDLE_TIMEOUT and reader._lock.acquire( blocking=False ):
+                    try:
+                        reader.close()
+                        del _catFileReaders[repoPath]
+                    finally:
+                        reader._lock.release()
+            if not _catFileReaders:
+                _catFileReaper = None
+                return
+
+def closeCatFileReaders():
+    '''Close all the pooled git cat-file readers'''
+    with _catFileReadersLock:
+        for reader in _catFileReaders.values():
+            with reader._lock:
+                reader.close()
+        _catFileReaders.clear()
+
+atexit.register( closeCatFileReaders )
+
+def getCatFileReader( repo ):
+    '''
+    Returns the pooled GitCatFileReader for the local git repo.
+    It's closed after it's been idle for DEF_GIT_CAT_FILE_IDLE_TIMEOUT seconds.
+    '''
+    global _catFileReaper
+    with _catFileReadersLock:
+        reader = _catFileReaders.get( repo )
+        if reader is None:
+            reader = GitCatFileReader( repo )
+            _catFileReaders[repo] = reader
+        reader.lastUsed = time.time()
+        if _catFileReaper is None:
+            _catFileReaper = threading.Thread( target=_reapCatFileReaders, name='catFileReaper', daemon=True )
+            _catFileReaper.start()
+    return reader
+
+def read_blob( repo, refName, filePath ):
+    '''
+    Returns the contents of filePath at refName in the local git repo as bytes, or None if not found.
+    Uses a pooled git cat-file --batch process for each repo, see getCatFileReader().
+    May throw OSError if git can't be run or repo isn't a git repo.
+    '''
+    return getCatFileReader( repo ).read( refName, filePath )
+
+def parseGitTree( contents ):
+    '''Returns a dict of name -> ( mode, sha ) for the entries of a raw git tree object'''
+    entries = {}
+    treeView = memoryview( contents )
+    pos = 0
+    while pos < len(contents):
+        nameStart = contents.index( b' ', pos ) + 1
+        nameEnd   = contents.index( b'\0', nameStart )
+        mode = contents[pos:nameStart-1].decode()
+        name = contents[nameStart:nameEnd].decode( errors='surrogateescape' )
+        entries[name] = ( mode, treeView[nameEnd+1:nameEnd+21].hex() )
+        pos = nameEnd + 21
+    return entries
+
+# Parsed git trees and macro files by object sha, which are the same in any repo
+_gitTreeCache		= {}
+_gitMacroFileCache	= {}
+
+class GitTreeFileSource( FileSource ):
+    '''
+    FileSource for getMacrosFromFile() that reads the files under topDir from
+    refName in a local git repo instead of a checkout.  Files outside topDir,
+    ex. ../../RELEASE_SITE, and files under topDir that aren't in the repo,
+    ex. a generated RELEASE_SITE, are read from the filesystem.
+    Trees and macro files are cached by sha, so files that are the same in
+    many tags are only read and parsed once.
+    '''
+    def __init__( self, repo, refName, topDir ):
+        self._repo		= repo
+        self._refName	= refName
+        self._topDir	= os.path.normpath( os.path.abspath( topDir ) )
+        self._reader	= getCatFileReader( repo )
+        self._rootSha	= None
+
+    def _readTree( self, treeSpec ):
+        if treeSpec in _gitTreeCache:
+            return _gitTreeCache[treeSpec]
+        gitObject = self._reader.readObject( treeSpec )
+        if gitObject is None or gitObject[1] != 'tree':
+            return None
+        tree = parseGitTree( gitObject[2] )
+        _gitTreeCache[gitObject[0]] = tree
+        return tree
+
+    def getRepoPath( self, filePath ):
+        '''Returns filePath relative to topDir, or None if it's outside topDir'''
+        filePath = os.path.normpath( os.path.join( self._topDir, filePath ) )
+        if not filePath.startswith( self._topDir + '/' ):
+            return None
+        return filePath[ len(self._topDir) + 1: ]
+
+    def lookup( self, repoPath ):
+        '''Returns ( mode, sha ) for repoPath at refName, or None if it isn't in the repo'''
+        if self._rootSha is None:
+            gitObject = self._reader.readObject( '%s^{tree}' % self._refName )
+            if gitObject is None:
+                return None
+            self._rootSha = gitObject[0]
+            if self._rootSha not in _gitTreeCache:
+                _gitTreeCache[self._rootSha] = parseGitTree( gitObject[2] )
+        entry = ( '40000', self._rootSha )
+        for name in repoPath.split( '/' ):
+            tree = self._readTree( entry[1] ) if entry[0] == '40000' else None
+            if tree is None or name not in tree:
+                return None
+            entry = tree[name]
+        return entry
+
+    def glob( self, pattern ):
+        repoPattern = self.getRepoPath( pattern )
+        if repoPattern is None:
+            return glob.glob( pattern )
+        ( repoDir, namePattern ) = os.path.split( repoPattern )
+        dirEntry = self.lookup( repoDir ) if repoDir else ( '40000', self._rootSha )
+        if self._rootSha is None or dirEntry is None or dirEntry[0] != '40000':
+            return glob.glob( pattern )
+        tree = self._readTree( dirEntry[1] )
+        names = [ name for name in sorted( tree ) if fnmatch.fnmatchcase( name, namePattern ) ]
+        if not names:
+            return glob.glob( pattern )
+        return [ os.path.join( self._topDir, repoDir, name ) for name in names ]
+
+    def getMacroFile( self, filePath ):
+        repoPath = self.getRepoPath( filePath )
+        entry = self.lookup( repoPath ) if repoPath else None
+        if entry is None or entry[0] == '40000':
+            return getMacroFile( filePath )
+        ( mode, blobSha ) = entry
+        if blobSha not in _gitMacroFileCache:
+            gitObject = self._reader.readObject( blobSha )
+            if gitObject is None:
+                return None
+            lines = gitObject[2].decode( errors='replace' ).splitlines()
+            _gitMacroFileCache[blobSha] = MacroFile( filePath, blobSha, parseMacroLines( lines ) )
+        return _gitMacroFileCache[blobSha]
+
+def gitGetReleaseMacros( repo, refName, topDir, siteMacros=None, debug=False ):
+    '''
+    Returns the expanded macros from configure/RELEASE and its includes at refName
+    in the local git repo, w/o a checkout.  See GitTreeFileSource.
+    topDir is where the release would be checked out, for TOP and relative includes.
+    siteMacros are the macros a generated RELEASE_SITE would provide, ex. from getSiteReleaseMacros()
+    '''
+    macros = dict( siteMacros ) if siteMacros else {}
+    macros['TOP'] = topDir
+    fileSource = GitTreeFileSource( repo, refName, topDir )
+    return getMacrosFromFile( os.path.join( topDir, 'configure', 'RELEASE' ), macros, debug=debug, fileSource=fileSource )
+
+def gitGetPkgDependents( repo, refName, topDir, siteMacros=None, debug=False ):
+    '''Like getEpicsPkgDependents() for refName in the local git repo, w/o a checkout.
+    Ex. pkgDependents['base'] = 'R3.15.5-1.0'
+    Returns {} if refName or its configure/RELEASE isn't in the repo.'''
+    macros = gitGetReleaseMacros( repo, refName, topDir, siteMacros=siteMacros, debug=debug )
+    return macrosToPkgDependents( macros, debug=debug )
+
+def gitGetPkgDependentsHistory( repo, tags, topDir, siteMacros=None, debug=False ):
+    '''
+    Returns a list of ( tag, pkgDependents ) for each tag in the local git repo, in the given order.
+    All tags are read through the same pooled git cat-file process, and the trees and
+    RELEASE files they share are only read and parsed once, see GitTreeFileSource.
+    topDir is where the release would be checked out, w/ $TAG replaced by each tag.
+    '''
+    if siteMacros is None:
+        siteMacros = getSiteReleaseMacros()
+    history = []
+    for tag in tags:
+        pkgDependents = gitGetPkgDependents( repo, tag, topDir.replace( '$TAG', tag ), siteMacros=siteMacros, debug=debug )
+        history.append( ( tag, pkgDependents ) )
+    return history
+
+def gitGetDependencyPlan( packageSpec, tag=None, verbose=False, useCache=True ):
+    '''
+    Reads the dependencies of packageSpec at tag, and of their dependencies in turn,
+    from their git repos w/o any checkouts.  If tag is None, it's taken from the end of packageSpec.
+    Each level of dependencies is looked up concurrently, see gitFindPackageReleases().
+    Returns ( releases, buildOrder ), where
+        releases is a dict of ( packageName, version ) -> { 'url': repo_url, 'depends': { packageName: version } }
+            w/ a None url for releases that weren't found in git, ex. base.
+        buildOrder is a list of lists of ( packageName, version ), each of which only depends on
+            releases in earlier lists, so the releases in each list can be built concurrently.
+    '''
+    ( packagePath, tag ) = ( packageSpec, tag ) if tag else os.path.split( packageSpec )
+    siteMacros = getSiteReleaseMacros()
+    releases = {}
+    toFind = [ ( packagePath, tag ) ]
+    while toFind:
+        found = gitFindPackageReleases( toFind, verbose=verbose, useCache=useCache )
+        nextToFind = []
+        for ( ( findPath, findTag ), ( repo_url, repo_tag ) ) in zip( toFind, found ):
+            release = ( os.path.split( findPath )[1], findTag )
+            releases[release] = { 'url': repo_url, 'depends': {} }
+            if repo_url is None or not os.path.isdir( repo_url ):
+                continue
+            if 'EPICS_MODULES' in siteMacros:
+                topDir = os.path.join( siteMacros['EPICS_MODULES'], release[0], repo_tag )
+            else:
+                topDir = os.path.join( os.getcwd(), release[0], repo_tag )
+            depends = gitGetPkgDependents( repo_url, repo_tag, topDir, siteMacros=siteMacros )
+            depends.pop( 'base', None )
+            releases[release]['depends'] = depends
+            for ( depName, depVersion ) in depends.items():
+                if ( depName, depVersion ) not in releases and ( depName, depVersion ) not in nextToFind:
+                    nextToFind.append( ( depName, depVersion ) )
+        toFind = nextToFind
+
+    # Group the releases in levels w/ no dependencies on each other
+    buildOrder = []
+    built = set()
+    while len(built) < len(releases):
+        level = sorted( [ release for release in releases if release not in built
+                          and all( dep in built for dep in releases[release]['depends'].items() ) ] )
+        if not level:
+            # Dependency loop, so just build the rest in one level
+            level = sorted( [ release for release in releases if release not in built ] )
+            print("gitGetDependencyPlan Error: Dependency loop in %s" % ' '.join( [ '%s/%s' % r for r in level ] ))
+        buildOrder.append( level )
+        built.update( level )
+    return ( releases, buildOrder )
+
 def gitGetRemoteFile( url, refName, filePath, debug = False ):
-    '''Fetchs a file from a git repo url.
-    Returns file as a string or None if not found.'''
+    '''Fetchs a file from a local git repo url, see read_blob().
+    Returns file as bytes or None if not found.'''
     fileContents = None
     try:
-        commitSpec = refName + ':' + filePath
-        fileContents = subprocess.check_output( [ 'git', '--git-dir=%s' % url, 'show', commitSpec ], stderr=subprocess.STDOUT )
+        fileContents = read_blob( url, refName, filePath )
     except OSError as e:
         if debug:
             print(e)
         pass
-    except subprocess.CalledProcessError as e:
-        if debug:
-            print(e)
-        pass
     return fileContents
 
-def gitGetRemoteTags( url, debug = False, verbose = False ):
-    '''Fetchs a list of tags from a git repo url.
-    Returns a dictionary of SHA1 hashes by tagName.'''
+# Cache of gitGetRemoteTags() results by url, see useCache
+_gitRemoteTagsCache = {}
+
+def parseRemoteTags( lsRemoteOutput ):
+    '''Returns a dictionary of SHA1 hashes by tagName from git ls-remote output'''
     tagSpecRegExp = re.compile( r"^(.*)\s+refs/tags/(.*)$" )
     tags = {}
+    for line in lsRemoteOutput.splitlines():
+        tagSpecMatch = tagSpecRegExp.search( line )
+        if not tagSpecMatch:
+            continue
+        tags[ tagSpecMatch.group(2) ] = tagSpecMatch.group(1)
+    return tags
+
+def gitGetRemoteTags( url, debug = False, verbose = False, useCache = False ):
+    '''Fetchs a list of tags from a git repo url.
+    Returns a dictionary of SHA1 hashes by tagName.
+    If useCache is True, git ls-remote is only run once per url.'''
+    if useCache and url in _gitRemoteTagsCache:
+        return _gitRemoteTagsCache[url]
+    tags = {}
     try:
         if verbose:
             print("gitGetRemoteTags running: git ls-remote %s" % url)
-        statusInfo = subprocess.check_output( [ 'git', 'ls-remote', url ], stderr=subprocess.STDOUT, universal_newlines=True )
-        for line in statusInfo.splitlines():
-            if line is None:
-                break
-            tagSpecMatch = tagSpecRegExp.search( line )
-            if not tagSpecMatch:
-                continue
-            tags[ tagSpecMatch.group(2) ] = tagSpecMatch.group(1)
+        statusInfo = cmd_check_output( [ 'git', 'ls-remote', url ], stderr=subprocess.STDOUT, universal_newlines=True )
+        tags = parseRemoteTags( statusInfo )
+        # Only cache successful results so a transient failure can be retried
+        if useCache:
+            _gitRemoteTagsCache[url] = tags
 
     except OSError as e:
         if debug:
@@ -186,10 +730,12 @@ def gitGetRemoteTags( url, debug = False, verbose = False ):
         print("gitGetRemoteTags: Found %d tags in %s" % ( len(tags), url ))
     return tags
 
-def gitGetRemoteTag( url, tag, debug = False, verbose = False ):
+def gitGetRemoteTag( url, tag, debug = False, verbose = False, useCache = False ):
     '''Fetchs tags from a git repo url and looks for a match w/ the desired tag.
     Returns a tuple of ( sha, tag ), ( None, None ) on error.
-    For a matching git remote, url must be a valid string and tag must be found.'''
+    For a matching git remote, url must be a valid string and tag must be found.
+    If useCache is True, a local bare repo is checked for just this tag,
+    and git ls-remote is only run once per url for other repos.'''
     tag_sha		= None
     git_url     = None
     git_tag     = None
@@ -200,7 +746,16 @@ def gitGetRemoteTag( url, tag, debug = False, verbose = False ):
     else:
         tag_spec    = 'refs/tags/%s' % tag
     try:
-        tags = gitGetRemoteTags( url, debug = debug, verbose = verbose )
+        if useCache and os.path.isdir( url ):
+            ( headSha, tagSha, branchSha ) = gitGetLocalRefs( url, tag if tag != 'HEAD' else None, debug=debug )
+            tags = { }
+            if tag == 'HEAD' and headSha:
+                tags[tag] = headSha
+            elif tagSha:
+                tags[tag] = tagSha
+            url_valid = headSha is not None
+        else:
+            tags = gitGetRemoteTags( url, debug = debug, verbose = verbose, useCache = useCache )
         if tag in tags:
             git_url = url
             git_tag = tag
@@ -223,12 +778,83 @@ def gitGetRemoteTag( url, tag, debug = False, verbose = False ):
             print("gitGetRemoteTag: Invalid git url %s" % ( url ))
     return ( tag_sha, git_tag )
 
+async def gitGetRemoteTagsAsync( url, debug = False, verbose = False, useCache = False ):
+    '''asyncio counterpart of gitGetRemoteTags(), sharing its cache.
+    Returns a dictionary of SHA1 hashes by tagName.'''
+    if useCache and url in _gitRemoteTagsCache:
+        return _gitRemoteTagsCache[url]
+    tags = {}
+    try:
+        if verbose:
+            print("gitGetRemoteTagsAsync running: git ls-remote %s" % url)
+        statusInfo = await git_output( [ 'ls-remote', url ], url=url, stderr=subprocess.STDOUT, universal_newlines=True )
+        tags = parseRemoteTags( statusInfo )
+        if useCache:
+            _gitRemoteTagsCache[url] = tags
+    except ( OSError, subprocess.CalledProcessError ) as e:
+        if debug:
+            print(e)
+    if verbose:
+        print("gitGetRemoteTagsAsync: Found %d tags in %s" % ( len(tags), url ))
+    return tags
+
+async def gitGetRemoteTagAsync( url, tag, debug = False, verbose = False, useCache = False ):
+    '''asyncio counterpart of gitGetRemoteTag().
+    Returns a tuple of ( sha, tag ), ( None, None ) on error.'''
+    if useCache and os.path.isdir( url ):
+        # Local bare repo refs are read in a thread as they may still wait on AFS
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor( None, lambda: gitGetRemoteTag( url, tag, debug=debug, verbose=verbose, useCache=useCache ) )
+    if tag is None:
+        tag = 'HEAD'
+    tags = await gitGetRemoteTagsAsync( url, debug = debug, verbose = verbose, useCache = useCache )
+    if tag not in tags:
+        if verbose:
+            print("gitGetRemoteTagAsync: Unable to find tag %s in git url %s" % ( tag, url ))
+        return ( None, None )
+    if verbose:
+        print("gitGetRemoteTagAsync: Found git_tag %s %7.7s in git_url %s" % ( tag, tags[tag], url ))
+    return ( tags[tag], tag )
+
+def gitGetLocalRefs( repoDir, tag, debug = False ):
+    '''
+    Reads HEAD and the tag and branch refs named tag from the repo in repoDir
+    w/ one rev-parse and one for-each-ref, w/o any remote access.
+    Returns ( headSha, tagSha, branchSha ), w/ None for any that don't exist.
+    tagSha is the sha of the commit the tag points to.
+    '''
+    ( headSha, tagSha, branchSha ) = ( None, None, None )
+    try:
+        headSha = cmd_check_output( [ 'git', '-C', repoDir, 'rev-parse', '--verify', '-q', 'HEAD' ],
+                                    universal_newlines=True ).strip()
+    except ( OSError, subprocess.CalledProcessError ) as e:
+        if debug:
+            print(e)
+    if not tag:
+        return ( headSha, tagSha, branchSha )
+    try:
+        refList = cmd_check_output( [ 'git', '-C', repoDir, 'for-each-ref',
+                                      '--format=%(refname) %(objectname) %(*objectname)',
+                                      'refs/tags/%s' % tag, 'refs/heads/%s' % tag ],
+                                    universal_newlines=True )
+        for line in refList.splitlines():
+            refInfo = line.split()
+            if refInfo[0] == 'refs/tags/%s' % tag:
+                # Use the peeled sha for annotated tags
+                tagSha = refInfo[-1]
+            elif refInfo[0] == 'refs/heads/%s' % tag:
+                branchSha = refInfo[1]
+    except ( OSError, subprocess.CalledProcessError ) as e:
+        if debug:
+            print(e)
+    return ( headSha, tagSha, branchSha )
+
 def gitGetTagSha( tag ):
     tagSha = None
     try:
         # Get the tagSha
         cmdList = [ "git", "show-ref", tag ]
-        gitOutput = subprocess.check_output( cmdList ).splitlines()
+        gitOutput = cmd_check_output( cmdList ).splitlines()
         if len(gitOutput) == 1:
             tagSha = gitOutput[0].split()[0]
     except:
@@ -248,30 +874,78 @@ def initBareRepo( gitRepoPath, verbose=False ):
         os.makedirs( parentFolder, 0o775 )
 
     if verbose: print("Creating a new bare repo in " + gitRepoPath)
-    subprocess.check_call(["git", "init", "--bare", "--template=%s/templates" % DEF_GIT_MODULES_PATH, gitRepoPath])
+    cmd_check_call(["git", "init", "--bare", "--template=%s/templates" % DEF_GIT_MODULES_PATH, gitRepoPath])
     if not os.path.exists(gitRepoPath):
         raise Exception( "Failed to create git repo at:\n" + gitRepoPath )
 
-def cloneUpstreamRepo( gitUpstreamRepo, tpath, packageName, branch=None, depth=None, verbose=False ):
-    '''Create a clone of the upstream repo given a destination folder'''
+# Clone strategies supported by cloneUpstreamRepo
+#   full:       All history
+#   shallow:    Just the last DEF_GIT_RELEASE_DEPTH commits, or depth if specified
+#   blobless:   All commits and trees, file contents are fetched as needed (git 2.19 or later)
+#   singletag:  Just the commit for the requested tag or branch
+#   sparse:     blobless, w/ DEF_GIT_SPARSE_EXCLUDES left out of the working tree (git 2.25 or later)
+gitCloneStrategies = [ 'full', 'shallow', 'blobless', 'singletag', 'sparse' ]
+
+# Lets partial clones from a local bare repo use --filter w/o
+# needing uploadpack.allowFilter in each bare repo's config
+gitFilterUploadPack = 'git -c uploadpack.allowFilter=true upload-pack'
+
+def gitDetermineCloneStrategy( strategy ):
+    '''Returns strategy, or the closest strategy supported by our version of git'''
+    if strategy not in gitCloneStrategies:
+        raise ValueError( "Invalid git clone strategy: %s" % strategy )
+    if strategy in [ 'blobless', 'sparse' ]:
+        gitVersion = gitGetVersionNumber()
+        if strategy == 'sparse' and gitVersion < 2.25:
+            strategy = 'blobless'
+        if strategy == 'blobless' and gitVersion < 2.19:
+            strategy = 'shallow'
+    return strategy
+
+def cloneUpstreamRepo( gitUpstreamRepo, tpath, packageName, branch=None, depth=None, strategy=None, verbose=False ):
+    '''
+    Create a clone of the upstream repo given a destination folder
+    strategy is one of gitCloneStrategies.
+    If not specified, a shallow clone is done if depth is provided, otherwise a full clone.
+    '''
     if packageName:
         clonedFolder = os.path.join(tpath, packageName)
     else:
         clonedFolder = tpath
+    if strategy is None:
+        strategy = 'shallow' if depth else 'full'
+    strategy = gitDetermineCloneStrategy( strategy )
     prompt = "Cloning the upstream repo at %s into %s" % ( gitUpstreamRepo, clonedFolder )
-    gitCommand = "clone --recursive %s %s" % ( gitUpstreamRepo, clonedFolder )
+    gitCommand = [ "clone", "--recursive", gitUpstreamRepo, clonedFolder ]
     if branch:
-        gitCommand += " --branch %s" % branch
+        gitCommand += [ "--branch", branch ]
         prompt += " from branch %s" % branch
         if gitGetVersionNumber() > 1.08:
-            gitCommand += " --config advice.detachedHead=false"
-    #if depth and gitUpstreamRepo.find('://') > 0:
-    if depth:
-        gitCommand += " --no-local --depth %d" % depth
+            gitCommand += [ "--config", "advice.detachedHead=false" ]
+    isLocalRepo = gitUpstreamRepo.find('://') < 0 and not gitUpstreamRepo.startswith( 'git@' )
+    if strategy == 'shallow':
+        gitCommand += [ "--no-local", "--depth", str( depth if depth else DEF_GIT_RELEASE_DEPTH ) ]
+    elif strategy == 'singletag':
+        gitCommand += [ "--no-local", "--depth", "1", "--single-branch" ]
+    elif strategy == 'blobless' or strategy == 'sparse':
+        gitCommand += [ "--filter=blob:none" ]
+        if isLocalRepo:
+            gitCommand += [ "--no-local", "--upload-pack", gitFilterUploadPack,
+                            "--config", "remote.origin.uploadpack=%s" % gitFilterUploadPack ]
+        if strategy == 'sparse':
+            gitCommand += [ "--no-checkout" ]
+    if strategy != 'full':
+        prompt += " (%s)" % strategy
     #May throw RuntimeError or subprocess.CalledProcessError exceptions
     print(prompt)
     #print "%s" % prompt
     git_check_call( gitCommand, debug=verbose )
+    if strategy == 'sparse':
+        sparsePatterns = [ '/*' ] + [ '!' + exclude for exclude in DEF_GIT_SPARSE_EXCLUDES ]
+        git_check_call( [ "-C", clonedFolder, "sparse-checkout", "set", "--no-cone" ] + sparsePatterns, debug=verbose )
+        git_check_call( [ "-C", clonedFolder, "checkout", "-q" ], debug=verbose )
+        if os.path.isfile( os.path.join( clonedFolder, '.gitmodules' ) ):
+            git_check_call( [ "-C", clonedFolder, "submodule", "update", "--init", "--recursive" ], debug=verbose )
     return clonedFolder
 
 def createGitIgnore():
@@ -295,13 +969,13 @@ def createGitIgnore():
                     ]
     with open(".gitignore", "w") as f:
         f.write("\n".join(gitIgnoreLines))
-    subprocess.check_call(['git', 'add', '.gitignore'])
+    cmd_check_call(['git', 'add', '.gitignore'])
 
 def gitCommitAndPush( message ):
     '''Call git commit and git push'''
-    subprocess.check_call(['git', 'commit', '-m', message ])
+    cmd_check_call(['git', 'commit', '-m', message ])
     message = 'Initial commit/import from eco. Added a default .gitignore and other defaults.'
-    subprocess.check_call(['git', 'push' ])
+    cmd_check_call(['git', 'push' ])
 
 def addPackageToEcoModuleList(packageName, gitUpstreamRepo):
     '''Add the package with the given upstream repo to eco's modulelist'''
@@ -324,19 +998,19 @@ def addPackageToEcoModuleList(packageName, gitUpstreamRepo):
     except:
         raise
 
-    subprocess.check_call(['git', 'pull', '--rebase'])
+    cmd_check_call(['git', 'pull', '--rebase'])
     with open('modulelist.txt', 'a') as f:
         f.write(packageName + "\t\t\t" + gitUpstreamRepo+"\n")
-    subprocess.check_call(['git', 'add', 'modulelist.txt'])
-    subprocess.check_call(['git', 'commit', '-m', 'eco added package ' + packageName + ' located at ' + gitUpstreamRepo])
-    subprocess.check_call(['git', 'pull', '--rebase'])
-    subprocess.check_call(['git', 'push' ])
+    cmd_check_call(['git', 'add', 'modulelist.txt'])
+    cmd_check_call(['git', 'commit', '-m', 'eco added package ' + packageName + ' located at ' + gitUpstreamRepo])
+    cmd_check_call(['git', 'pull', '--rebase'])
+    cmd_check_call(['git', 'push' ])
     os.chdir(curDir)
 
 def createBranchFromTag( tag, branchName ):
     '''Checkout the tag and create a branch using the tag as a starting point.'''
-    subprocess.check_call(['git', 'checkout', '-q', tag])
-    subprocess.check_call(['git', 'checkout', '-b', branchName])
+    cmd_check_call(['git', 'checkout', '-q', tag])
+    cmd_check_call(['git', 'checkout', '-b', branchName])
 
 def gitGetWorkingBranch( debug = False, verbose = False ):
     '''See if the current directory is the top of an git working directory.
@@ -348,13 +1022,13 @@ def gitGetWorkingBranch( debug = False, verbose = False ):
     repo_tag    = None
     try:
         repoCmd = [ 'git', 'symbolic-ref', 'HEAD' ]
-        statusInfo = subprocess.check_output( repoCmd, stderr=subprocess.STDOUT )
+        statusInfo = cmd_check_output( repoCmd, stderr=subprocess.STDOUT, universal_newlines=True )
         statusLines = statusInfo.splitlines()
         if len(statusLines) > 0 and statusLines[0].startswith( 'refs/heads/' ):
             repo_branch = statusLines[0].split('/')[2]
 
         repoCmd = [ 'git', 'remote', '-v' ]
-        statusInfo = subprocess.check_output( repoCmd, stderr=subprocess.STDOUT )
+        statusInfo = cmd_check_output( repoCmd, stderr=subprocess.STDOUT, universal_newlines=True )
         statusLines = statusInfo.splitlines()
         for line in statusLines:
             if line is None:
@@ -375,7 +1049,7 @@ def gitGetWorkingBranch( debug = False, verbose = False ):
                 repo_url = repoPath
 
         # See if HEAD corresponds to any tags
-        statusInfo = subprocess.check_output( [ 'git', 'name-rev', '--name-only', '--tags', 'HEAD' ], stderr=subprocess.STDOUT )
+        statusInfo = cmd_check_output( [ 'git', 'name-rev', '--name-only', '--tags', 'HEAD' ], stderr=subprocess.STDOUT, universal_newlines=True )
         statusLines = statusInfo.splitlines()
         if len(statusLines) > 0:
             # Just grab the first tag that matches
@@ -411,25 +1085,12 @@ def determinePathToGitRepo( packagePath, verbose = False ):
     # Check under the root of the git repo area for a bare repo w/ the right name
     gitRoot = determineGitRoot()
     gitPackageDir  = packageName + ".git"
-    gitPackagePath = packagePath + ".git"
     if not os.path.isdir( DEF_CVS_ROOT ) and gitRoot:
         # Must be offsite, assume gitRoot and an EPICS module path
         return os.path.join( gitRoot, 'package/epics/modules', gitPackageDir )
-    for dirPath, dirs, files in os.walk( gitRoot, topdown=True ):
-        if len( dirs ) == 0:
-            continue
-        for dir in dirs[:]:
-            if dir == 'from-svn' or dir == 'from-cvs':
-                # Remove from list so we don't search these import directories
-                dirs.remove( dir )
-                continue
-            if os.path.isdir( os.path.join( dirPath, gitPackagePath ) ):
-                return os.path.join( dirPath, gitPackagePath )
-            if dir == gitPackagePath:
-                return os.path.join( dirPath, dir )
-            if dir.endswith( ".git" ):
-                # Remove from list so we don't search recursively
-                dirs.remove( dir )
+    gitRepoPath = getGitRepoIndex( gitRoot, verbose=verbose ).lookup( packagePath )
+    if gitRepoPath:
+        return gitRepoPath
     # Didn't find a match in eco_modulelist or git paths.
     # Check for an svn package
     (svn_url, svn_path, svn_tag) = svnFindPackageRelease( packagePath, tag = None, verbose=verbose )
@@ -437,10 +1098,67 @@ def determinePathToGitRepo( packagePath, verbose = False ):
         return svn_url
     return None
 
-def gitFindPackageRelease( packageSpec, tag, debug = False, verbose = False ):
+def gitFindPackageRelease( packageSpec, tag, debug = False, verbose = False, useCache = False ):
+    '''
+    Find the git repo for packageSpec that has the specified tag.
+    If useCache is True, see gitGetRemoteTag()
+    Returns ( repo_url, repo_tag ), or ( None, None ) if not found.
+    '''
     (repo_url, repo_tag) = (None, None)
     if verbose:
         print("gitFindPackageRelease( packageSpec=%s, tag=%s )" % ( packageSpec, tag ))
+    ( packagePath, tag, urls ) = gitPackageRepoUrls( packageSpec, tag, verbose=verbose )
+    for url_path in urls:
+        (repo_sha, repo_tag) = gitGetRemoteTag( url_path, tag, verbose=verbose, useCache=useCache )
+        if repo_sha is not None:
+            repo_url = url_path
+            break
+
+    if verbose:
+        if repo_url:
+            print("gitFindPackageRelease found %s/%s: url=%s, tag=%s" % ( packagePath, tag, repo_url, repo_tag ))
+        else:
+            print("gitFindPackageRelease Error: Cannot find %s/%s" % (packagePath, tag))
+    return (repo_url, repo_tag)
+
+async def gitFindPackageReleaseAsync( packageSpec, tag, debug = False, verbose = False, useCache = False ):
+    '''
+    asyncio counterpart of gitFindPackageRelease().
+    The candidate repo urls are still checked one at a time, as the first one usually
+    has the tag, but other packages can be looked up meanwhile, see gitFindPackageReleases().
+    Returns ( repo_url, repo_tag ), or ( None, None ) if not found.
+    '''
+    (repo_url, repo_tag) = (None, None)
+    ( packagePath, tag, urls ) = gitPackageRepoUrls( packageSpec, tag, verbose=verbose )
+    for url_path in urls:
+        (repo_sha, repo_tag) = await gitGetRemoteTagAsync( url_path, tag, verbose=verbose, useCache=useCache )
+        if repo_sha is not None:
+            repo_url = url_path
+            break
+    if verbose:
+        if repo_url:
+            print("gitFindPackageReleaseAsync found %s/%s: url=%s, tag=%s" % ( packagePath, tag, repo_url, repo_tag ))
+        else:
+            print("gitFindPackageReleaseAsync Error: Cannot find %s/%s" % (packagePath, tag))
+    return (repo_url, repo_tag)
+
+def gitFindPackageReleases( packageSpecs, debug = False, verbose = False, useCache = False ):
+    '''
+    Find the git repos for a list of ( packageSpec, tag ) concurrently, see gitFindPackageRelease().
+    Returns a list of ( repo_url, repo_tag ) in the same order, w/ ( None, None ) for those not found.
+    '''
+    async def findAll():
+        return await asyncio.gather( *[ gitFindPackageReleaseAsync( packageSpec, tag, debug=debug, verbose=verbose, useCache=useCache )
+                                        for ( packageSpec, tag ) in packageSpecs ] )
+    return list( asyncio.run( findAll() ) )
+
+def gitPackageRepoUrls( packageSpec, tag, verbose = False ):
+    '''
+    Returns ( packagePath, tag, urls ), where urls lists the git repo urls that may have
+    packageSpec, in the order gitFindPackageRelease() checks them.
+    If tag is None, it's taken from the end of packageSpec.
+    '''
+    urls = []
     if tag:
         packagePath = packageSpec
     else:
@@ -450,33 +1168,25 @@ def gitFindPackageRelease( packageSpec, tag, debug = False, verbose = False ):
     else:
         packageName = packagePath
     if verbose:
-        print("gitFindPackageRelease: packageName=%s, packagePath=%s" % ( packageName, packagePath ))
+        print("gitPackageRepoUrls: packageName=%s, packagePath=%s" % ( packageName, packagePath ))
 
     # See if the package was listed in $TOOLS/eco_modulelist/modulelist.txt
     if packageName in git_package2Location:
-        url_path = determinePathToGitRepo( packageName, verbose=verbose )
-        (repo_sha, repo_tag) = gitGetRemoteTag( url_path, tag, verbose=verbose )
-        if repo_sha:
-            repo_url = url_path
+        urls.append( determinePathToGitRepo( packageName, verbose=verbose ) )
     else:
+        # Try the site repo index first so we don't have to probe each url_root
+        if os.path.isdir( determineGitRoot() ):
+            url_path = getGitRepoIndex( verbose=verbose ).lookup( packagePath )
+            if url_path:
+                urls.append( url_path )
         for url_root in [ DEF_GIT_MODULES_PATH, DEF_GIT_EXTENSIONS_PATH, DEF_GIT_EPICS_PATH, DEF_GIT_REPO_PATH ]:
-            if repo_url is not None:
-                break
             for p in [ packageName, packagePath ]:
                 url_path = '%s/%s.git' % ( url_root, p )
-                (repo_sha, repo_tag) = gitGetRemoteTag( url_path, tag, verbose=verbose )
-                if repo_sha is not None:
-                    repo_url = url_path
-                    break
+                if url_path not in urls:
+                    urls.append( url_path )
                 if packageName == packagePath:
                     break
-
-    if verbose:
-        if repo_url:
-            print("gitFindPackageRelease found %s/%s: url=%s, tag=%s" % ( packagePath, tag, repo_url, repo_tag ))
-        else:
-            print("gitFindPackageRelease Error: Cannot find %s/%s" % (packagePath, tag))
-    return (repo_url, repo_tag)
+    return ( packagePath, tag, urls )
 
 def git_get_versionFileName():
     '''If git config has a value for ecotools.versionfile,
@@ -505,7 +1215,7 @@ def gitGetVersion():
     Returns None on error'''
     version = None
     try:
-        git_output = git_check_output( "git --version" ).splitlines()
+        git_output = git_check_output( "git --version" ).decode().splitlines()
         if len(git_output) >= 1:
             version = git_output[0].split()[-1]
     except:
@@ -0,0 +1,470 @@
+'''
+Utilities for evaluating gnu make style macro files such as RELEASE_SITE
+and configure/RELEASE*, with parse results cached per file signature.
+
+Supports the subset of gnu make used in EPICS configure files:
+    VAR = value, VAR := value, VAR ::= value, VAR ?= value, VAR += value
+    ifdef, ifndef, ifeq, ifneq, else, endif
+    include, -include, sinclude
+    $(wildcard ...), $(dir ...), $(notdir ...), $(abspath ...), $(realpath ...),
+    $(strip ...), $(firstword ...), $(lastword ...), $(subst ...), $(if ...)
+'''
+
+import os
+import re
+import glob
+from collections import ChainMap
+from types import MappingProxyType
+
+# Pre-compile regular expressions for speed
+macroAssignRegExp   = re.compile( r"^(?:override\s+|export\s+)*([A-Za-z0-9_.-]+)\s*(::=|:=|\?=|\+=|=)\s*(.*)$" )
+condDirectiveRegExp = re.compile( r"^(ifdef|ifndef|ifeq|ifneq)(?:\s+|(?=[(\"']))(.*)$" )
+includeRegExp       = re.compile( r"^(include|-include|sinclude)\s+(.*)$" )
+quotedArgsRegExp    = re.compile( r"""^(["'])(.*?)\1\s+(["'])(.*?)\3$""" )
+macroNameRefRegExp  = re.compile( r"\$[({]([A-Za-z0-9_.-]+)[)}]" )
+
+# Assignment operators which don't depend on prior definitions
+_contextFreeOps     = ( '=', ':=', '::=' )
+
+def fileSignature( filePath ):
+    '''Returns a tuple that changes whenever filePath is modified,
+    or None if filePath cannot be stat'ed.'''
+    try:
+        pathStatus = os.stat( filePath )
+    except OSError:
+        return None
+    return ( pathStatus.st_ino, pathStatus.st_size, pathStatus.st_mtime_ns )
+
+def _findClosingParen( text, start, opener, closer ):
+    '''Returns the index of the closer matching the opener at text[start-1]'''
+    depth = 1
+    for i in range( start, len(text) ):
+        c = text[i]
+        if c == opener:
+            depth += 1
+        elif c == closer:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _splitArgs( text ):
+    '''Split function arguments on commas which aren't nested in parens.'''
+    args  = []
+    depth = 0
+    start = 0
+    for i, c in enumerate( text ):
+        if c in '({':
+            depth += 1
+        elif c in ')}':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            args.append( text[start:i] )
+            start = i + 1
+    args.append( text[start:] )
+    return args
+
+def _fnDir( words ):
+    return ' '.join( [ ( os.path.dirname( w ) + '/' ) if '/' in w else './' for w in words.split() ] )
+
+def _fnWildcard( patterns ):
+    matches = []
+    for pattern in patterns.split():
+        matches += sorted( glob.glob( pattern ) )
+    return ' '.join( matches )
+
+def _fnRealpath( words ):
+    return ' '.join( [ os.path.realpath( w ) for w in words.split() if os.path.exists( w ) ] )
+
+# Single argument make functions
+_makeFunctions = {
+    'abspath'   : lambda words: ' '.join( [ os.path.abspath( w ) for w in words.split() ] ),
+    'dir'       : _fnDir,
+    'firstword' : lambda words: words.split()[0]  if words.split() else '',
+    'lastword'  : lambda words: words.split()[-1] if words.split() else '',
+    'notdir'    : lambda words: ' '.join( [ os.path.basename( w ) for w in words.split() ] ),
+    'realpath'  : _fnRealpath,
+    'strip'     : lambda words: ' '.join( words.split() ),
+    'wildcard'  : _fnWildcard,
+}
+
+def expandMakeRefs( text, macroDict, keepUndefined=True, _active=() ):
+    '''Expand $(NAME), ${NAME} and supported function references in text.
+    If keepUndefined is True, references to undefined macros are left in
+    place so they can be expanded later, otherwise they expand to an empty
+    string as they would in gnu make.'''
+    if '$' not in text:
+        return text
+    expanded = []
+    pos = 0
+    while True:
+        start = text.find( '$', pos )
+        if start < 0 or start + 1 >= len(text):
+            expanded.append( text[pos:] )
+            break
+        expanded.append( text[pos:start] )
+        opener = text[start + 1]
+        if opener == '$':
+            expanded.append( '$$' if keepUndefined else '$' )
+            pos = start + 2
+            continue
+        if opener not in '({':
+            # Automatic variables such as $@ only have meaning in rules
+            expanded.append( text[start:start + 2] )
+            pos = start + 2
+            continue
+        closer = ')' if opener == '(' else '}'
+        end = _findClosingParen( text, start + 2, opener, closer )
+        if end < 0:
+            expanded.append( text[start:] )
+            break
+        ref  = text[start:end + 1]
+        body = text[start + 2:end]
+        pos  = end + 1
+
+        # Function call?
+        parts = body.split( None, 1 )
+        if len(parts) == 2 and ( parts[0] in _makeFunctions or parts[0] in ( 'subst', 'if' ) ):
+            ( fnName, fnArgs ) = parts
+            args = [ expandMakeRefs( a, macroDict, keepUndefined, _active ) for a in _splitArgs( fnArgs ) ]
+            if fnName == 'subst':
+                if len(args) == 3:
+                    expanded.append( args[2].replace( args[0], args[1] ) )
+            elif fnName == 'if':
+                if args[0].strip():
+                    expanded.append( args[1] if len(args) > 1 else '' )
+                else:
+                    expanded.append( args[2] if len(args) > 2 else '' )
+            else:
+                expanded.append( _makeFunctions[fnName]( ','.join( args ) ) )
+            continue
+
+        # Macro reference, possibly w/ a computed name
+        macroName = expandMakeRefs( body, macroDict, keepUndefined, _active ).strip()
+        if macroName in macroDict and macroName not in _active:
+            expanded.append( expandMakeRefs( macroDict[macroName], macroDict, keepUndefined,
+                                             _active + ( macroName, ) ) )
+        elif keepUndefined:
+            expanded.append( ref )
+    return ''.join( expanded )
+
+class MacroEnv( ChainMap ):
+    '''Layered, copy-on-write macro environment.
+    Writes always go to the top layer, maps[0].  Lower layers are
+    read-only views, so a layer parsed from a shared file such as
+    RELEASE_SITE can be stacked under any number of environments.'''
+    def __init__( self, *maps ):
+        super(MacroEnv, self).__init__( *maps )
+
+    def pushLayer( self, layer ):
+        '''Stack a read-only layer over the current contents.
+        Macros in layer override any prior definitions, and later
+        writes still override layer, just as if the layer's
+        assignments had been made in place.'''
+        self.maps = [ {}, layer, MappingProxyType( self.maps[0] ) ] + self.maps[1:]
+
+    def expandAll( self ):
+        '''Expand any values which still contain macro references.
+        Expanded values are written to the top layer so shared
+        layers are never modified.'''
+        for macroName in self:
+            macroValue = self[macroName]
+            if '$' not in macroValue:
+                continue
+            expandedValue = expandMakeRefs( macroValue, self )
+            if expandedValue != macroValue:
+                self[macroName] = expandedValue
+
+def assignMacro( macroDict, macroName, op, macroValue ):
+    '''Assign macroValue to macroName using gnu make assignment semantics.'''
+    if op == '?=':
+        if macroName not in macroDict:
+            macroDict[macroName] = macroValue
+    elif op == '+=':
+        if macroDict.get( macroName ):
+            macroDict[macroName] = macroDict[macroName] + ' ' + macroValue
+        else:
+            macroDict[macroName] = macroValue
+    elif op == ':=' or op == '::=':
+        macroDict[macroName] = expandMakeRefs( macroValue, macroDict )
+    else:
+        macroDict[macroName] = macroValue
+
+def evalCondition( kind, args, macroDict ):
+    '''Evaluate an ifdef, ifndef, ifeq or ifneq condition.'''
+    if kind == 'ifdef' or kind == 'ifndef':
+        macroName = expandMakeRefs( args, macroDict, keepUndefined=False ).strip()
+        # Like gnu make, ifdef only checks for a non-empty value, w/o expanding it
+        isDefined = len( macroDict.get( macroName, '' ) ) > 0
+        return isDefined if kind == 'ifdef' else not isDefined
+    if args is None:
+        return False
+    arg1 = expandMakeRefs( args[0], macroDict, keepUndefined=False ).strip()
+    arg2 = expandMakeRefs( args[1], macroDict, keepUndefined=False ).strip()
+    return ( arg1 == arg2 ) if kind == 'ifeq' else ( arg1 != arg2 )
+
+def _parseCondArgs( kind, args ):
+    '''Parse condition args at parse time.
+    ifdef/ifndef args are a macro name, ifeq/ifneq args are a tuple
+    of the two unexpanded strings to compare, or None if unparsable.'''
+    args = args.strip()
+    if kind == 'ifdef' or kind == 'ifndef':
+        return args
+    if args.startswith( '(' ) and args.endswith( ')' ):
+        compareArgs = _splitArgs( args[1:-1] )
+        if len(compareArgs) == 2:
+            return ( compareArgs[0], compareArgs[1] )
+        return None
+    quotedMatch = quotedArgsRegExp.search( args )
+    if quotedMatch:
+        return ( quotedMatch.group(2), quotedMatch.group(4) )
+    return None
+
+def _stripComment( line ):
+    '''Remove any trailing comment, honoring \\# escapes.'''
+    hashIndex = line.find( '#' )
+    while hashIndex >= 0:
+        if hashIndex > 0 and line[hashIndex - 1] == '\\':
+            line = line[:hashIndex - 1] + line[hashIndex:]
+            hashIndex = line.find( '#', hashIndex )
+            continue
+        return line[:hashIndex]
+    return line
+
+def _joinContinuationLines( lines ):
+    '''Join backslash-newline continued lines into one logical line.'''
+    logicalLine = ''
+    for line in lines:
+        line = line.rstrip( '\n' )
+        if line.endswith( '\\' ) and not line.endswith( '\\\\' ):
+            logicalLine += line[:-1].rstrip() + ' '
+            continue
+        yield logicalLine + line.lstrip() if logicalLine else line
+        logicalLine = ''
+    if logicalLine:
+        yield logicalLine
+
+class MacroFile(object):
+    '''Parsed contents of one macro file.
+    statements is a list of tuples:
+        ( 'include', required, includeFileRefs )
+        ( 'set', macroName, op, macroValue )
+        ( 'if', kind, args )
+        ( 'else', kind, args )  kind is None for a plain else
+        ( 'endif', )
+    '''
+    def __init__( self, filePath, signature, statements ):
+        self.filePath   = filePath
+        self.signature  = signature
+        self.statements = statements
+        self._layer     = None
+        self._isShared  = None
+        self._macroDefs = None
+        self._macroRefs = None
+
+    def getMacroDefs( self ):
+        '''Returns the set of macro names given a non-empty value in this file,
+        whether or not the assignment is inside a conditional.'''
+        if self._macroDefs is None:
+            self._macroDefs = set( [ s[1] for s in self.statements if s[0] == 'set' and s[3] ] )
+        return self._macroDefs
+
+    def getMacroRefs( self ):
+        '''Returns the set of macro names referenced via $(NAME) or ${NAME}
+        in assignments, includes and conditionals in this file.'''
+        if self._macroRefs is None:
+            self._macroRefs = set()
+            for statement in self.statements:
+                for field in statement[1:]:
+                    if isinstance( field, tuple ):
+                        field = ' '.join( field )
+                    if isinstance( field, str ) and '$' in field:
+                        self._macroRefs.update( macroNameRefRegExp.findall( field ) )
+        return self._macroRefs
+
+    def getSharedLayer( self ):
+        '''Returns a read-only, fully expanded layer for this file
+        if its macros don't depend on anything defined outside of it.
+        Returns None if the file has to be evaluated in context.'''
+        if self._isShared is None:
+            self._isShared = False
+            layerDict = {}
+            for statement in self.statements:
+                if statement[0] != 'set' or statement[2] not in _contextFreeOps:
+                    return None
+                assignMacro( layerDict, statement[1], statement[2], statement[3] )
+            for macroName in layerDict:
+                layerDict[macroName] = expandMakeRefs( layerDict[macroName], layerDict )
+                if '$(' in layerDict[macroName] or '${' in layerDict[macroName]:
+                    return None
+            self._layer    = MappingProxyType( layerDict )
+            self._isShared = True
+        return self._layer
+
+def parseMacroLines( lines ):
+    '''Parse gnu make directives and macro assignments from lines of text.
+    Returns a list of statements as described in MacroFile.'''
+    statements = []
+    inDefine   = False
+    for line in _joinContinuationLines( lines ):
+        line = _stripComment( line ).strip()
+        if len(line) == 0:
+            continue
+
+        # Multi-line define blocks are skipped
+        if inDefine:
+            if line == 'endef':
+                inDefine = False
+            continue
+        if line.startswith( 'define ' ):
+            inDefine = True
+            continue
+
+        if line == 'endif':
+            statements.append( ( 'endif', ) )
+            continue
+        if line == 'else' or line.startswith( 'else ' ):
+            condition = line[4:].strip()
+            condMatch = condDirectiveRegExp.search( condition )
+            if condMatch:
+                kind = condMatch.group(1)
+                statements.append( ( 'else', kind, _parseCondArgs( kind, condMatch.group(2) ) ) )
+            else:
+                statements.append( ( 'else', None, None ) )
+            continue
+        condMatch = condDirectiveRegExp.search( line )
+        if condMatch:
+            kind = condMatch.group(1)
+            statements.append( ( 'if', kind, _parseCondArgs( kind, condMatch.group(2) ) ) )
+            continue
+
+        includeMatch = includeRegExp.search( line )
+        if includeMatch:
+            required = includeMatch.group(1) == 'include'
+            statements.append( ( 'include', required, includeMatch.group(2) ) )
+            continue
+
+        macroMatch = macroAssignRegExp.search( line )
+        if macroMatch:
+            statements.append( ( 'set', macroMatch.group(1), macroMatch.group(2), macroMatch.group(3).strip() ) )
+    return statements
+
+# Parsed macro files by path
+_macroFileCache = {}
+
+def getMacroFile( filePath ):
+    '''Returns a MacroFile for filePath, reusing the prior parse if
+    the file hasn't changed.  Returns None if the file can't be read.'''
+    signature = fileSignature( filePath )
+    if signature is None:
+        return None
+    cacheKey = os.path.abspath( filePath )
+    macroFile = _macroFileCache.get( cacheKey )
+    if macroFile is not None and macroFile.signature == signature:
+        return macroFile
+    try:
+        with open( filePath, "r" ) as in_file:
+            statements = parseMacroLines( in_file )
+    except IOError:
+        return None
+    macroFile = MacroFile( filePath, signature, statements )
+    _macroFileCache[cacheKey] = macroFile
+    return macroFile
+
+class FileSource(object):
+    '''Where getMacrosFromFile() reads macro files from.
+    This one reads the filesystem.  Subclasses can read other places, ex. a git tag.'''
+    def glob( self, pattern ):
+        '''Returns the list of file paths matching an include file pattern'''
+        return glob.glob( pattern )
+
+    def getMacroFile( self, filePath ):
+        '''Returns a MacroFile for filePath, or None if it can't be read'''
+        return getMacroFile( filePath )
+
+defaultFileSource = FileSource()
+
+def getMacrosFromFile( filePath, macroDict, debug = False, required = False, includeGraph = None, fileSource = None ):
+    '''Find and return a dictionary of gnu make style macros
+    found in a file.  Ex. macroDict['BASE_MODULE_VERSION'] = 'R3.15.5-1.0'
+    The returned dictionary is a MacroEnv, so files such as RELEASE_SITE
+    which don't depend on other macros are parsed and expanded once and
+    then shared as a read-only layer by every release that includes them.
+    If includeGraph is a dict, it is updated w/ the list of files
+    included by each file evaluated.
+    fileSource is the FileSource to read filePath and any includes from,
+    which defaults to the filesystem.
+    '''
+    if fileSource is None:
+        fileSource = defaultFileSource
+    macroFile = fileSource.getMacroFile( filePath )
+    if macroFile is None:
+        if required:
+            print(("getMacrosFromFile Error: unable to open %s" % filePath))
+        return macroDict
+    if not isinstance( macroDict, MacroEnv ):
+        macroDict = MacroEnv( macroDict )
+    if debug:
+        print(("getMacrosFromFile %s: %d versions on entry" % ( filePath, len(macroDict) )))
+
+    sharedLayer = macroFile.getSharedLayer()
+    if sharedLayer is not None:
+        if debug:
+            print(("getMacrosFromFile %s: using shared layer of %d macros" % ( filePath, len(sharedLayer) )))
+        macroDict.pushLayer( sharedLayer )
+        return macroDict
+
+    # Each entry is [ parentActive, branchTaken ]
+    condStack = []
+    active    = True
+    for statement in macroFile.statements:
+        directive = statement[0]
+        if directive == 'if':
+            isTrue = active and evalCondition( statement[1], statement[2], macroDict )
+            condStack.append( [ active, isTrue ] )
+            active = isTrue
+            continue
+        if directive == 'else':
+            if len(condStack) == 0:
+                continue
+            ( parentActive, branchTaken ) = condStack[-1]
+            if branchTaken or not parentActive:
+                active = False
+            elif statement[1] is None:
+                active = True
+            else:
+                active = evalCondition( statement[1], statement[2], macroDict )
+            if active:
+                condStack[-1][1] = True
+            continue
+        if directive == 'endif':
+            if len(condStack) > 0:
+                active = condStack.pop()[0]
+            continue
+        if not active:
+            continue
+
+        if directive == 'include':
+            ( directive, isRequired, includeFileRefs ) = statement
+            includeFiles = []
+            # Expand macros and glob include file references
+            for ref in expandMakeRefs( includeFileRefs, macroDict ).split():
+                includeFiles += fileSource.glob( ref )
+            if includeGraph is not None:
+                includeGraph.setdefault( filePath, [] ).extend( includeFiles )
+            # Recursively call getMacrosFromFile for each includeFile
+            for includeFile in includeFiles:
+                macroDict = getMacrosFromFile( includeFile, macroDict, debug, isRequired, includeGraph, fileSource )
+            continue
+
+        ( directive, macroName, op, macroValue ) = statement
+        if debug:
+            print(("getMacrosFromFile: %s %s %s" % ( macroName, op, macroValue )))
+        assignMacro( macroDict, macroName, op, macroValue )
+
+    # Expand macro values
+    macroDict.expandAll()
+
+    if debug:
+        print(("getMacrosFromFile %s: %d versions on exit" % ( filePath, len(macroDict) )))
+    return macroDict
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+#==============================================================
+#
+#  makeSyntheticSite.py:  Create a fake EPICS site for testing and benchmarking eco_tools
+#
+#  Creates, under --top:
+#      epics/base/<baseVer>/startup/EpicsHostArch
+#      epics/<baseVer>/modules/<module>/<release>   w/ configure/RELEASE, RELEASE_SITE and built cookies
+#      epics/<baseVer>/modules/modulelist.txt        latest release of each module, for whatsAffected.py
+#      epics/ioc/common/<ioc>/<release>               IOC apps that depend on the modules
+#      epics/ioc/<hutch>/<ioc>/<release>              Templated IOCs w/ a build dir and <child>.cfg files
+#      git/package/epics/modules/<module>.git         Bare repos w/ a tag for each module release
+#      tools/eco_modulelist/modulelist.txt           The eco module list for the bare repos
+#      cvsroot/CVSROOT/modules
+#      site.json and env.sh                           The environment to use the site
+#
+#  Module dependencies form a random DAG, seeded so the same args always give the same site.
+#
+#  Example:
+#      makeSyntheticSite.py --top /tmp/site --modules 50 --releases 8
+#      source /tmp/site/env.sh
+#      epics-versions -v mod007
+#
+#==============================================================
+import os
+import sys
+import json
+import random
+import argparse
+import subprocess
+
+hostArch = 'linux-x86_64'
+
+def writeFile( filePath, contents, mode=None ):
+    fileDir = os.path.dirname( filePath )
+    if not os.path.isdir( fileDir ):
+        os.makedirs( fileDir, 0o775 )
+    with open( filePath, 'w' ) as f:
+        f.write( contents )
+    if mode is not None:
+        os.chmod( filePath, mode )
+
+def releaseSiteContents( siteTop, baseVer ):
+    return  '# RELEASE_SITE Location of EPICS_SITE_TOP, EPICS_MODULES, and BASE_MODULE_VERSION\n' \
+            'BASE_MODULE_VERSION=%s\n' \
+            'EPICS_SITE_TOP=%s\n' \
+            'BASE_SITE_TOP=$(EPICS_SITE_TOP)/base\n' \
+            'EPICS_MODULES=$(EPICS_SITE_TOP)/$(BASE_MODULE_VERSION)/modules\n' % ( baseVer, siteTop )
+
+def releaseContents( depends ):
+    '''depends is a list of ( moduleName, release )'''
+    lines  = [ '# RELEASE Location of external products' ]
+    lines += [ 'include $(TOP)/RELEASE_SITE', '' ]
+    for ( moduleName, release ) in depends:
+        macroName = moduleName.upper()
+        lines += [ '%s_MODULE_VERSION=%s' % ( macroName, release ) ]
+    lines += [ '' ]
+    for ( moduleName, release ) in depends:
+        macroName = moduleName.upper()
+        lines += [ '%s=$(EPICS_MODULES)/%s/$(%s_MODULE_VERSION)' % ( macroName, moduleName, macroName ) ]
+    lines += [ '', 'EPICS_BASE=$(BASE_SITE_TOP)/$(BASE_MODULE_VERSION)' ]
+    lines += [ '-include $(TOP)/configure/RELEASE.local', '' ]
+    return '\n'.join( lines )
+
+makefileContents = 'TOP = .\ninclude $(TOP)/configure/CONFIG\nDIRS += configure\ninclude $(TOP)/configure/RULES_TOP\n'
+
+def makeRelease( releaseDir, siteTop, baseVer, depends ):
+    '''Create an installed, built release w/ the given dependencies'''
+    writeFile( os.path.join( releaseDir, 'RELEASE_SITE' ), releaseSiteContents( siteTop, baseVer ) )
+    writeFile( os.path.join( releaseDir, 'configure', 'RELEASE' ), releaseContents( depends ) )
+    writeFile( os.path.join( releaseDir, 'Makefile' ), makefileContents )
+    writeFile( os.path.join( releaseDir, 'configure', 'O.' + hostArch, '.is_built' ), '' )
+
+def makeBareRepo( repoPath, commits ):
+    '''
+    Create a bare repo w/ git fast-import.
+    commits is a list of ( tag, { filePath: contents } ), each committed on top of the prior one.
+    '''
+    subprocess.check_call( [ 'git', 'init', '-q', '--bare', repoPath ] )
+    stream = []
+    mark = 0
+    commitTime = 1500000000
+    for ( tag, files ) in commits:
+        fileMarks = []
+        for filePath in sorted( files ):
+            mark += 1
+            data = files[filePath].encode()
+            stream.append( b'blob\nmark :%d\ndata %d\n%s\n' % ( mark, len(data), data ) )
+            fileMarks.append( ( filePath, mark ) )
+        mark += 1
+        message = ( 'Release %s' % tag ).encode()
+        commitTime += 86400
+        stream.append( b'commit refs/heads/master\nmark :%d\n' % mark )
+        stream.append( b'committer Synthetic Site <synthetic@example.com> %d +0000\n' % commitTime )
+        stream.append( b'data %d\n%s\n' % ( len(message), message ) )
+        for ( filePath, fileMark ) in fileMarks:
+            stream.append( b'M 100644 :%d %s\n' % ( fileMark, filePath.encode() ) )
+        stream.append( b'\nreset refs/tags/%s\nfrom :%d\n\n' % ( tag.encode(), mark ) )
+    proc = subprocess.Popen( [ 'git', '--git-dir', repoPath, 'fast-import', '--quiet' ], stdin=subprocess.PIPE )
+    proc.communicate( b''.join( stream ) )
+    if proc.returncode != 0:
+        raise RuntimeError( "git fast-import failed for %s" % repoPath )
+
+def makeSyntheticSite( top, nBases=2, nModules=30, nReleases=5, maxDepends=4, nIocs=10,
+                       nTemplatedIocs=3, nChildren=5, makeRepos=True, seed=1, verbose=False ):
+    '''Create the synthetic site under top and return its site.json info'''
+    rng         = random.Random( seed )
+    top         = os.path.abspath( top )
+    siteTop     = os.path.join( top, 'epics' )
+    gitTop      = os.path.join( top, 'git' )
+    toolsTop    = os.path.join( top, 'tools' )
+    cvsRoot     = os.path.join( top, 'cvsroot' )
+    baseVers    = [ 'R7.0.%d.1-%d.0' % ( i + 2, i + 1 ) for i in range( nBases ) ]
+    baseVer     = baseVers[-1]
+    modulesTop  = os.path.join( siteTop, baseVer, 'modules' )
+
+    for ver in baseVers:
+        baseTop = os.path.join( siteTop, 'base', ver )
+        writeFile( os.path.join( baseTop, 'startup', 'EpicsHostArch' ), '#!/bin/sh\necho %s\n' % hostArch, 0o775 )
+        writeFile( os.path.join( baseTop, 'configure', 'CONFIG_SITE' ), '' )
+
+    # Modules, each depending on a few of the ones before it
+    moduleNames = [ 'mod%03d' % i for i in range( nModules ) ]
+    moduleReleases = {}
+    moduleDepends = {}
+    for i, moduleName in enumerate( moduleNames ):
+        moduleReleases[moduleName] = [ 'R%d.%d.0' % ( 1 + r // 4, r % 4 ) for r in range( nReleases ) ]
+        candidates = moduleNames[:i]
+        moduleDepends[moduleName] = sorted( rng.sample( candidates, min( len(candidates), rng.randint( 1, maxDepends ) ) ) )
+
+    modulelistLines = []
+    for moduleName in moduleNames:
+        commits = []
+        for release in moduleReleases[moduleName]:
+            depends = [ ( dep, rng.choice( moduleReleases[dep] ) ) for dep in moduleDepends[moduleName] ]
+            releaseDir = os.path.join( modulesTop, moduleName, release )
+            makeRelease( releaseDir, siteTop, baseVer, depends )
+            commits.append( ( release, { 'configure/RELEASE': releaseContents( depends ), 'Makefile': makefileContents } ) )
+        if makeRepos:
+            repoPath = os.path.join( gitTop, 'package', 'epics', 'modules', moduleName + '.git' )
+            makeBareRepo( repoPath, commits )
+            modulelistLines.append( '%-20s $(GIT_TOP)/package/epics/modules/%s.git' % ( moduleName, moduleName ) )
+        if verbose:
+            print("Created %s w/ %d releases" % ( moduleName, len(commits) ))
+
+    # whatsAffected.py reads the latest version of each module from this
+    writeFile( os.path.join( modulesTop, 'modulelist.txt' ),
+               ''.join( [ '%s %s\n' % ( m, moduleReleases[m][-1] ) for m in moduleNames ] ) )
+    writeFile( os.path.join( toolsTop, 'eco_modulelist', 'modulelist.txt' ), '\n'.join( modulelistLines ) + '\n' )
+    writeFile( os.path.join( cvsRoot, 'CVSROOT', 'modules' ), '' )
+
+    # IOC apps
+    iocNames = [ 'ioc%03d' % i for i in range( nIocs ) ]
+    iocReleases = {}
+    for iocName in iocNames:
+        iocReleases[iocName] = [ 'R1.%d.0' % r for r in range( max( 1, nReleases // 2 ) ) ]
+        for release in iocReleases[iocName]:
+            modules = rng.sample( moduleNames, min( len(moduleNames), rng.randint( 1, maxDepends + 2 ) ) )
+            depends = [ ( m, rng.choice( moduleReleases[m] ) ) for m in sorted( modules ) ]
+            makeRelease( os.path.join( siteTop, 'ioc', 'common', iocName, release ), siteTop, baseVer, depends )
+
+    # Templated IOCs, each w/ child IOCs that run one of the IOC app releases
+    hutches = [ 'amo', 'sxr', 'xpp', 'cxi', 'mec', 'mfx', 'xcs' ]
+    for i in range( nTemplatedIocs ):
+        hutch = hutches[ i % len(hutches) ]
+        tmplName = 'tmpl%03d' % i
+        for r in range( max( 1, nReleases // 2 ) ):
+            releaseDir = os.path.join( siteTop, 'ioc', hutch, tmplName, 'R%d.0.0' % ( r + 1 ) )
+            os.makedirs( os.path.join( releaseDir, 'build' ), 0o775 )
+            for c in range( nChildren ):
+                parent = rng.choice( iocNames )
+                parentRelease = os.path.join( siteTop, 'ioc', 'common', parent, rng.choice( iocReleases[parent] ) )
+                writeFile( os.path.join( releaseDir, 'ioc-%s-%s-%02d.cfg' % ( hutch, tmplName, c ) ),
+                           'RELEASE=%s\nENGINEER=synthetic\nLOCATION=%s\n' % ( parentRelease, hutch.upper() ) )
+
+    env = { 'EPICS_SITE_TOP': siteTop, 'EPICS_BASE_VER': baseVer, 'EPICS_HOST_ARCH': hostArch,
+            'GIT_TOP': gitTop, 'TOOLS': toolsTop, 'CVSROOT': cvsRoot,
+            'ECO_CACHE_DIR': os.path.join( top, 'cache' ) }
+    siteInfo = { 'top': top, 'env': env, 'modulesTop': modulesTop, 'modules': moduleReleases,
+                 'depends': moduleDepends, 'iocs': iocReleases, 'seed': seed }
+    writeFile( os.path.join( top, 'site.json' ), json.dumps( siteInfo, indent=1, sort_keys=True ) )
+    writeFile( os.path.join( top, 'env.sh' ), ''.join( [ 'export %s=%s\n' % ( k, env[k] ) for k in sorted( env ) ] ) )
+    return siteInfo
+
+def process_options( argv ):
+    parser = argparse.ArgumentParser( description='Create a synthetic EPICS site for testing and benchmarking eco_tools.' )
+    parser.add_argument( '--top',           required=True, help='Directory to create the site in.  Must not exist.' )
+    parser.add_argument( '--bases',         type=int, default=2,  help='Number of EPICS base versions.' )
+    parser.add_argument( '--modules',       type=int, default=30, help='Number of modules.' )
+    parser.add_argument( '--releases',      type=int, default=5,  help='Number of releases per module.' )
+    parser.add_argument( '--maxDepends',    type=int, default=4,  help='Max number of modules each module depends on.' )
+    parser.add_argument( '--iocs',          type=int, default=10, help='Number of ioc/common IOC apps.' )
+    parser.add_argument( '--templatedIocs', type=int, default=3,  help='Number of templated IOCs.' )
+    parser.add_argument( '--children',      type=int, default=5,  help='Number of child .cfg files per templated IOC release.' )
+    parser.add_argument( '--noGit',         action='store_true',  help='Skip creating the bare git repos.' )
+    parser.add_argument( '--seed',          type=int, default=1,  help='Random seed for the module dependencies.' )
+    parser.add_argument( '-v', '--verbose', action='store_true',  help='Show progress.' )
+    return parser.parse_args( argv )
+
+def main( argv=None ):
+    options = process_options( argv )
+    if os.path.exists( options.top ):
+        print("makeSyntheticSite Error: %s already exists" % options.top)
+        return 1
+    makeSyntheticSite(  options.top, nBases=options.bases, nModules=options.modules, nReleases=options.releases,
+                        maxDepends=options.maxDepends, nIocs=options.iocs, nTemplatedIocs=options.templatedIocs,
+                        nChildren=options.children, makeRepos=not options.noGit, seed=options.seed, verbose=options.verbose )
+    print("Created synthetic site in %s\nTo use it: source %s" % ( options.top, os.path.join( options.top, 'env.sh' ) ))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,200 @@
+'''
+Query expressions over a SiteInventory, for epics-query.
+
+A query is one or more terms joined by and, or, not and parentheses:
+    package ~ ioc/* and uses asyn < R4.35 and base ~ R7.0.3*
+    name = gigECam and not depends ADCore >= R3.9
+Field terms compare a field of each release to a value:
+    name, package, path     w/ =, != or ~ (glob match)
+    version, base           w/ =, !=, ~, <, <=, > or >=, using version ordering
+Dependency terms match releases that use a package:
+    depends PKG [ op VERSION ]  releases whose configure/RELEASE has PKG
+    uses PKG [ op VERSION ]     the same, or via any release they depend on
+'''
+
+import re
+import fnmatch
+from version_utils import *
+
+queryTokenRegExp    = re.compile( r"""\s*(?:(\(|\))|(==|!=|<=|>=|=|<|>|~)|"([^"]*)"|'([^']*)'|([^\s()=!<>~"']+))""" )
+
+# Versions made only of numbers after any package prefix and R, ex. R4.35-1.0.0, asyn-R4-35
+numericVersionRegExp = re.compile( r"^(?:[a-zA-Z0-9_-]*[-_])?R?\d+(?:[-_.]\d+)*$" )
+
+queryKeywords       = [ 'and', 'or', 'not', 'uses', 'depends' ]
+queryNameFields     = [ 'name', 'package', 'path' ]
+queryVersionFields  = [ 'version', 'base' ]
+
+class QueryError( Exception ):
+    pass
+
+def tokenizeQuery( query ):
+    '''Returns a list of ( kind, text ), where kind is one of paren, op, word, or str for quoted words'''
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = queryTokenRegExp.match( query, pos )
+        if not match:
+            raise QueryError( "Unable to parse query at: %s" % query[pos:] )
+        pos = match.end()
+        if match.group(1):
+            tokens.append( ( 'paren', match.group(1) ) )
+        elif match.group(2):
+            tokens.append( ( 'op', match.group(2) ) )
+        elif match.group(3) is not None:
+            tokens.append( ( 'str', match.group(3) ) )
+        elif match.group(4) is not None:
+            tokens.append( ( 'str', match.group(4) ) )
+        else:
+            tokens.append( ( 'word', match.group(5) ) )
+    return tokens
+
+def compareVersion( version, op, value ):
+    '''Returns True if version op value, ex. compareVersion( 'R4.31-0.1.0', '<', 'R4.35' )'''
+    if version is None:
+        return False
+    if op == '~':
+        return fnmatch.fnmatchcase( version, value )
+    if op in [ '=', '==' ]:
+        if version == value:
+            return True
+        # Only numeric versions can match w/ different spelling, ex. R3-14-12 and R3.14.12
+        if not numericVersionRegExp.match( version ) or not numericVersionRegExp.match( value ):
+            return False
+        return VersionToRelKey( version ) == VersionToRelKey( value )
+    if op == '!=':
+        return not compareVersion( version, '=', value )
+    ( verKey, valueKey ) = ( VersionToRelKey( version ), VersionToRelKey( value ) )
+    if op == '<':
+        return verKey < valueKey
+    if op == '<=':
+        return verKey <= valueKey
+    if op == '>':
+        return verKey > valueKey
+    if op == '>=':
+        return verKey >= valueKey
+    raise QueryError( "Unknown version operator %s" % op )
+
+class QueryParser( object ):
+    '''
+    Recursive descent parser for query expressions.
+    parse() returns a tree of tuples:
+        ( 'and', left, right ), ( 'or', left, right ), ( 'not', expr )
+        ( 'field', fieldName, op, value )
+        ( 'uses', pkgName, op, version ) or ( 'depends', pkgName, op, version ) w/ None op and version for any version
+    '''
+    def __init__( self, query ):
+        self._tokens = tokenizeQuery( query )
+        self._pos    = 0
+
+    def _peek( self ):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else ( None, None )
+
+    def _next( self ):
+        token = self._peek()
+        if token[0] is None:
+            raise QueryError( "Unexpected end of query" )
+        self._pos += 1
+        return token
+
+    def _isKeyword( self, keyword ):
+        return self._peek() == ( 'word', keyword )
+
+    def _value( self ):
+        ( kind, text ) = self._next()
+        if kind not in [ 'word', 'str' ]:
+            raise QueryError( "Expected a value, not %s" % text )
+        return text
+
+    def parse( self ):
+        if not self._tokens:
+            raise QueryError( "Empty query" )
+        expr = self._orExpr()
+        if self._pos < len(self._tokens):
+            raise QueryError( "Unexpected %s in query" % self._peek()[1] )
+        return expr
+
+    def _orExpr( self ):
+        expr = self._andExpr()
+        while self._isKeyword( 'or' ):
+            self._next()
+            expr = ( 'or', expr, self._andExpr() )
+        return expr
+
+    def _andExpr( self ):
+        expr = self._notExpr()
+        while True:
+            if self._isKeyword( 'and' ):
+                self._next()
+            elif self._peek()[0] is None or self._isKeyword( 'or' ) or self._peek() == ( 'paren', ')' ):
+                break
+            # Adjacent terms w/o and are and'ed
+            expr = ( 'and', expr, self._notExpr() )
+        return expr
+
+    def _notExpr( self ):
+        if self._isKeyword( 'not' ):
+            self._next()
+            return ( 'not', self._notExpr() )
+        if self._peek() == ( 'paren', '(' ):
+            self._next()
+            expr = self._orExpr()
+            if self._next() != ( 'paren', ')' ):
+                raise QueryError( "Expected )" )
+            return expr
+        return self._term()
+
+    def _term( self ):
+        ( kind, word ) = self._next()
+        if kind != 'word':
+            raise QueryError( "Expected a field, uses or depends, not %s" % word )
+        if word in [ 'uses', 'depends' ]:
+            pkgName = self._value()
+            if self._peek()[0] == 'op':
+                op = self._next()[1]
+                return ( word, pkgName, op, self._value() )
+            return ( word, pkgName, None, None )
+        if word not in queryNameFields + queryVersionFields:
+            raise QueryError( "Unknown field %s, expected one of: %s" % ( word, ' '.join( queryNameFields + queryVersionFields + [ 'uses', 'depends' ] ) ) )
+        ( kind, op ) = self._next()
+        if kind != 'op':
+            raise QueryError( "Expected an operator after %s, not %s" % ( word, op ) )
+        if word in queryNameFields and op not in [ '=', '==', '!=', '~' ]:
+            raise QueryError( "%s can only be compared w/ =, != or ~" % word )
+        return ( 'field', word, op, self._value() )
+
+def parseQuery( query ):
+    '''Returns the parsed expression tree for a query string, see QueryParser.  Raises QueryError if invalid.'''
+    return QueryParser( query ).parse()
+
+def evalQuery( inventory, expr ):
+    '''Returns the set of relPaths for the releases in a SiteInventory that match a parsed query'''
+    releases = inventory.getReleases()
+    if expr[0] == 'and':
+        return evalQuery( inventory, expr[1] ) & evalQuery( inventory, expr[2] )
+    if expr[0] == 'or':
+        return evalQuery( inventory, expr[1] ) | evalQuery( inventory, expr[2] )
+    if expr[0] == 'not':
+        return set( releases ) - evalQuery( inventory, expr[1] )
+    if expr[0] in [ 'uses', 'depends' ]:
+        ( pkgName, op, value ) = expr[1:]
+        depVersions = [ v for v in inventory.getDependencyVersions( pkgName ) if op is None or compareVersion( v, op, value ) ]
+        return inventory.getDependents( pkgName, depVersions, transitive=( expr[0] == 'uses' ) )
+
+    ( field, op, value ) = expr[1:]
+    if field == 'name' and op in [ '=', '==' ]:
+        # Use the name index
+        return set( inventory.getReleasesByName( value ) )
+    matches = set()
+    for ( relPath, release ) in releases.items():
+        fieldValue = relPath if field == 'path' else release[field]
+        if field in queryVersionFields:
+            isMatch = compareVersion( fieldValue, op, value )
+        elif op == '~':
+            isMatch = fnmatch.fnmatchcase( fieldValue, value )
+        else:
+            isMatch = ( fieldValue == value ) == ( op != '!=' )
+        if isMatch:
+            matches.add( relPath )
+    return matches
@@ -31,6 +31,27 @@ DEF_AFS_GIT_REPOS2		= "/afs/slac/g/cd/swe/git/repos"
 DEF_GIT_EXT_TOP_TAG		= "slac-trunk"
 DEF_GIT_RELEASE_DEPTH = 10
 
+# Default git clone strategies, see gitCloneStrategies in git_utils.py
+# Release builds don't need history or file contents for other tags,
+# but developer sandboxes get everything so they can fix bugs, retag, and push.
+DEF_GIT_RELEASE_STRATEGY	= "blobless"
+DEF_GIT_SANDBOX_STRATEGY	= "full"
+
+# Paths left out of the working tree for the sparse clone strategy
+DEF_GIT_SPARSE_EXCLUDES		= [ "/doc/", "/docs/", "/documentation/", "/html/" ]
+
+# Seconds a pooled git cat-file --batch reader is kept open w/o use, see read_blob() in git_utils.py
+DEF_GIT_CAT_FILE_IDLE_TIMEOUT	= 60
+
+# Max number of concurrent clones for an epics-checkout module list file
+DEF_ECO_CHECKOUT_JOBS	= 4
+
+# Max number of directories scanned at once, ex. by epics-versions --allTops
+DEF_ECO_SCAN_JOBS	= 8
+
+# Max number of concurrent git or svn queries per repo host, ex. for the async git_utils functions
+DEF_ECO_REPO_JOBS_PER_HOST	= 8
+
 DEF_GIT_REPO_PATH		= DEF_AFS_GIT_REPOS
 if "GIT_REPO_ROOT" in os.environ:
     DEF_GIT_REPO_PATH = os.environ["GIT_REPO_ROOT"]
@@ -42,6 +63,50 @@ DEF_GIT_MODULES_PATH	= DEF_GIT_REPO_PATH + "/package/epics/modules"
 DEF_GIT_EXTENSIONS_PATH	= DEF_GIT_REPO_PATH + "/package/epics/extensions"
 DEF_GIT_EXT_TOP_PATH	= DEF_GIT_EXTENSIONS_PATH + "/extensions-top.git"
 
+# Per user cache for site indexes, ex. the bare git repo index
+DEF_ECO_CACHE_DIR		= os.path.join( os.path.expanduser( "~" ), ".cache", "eco_tools" )
+if "ECO_CACHE_DIR" in os.environ:
+    DEF_ECO_CACHE_DIR = os.environ["ECO_CACHE_DIR"]
+
+# Seconds before epics-query rescans the site for changed releases, see SiteInventory.py
+DEF_ECO_INVENTORY_MAX_AGE	= 3600
+# Max depth of release dirs under the site top, ex. ioc/common/<name>/<release>
+DEF_ECO_INVENTORY_DEPTH		= 5
+
+# Build hosts for epics-build, space or comma separated, ex. ECO_BUILD_HOSTS="host1 host2"
+# If none, builds run on the local host
+DEF_ECO_BUILD_HOSTS		= os.environ.get( "ECO_BUILD_HOSTS", "" ).replace( ",", " " ).split()
+DEF_ECO_BUILD_JOBS_PER_HOST	= 2
+DEF_ECO_BUILD_RETRIES		= 1
+# Environment variables passed on to the commands run on the build hosts, ex.
+# ECO_BUILD_ENV_VARS="EPICS_HOST_ARCH PATH EPICS_SITE_TOP" to replace the defaults
+DEF_ECO_BUILD_ENV_VARS		= os.environ.get( "ECO_BUILD_ENV_VARS",
+                                  "EPICS_HOST_ARCH EPICS_SITE_TOP EPICS_BASE PATH LD_LIBRARY_PATH" ).replace( ",", " " ).split()
+
+# Max number of directories cleared at once when removing a build tree, see fs_utils.py
+DEF_ECO_REMOVE_JOBS			= 8
+# Set ECO_BACKGROUND_REMOVE=0 to wait for temporary and -FAILED build dirs to be removed
+DEF_ECO_BACKGROUND_REMOVE	= os.environ.get( "ECO_BACKGROUND_REMOVE", "1" ) != "0"
+
+# Cache of built release outputs, see ArtifactCache.py
+# ECO_ARTIFACT_CACHE_SIZE is the max size in GB, 0 disables the cache
+DEF_ECO_ARTIFACT_CACHE_DIR	= os.path.join( DEF_ECO_CACHE_DIR, "artifacts" )
+if "ECO_ARTIFACT_CACHE_DIR" in os.environ:
+    DEF_ECO_ARTIFACT_CACHE_DIR = os.environ["ECO_ARTIFACT_CACHE_DIR"]
+# The cache is off by default, ex. ECO_ARTIFACT_CACHE_SIZE=20 turns it on w/ a 20GB max
+DEF_ECO_ARTIFACT_CACHE_SIZE	= int( float( os.environ.get( "ECO_ARTIFACT_CACHE_SIZE", "0" ) ) * 1024**3 )
+# Per arch output dirs of a cross arch build, ex. bin/<arch> and lib/<arch>
+DEF_ECO_ARTIFACT_DIRS		= [ "bin", "lib" ]
+# reflink or copy, reflink falls back to a copy if the filesystem doesn't support it
+DEF_ECO_ARTIFACT_LINK_MODE	= "reflink"
+
+# Set ECO_SITE_ENV_CACHE=1 to save the derived EPICS site paths and host arch
+# per hostname and base version in DEF_ECO_CACHE_DIR, see SiteEnvironment in site_utils.py
+DEF_ECO_SITE_ENV_CACHE		= os.environ.get( "ECO_SITE_ENV_CACHE", "0" ) != "0"
+
+# Set ECO_TRACE=file.json to save a Chrome trace of the commands and build phases, see cmd_utils.py
+DEF_ECO_TRACE_FILE			= os.environ.get( "ECO_TRACE", "" )
+
 # Use these for remote repo access
 #DEF_GIT_REPOS_URL		= "file://" + DEF_GIT_REPO_PATH
 ##DEF_GIT_REPOS_URL		= "git@code.stanford.edu:slac-epics"
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
 import os
+import json
+import socket
 from repo_defaults import *
+from cmd_utils import *
 from version_utils import *
 
 #
@@ -34,8 +37,102 @@ def getEnv( envVar ):
         result = '?'
     return result
 
+# Environment variables the site environment is derived from
+siteEnvVars = [ 'EPICS_TOP', 'EPICS_SITE_TOP', 'EPICS_BASE', 'EPICS_BASE_VER', 'EPICS_VER',
+                'BASE_MODULE_VERSION', 'EPICS_MODULES_TOP', 'EPICS_HOST_ARCH' ]
+
+class SiteEnvironment(object):
+    '''
+    EPICS site paths for this host, derived once per process and environment.
+    Each value is derived the first time it's needed, as finding them can mean
+    probing several AFS paths or running the EpicsHostArch script.
+    If DEF_ECO_SITE_ENV_CACHE is set, derived values are also saved in
+    DEF_ECO_CACHE_DIR per hostname and base version for later processes.
+    '''
+    def __init__( self, envKey ):
+        self._envKey	= envKey
+        self._values	= {}
+        self._cacheKey	= '%s %s' % ( socket.gethostname(), determine_epics_base_ver() )
+        self._saved		= self._loadCache() if DEF_ECO_SITE_ENV_CACHE else {}
+
+    def _cacheFile( self ):
+        return os.path.join( DEF_ECO_CACHE_DIR, 'site_environment.json' )
+
+    def _loadCache( self ):
+        try:
+            with open( self._cacheFile(), 'r' ) as f:
+                saved = json.load( f ).get( self._cacheKey, {} )
+        except ( IOError, ValueError ):
+            return {}
+        if saved.get( 'envKey' ) != list( self._envKey ):
+            return {}
+        # Don't trust saved paths that have since gone away
+        for name in [ 'epicsSiteTop', 'epicsModulesTop' ]:
+            if saved.get( name ) and not os.path.isdir( saved[name] ):
+                return {}
+        return saved
+
+    def _saveCache( self ):
+        try:
+            with open( self._cacheFile(), 'r' ) as f:
+                cache = json.load( f )
+        except ( IOError, ValueError ):
+            cache = {}
+        cache[self._cacheKey] = dict( self._values, envKey=list( self._envKey ) )
+        try:
+            if not os.path.isdir( DEF_ECO_CACHE_DIR ):
+                os.makedirs( DEF_ECO_CACHE_DIR )
+            tmpFile = '%s.%d' % ( self._cacheFile(), os.getpid() )
+            with open( tmpFile, 'w' ) as f:
+                json.dump( cache, f, indent=1 )
+            os.rename( tmpFile, self._cacheFile() )
+        except OSError:
+            pass
+
+    def _get( self, name, derive ):
+        if name not in self._values:
+            if name in self._saved:
+                self._values[name] = self._saved[name]
+            else:
+                self._values[name] = derive()
+                if DEF_ECO_SITE_ENV_CACHE and self._values[name] is not None:
+                    self._saveCache()
+        return self._values[name]
+
+    @property
+    def epicsSiteTop( self ):
+        return self._get( 'epicsSiteTop', _derive_epics_site_top )
+
+    @property
+    def epicsModulesTop( self ):
+        return self._get( 'epicsModulesTop', _derive_epics_modules_top )
+
+    @property
+    def epicsHostArch( self ):
+        return self._get( 'epicsHostArch', _derive_epics_host_arch )
+
+_siteEnvironments = {}
+
+def getSiteEnvironment():
+    '''Returns the SiteEnvironment for the current values of the siteEnvVars environment variables'''
+    envKey = tuple( [ os.getenv( envVar, '' ) for envVar in siteEnvVars ] )
+    if envKey not in _siteEnvironments:
+        _siteEnvironments[envKey] = SiteEnvironment( envKey )
+    return _siteEnvironments[envKey]
+
 def determine_epics_site_top():
     '''Returns string w/ a directory name for EPICS site top, or None if unable to derive.'''
+    return getSiteEnvironment().epicsSiteTop
+
+def determine_epics_modules_top():
+    '''Returns string w/ a directory name for EPICS modules top, or None if unable to derive.'''
+    return getSiteEnvironment().epicsModulesTop
+
+def determine_epics_host_arch():
+    '''Returns string w/ EPICS host arch, or None if unable to derive.'''
+    return getSiteEnvironment().epicsHostArch
+
+def _derive_epics_site_top():
     # First look for EPICS_TOP in the environment
     epics_site_top = getEnv('EPICS_TOP')
     # Then EPICS_SITE_TOP
@@ -65,7 +162,7 @@ def determine_epics_site_top():
         epics_site_top = None
     return epics_site_top
 
-def determine_epics_modules_top():
+def _derive_epics_modules_top():
     # First look for EPICS_MODULES_TOP in the environment
     epics_modules_top = getEnv('EPICS_MODULES_TOP')
     if epics_modules_top == '?':
@@ -85,8 +182,7 @@ def determine_epics_modules_top():
             epics_modules_top = None
     return epics_modules_top
 
-def determine_epics_host_arch():
-    '''Returns string w/ EPICS host arch, or None if unable to derive.'''
+def _derive_epics_host_arch():
     # First look for EPICS_HOST_ARCH in the environment
     epics_host_arch = os.getenv('EPICS_HOST_ARCH')
     if not epics_host_arch:
@@ -96,22 +192,22 @@ def determine_epics_host_arch():
             epicsHostArchPath	= os.path.join(	epics_site_top, 'base',
                                                 epics_base_ver, 'startup', 'EpicsHostArch' )
             if os.path.isfile( epicsHostArchPath ):
-                cmdOutput = subprocess.check_output( [ epicsHostArchPath ] ).splitlines()
+                cmdOutput = cmd_check_output( [ epicsHostArchPath ], universal_newlines=True ).splitlines()
                 if len(cmdOutput) == 1:
                     epics_host_arch = str(cmdOutput[0])
 
     # Returns None if unable to derive
     return epics_host_arch
 
-def export_release_site_file( inputs, debug=False):
+def export_release_site_file( inputs, topDir='.', debug=False):
     """
     Use the contents of a dictionary of top level dirs to create a 
-    RELEASE_SITE dir in a specified dir
+    RELEASE_SITE file in topDir
     """
 
     #out_file = sys.stdout for testing 
 
-    output_file_and_path = './RELEASE_SITE'
+    output_file_and_path = os.path.join( topDir, 'RELEASE_SITE' )
     try:
         out_file = open(output_file_and_path, 'w')
     except IOError as e:
@@ -132,7 +228,7 @@ def export_release_site_file( inputs, debug=False):
         print('# We will build some tools/scripts that allow us to', file=out_file)
         print('# change this easily when relocating software.', file=out_file)
         print('#==============================================================================', file=out_file)
-        if doesPkgNeedMacro( 'BASE_MODULE_VERSION' ):
+        if doesPkgNeedMacro( 'BASE_MODULE_VERSION', topDir=topDir ):
             print('BASE_MODULE_VERSION=%s'%inputs['EPICS_BASE_VER'], file=out_file)
     else:
         print('BASE_MODULE_VERSION=%s'%inputs['EPICS_BASE_VER'], file=out_file)
@@ -140,15 +236,15 @@ def export_release_site_file( inputs, debug=False):
     if 'BASE_SITE_TOP' in inputs:
         print('BASE_SITE_TOP=%s'     % inputs['BASE_SITE_TOP'], file=out_file)
     if VersionToRelNumber(inputs['EPICS_BASE_VER'], debug=debug) < 3.141205 \
-        or doesPkgNeedMacro( 'MODULES_SITE_TOP' ):
+        or doesPkgNeedMacro( 'MODULES_SITE_TOP', topDir=topDir ):
         print('MODULES_SITE_TOP=%s'  % inputs['EPICS_MODULES'], file=out_file)
     if VersionToRelNumber(inputs['EPICS_BASE_VER'], debug=debug) >= 3.141205 \
-        or doesPkgNeedMacro( 'EPICS_MODULES' ):
+        or doesPkgNeedMacro( 'EPICS_MODULES', topDir=topDir ):
         print('EPICS_MODULES=%s'     % inputs['EPICS_MODULES'], file=out_file)
     if 'IOC_SITE_TOP' in inputs:
         print('IOC_SITE_TOP=%s'      % inputs['IOC_SITE_TOP'], file=out_file)
     if VersionToRelNumber(inputs['EPICS_BASE_VER'], debug=debug) < 3.141205 \
-        or doesPkgNeedMacro( 'EPICS_BASE_VER' ):
+        or doesPkgNeedMacro( 'EPICS_BASE_VER', topDir=topDir ):
         print('EPICS_BASE_VER=%s' %inputs['EPICS_BASE_VER'], file=out_file)
     print('PACKAGE_SITE_TOP=%s'  % inputs['PACKAGE_SITE_TOP'], file=out_file)
     if 'MATLAB_PACKAGE_TOP' in inputs:
@@ -289,3 +385,30 @@ def assemble_release_site_inputs( batch=False ):
                 print('Using ALARM_CONFIGS_TOP: ' + input_dict['ALARM_CONFIGS_TOP'])
 
     return input_dict
+
+def getSiteReleaseMacros( epics_base_ver=None ):
+    '''
+    Returns a dict of the macros a RELEASE_SITE file for this site would define,
+    w/o prompting or printing, ex. for evaluating a RELEASE file read from git
+    before it's checked out and its RELEASE_SITE is generated.
+    Macros that can't be determined are left out.
+    '''
+    macros = {}
+    if epics_base_ver is None:
+        epics_base_ver = determine_epics_base_ver()
+    epics_site_top = determine_epics_site_top()
+    if epics_base_ver:
+        if epics_base_ver.startswith( 'base-' ):
+            epics_base_ver = epics_base_ver.replace( 'base-', '' )
+        macros['BASE_MODULE_VERSION'] = epics_base_ver
+        macros['EPICS_BASE_VER'] = epics_base_ver
+    if epics_site_top:
+        macros['EPICS_SITE_TOP'] = epics_site_top
+        macros['BASE_SITE_TOP']  = os.path.join( epics_site_top, 'base' )
+        if epics_base_ver:
+            epics_modules = getEnv('EPICS_MODULES_TOP')
+            if not os.path.isdir( epics_modules ):
+                epics_modules = os.path.join( epics_site_top, epics_base_ver, 'modules' )
+            macros['EPICS_MODULES']    = epics_modules
+            macros['MODULES_SITE_TOP'] = epics_modules
+    return macros
@@ -6,6 +6,7 @@ import subprocess
 #import Releaser
 import Repo
 from repo_defaults import *
+from cmd_utils import *
 from svn_utils import *
 
 class svnError( Exception ):
@@ -83,7 +84,7 @@ class svnRepo( Repo.Repo ):
             print("svn_url:        ", svn_url)
         return defaultPackage
 
-    def CheckoutRelease( self, buildDir, verbose=False, dryRun=False ):
+    def CheckoutRelease( self, buildDir, verbose=False, dryRun=False, minimizeRepoAccess=False ):
         targetUrl = self._url
         if self._tagUrl:
             targetUrl = self._tagUrl
@@ -103,7 +104,7 @@ class svnRepo( Repo.Repo ):
             # See if the tag is already checked out
             curTag = None
             cmdList = [ "svn", "info", "." ]
-            cmdOutput = subprocess.check_output( cmdList ).splitlines()
+            cmdOutput = cmd_check_output( cmdList ).splitlines()
             if len(cmdOutput) == 1:
                 curUrl = cmdOutput[0]
                 if curUrl == targetUrl:
@@ -121,7 +122,7 @@ class svnRepo( Repo.Repo ):
                         raise
 
                     cmdList = [ "svn", "update", "." ]
-                    cmdOutput = subprocess.check_output( cmdList ).splitlines()
+                    cmdOutput = cmd_check_output( cmdList ).splitlines()
                     self.execute("/bin/rm -f %s" % ( self.built_cookie_path() ))
                     os.chdir( curDir )
                     return
@@ -133,7 +134,7 @@ class svnRepo( Repo.Repo ):
         if not os.path.isdir( os.path.join( buildDir, '.svn' ) ):
             try:
                 cmdList = [ "svn", "co", targetUrl, buildDir ]
-                subprocess.check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
+                cmd_check_call( cmdList, stdout=outputPipe, stderr=outputPipe )
             except RuntimeError:
                 raise Releaser.BuildError("CheckoutRelease: svn co failed for %s %s" % ( targetUrl, buildDir ))
 
@@ -149,7 +150,7 @@ class svnRepo( Repo.Repo ):
                 return
             svnComment = "Creating release directory"
             cmdList = [ "svn", "mkdir", "--parents", svnDir, "-m", svnComment ]
-            subprocess.check_call( cmdList )
+            cmd_check_call( cmdList )
         except:
             raise svnError("Error: svnMakeDir %s\n%s" % ( svnDir, sys.exc_info()[1] ))
 
@@ -164,13 +165,13 @@ class svnRepo( Repo.Repo ):
         svnComment = "Removing unwanted tag %s for %s" % ( tag, package ) 
         try:
             cmdList = [ "svn", "ls", tagPath ]
-            cmdOutput = subprocess.check_output( cmdList, stderr=subprocess.STDOUT )
+            cmdOutput = cmd_check_output( cmdList, stderr=subprocess.STDOUT )
         except:
             print("tagPath %s not found." % ( tagPath ))
             return
 
         cmdList = [ "svn", "rm", tagPath, "-m", svnComment ]
-        subprocess.check_call( cmdList )
+        cmd_check_call( cmdList )
         print("Successfully removed %s release tag %s." % ( package, tag ))
 
     def TagRelease( self, packagePath=None, release=None, branch=None, message=None, verbose=True, dryRun=False ):
@@ -184,7 +185,7 @@ class svnRepo( Repo.Repo ):
 
         try: # See if tag already exists
             cmdList = [ "svn", "ls", self._tagUrl ]
-            cmdOutput = subprocess.check_output( cmdList, stderr=subprocess.STDOUT )
+            cmdOutput = cmd_check_output( cmdList, stderr=subprocess.STDOUT )
             print("%s/%s already tagged." % ( packagePath, release ))
             return
         except:
@@ -201,5 +202,5 @@ class svnRepo( Repo.Repo ):
             releaseComment += message
         releaseComment	+= "\n%s %s %s" % ( "svn cp", self._url, self._tagUrl )
         cmdList = [ "svn", "cp", "--parents", self._url, self._tagUrl, "-m", releaseComment ]
-        subprocess.check_call( cmdList )
+        cmd_check_call( cmdList )
 
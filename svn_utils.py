@@ -6,6 +6,7 @@ import sys
 import subprocess
 import fileinput
 from repo_defaults import *
+from cmd_utils import *
 
 def svnPathExists( svnPath, revision=None, debug=False ):
     try:
@@ -15,7 +16,7 @@ def svnPathExists( svnPath, revision=None, debug=False ):
             repoCmd = [ 'svn', 'ls', svnPath ]
         if debug:
             print("svnPathExists check_output: %s" % ' '.join( repoCmd ))
-        contents = subprocess.check_output( repoCmd, stderr = subprocess.STDOUT )
+        contents = cmd_check_output( repoCmd, stderr = subprocess.STDOUT )
         # No need to check contents
         # If no exception, the path exists
         return True
@@ -24,13 +25,18 @@ def svnPathExists( svnPath, revision=None, debug=False ):
     except subprocess.CalledProcessError:
         return False
 
-def svnGetRemoteTags( pathToSvnRepo, verbose=False ):
-    tags = []
+def svnGetTagsPath( pathToSvnRepo ):
+    '''Returns the svn path of the tags dir for the svn repo path'''
     tagsPath = pathToSvnRepo.replace("trunk/pcds/epics/modules","epics/tags/modules")
     tagsPath = tagsPath.replace( "trunk", "tags" )
     tagsPath = tagsPath.replace( "/current", "" )
+    return tagsPath
+
+def svnGetRemoteTags( pathToSvnRepo, verbose=False ):
+    tags = []
+    tagsPath = svnGetTagsPath( pathToSvnRepo )
     try:
-        tags = subprocess.check_output(["svn", "ls", tagsPath ] ).splitlines()
+        tags = cmd_check_output(["svn", "ls", tagsPath ], universal_newlines=True ).splitlines()
         tags = [ tag.replace("/", "") for tag in tags ]
     except:
         pass
@@ -39,6 +45,21 @@ def svnGetRemoteTags( pathToSvnRepo, verbose=False ):
         print("svnGetRemoteTags: Found %d tags in %s" % ( len(tags), pathToSvnRepo ))
     return tags
 
+async def svnGetRemoteTagsAsync( pathToSvnRepo, verbose=False ):
+    '''asyncio counterpart of svnGetRemoteTags(), see cmd_async_output()'''
+    tags = []
+    tagsPath = svnGetTagsPath( pathToSvnRepo )
+    try:
+        tags = ( await cmd_async_output( [ "svn", "ls", tagsPath ], host=getUrlHost( tagsPath ),
+                                         stderr=subprocess.DEVNULL, universal_newlines=True ) ).splitlines()
+        tags = [ tag.replace("/", "") for tag in tags ]
+    except ( OSError, subprocess.CalledProcessError ):
+        pass
+    tags = sorted(tags)
+    if verbose:
+        print("svnGetRemoteTagsAsync: Found %d tags in %s" % ( len(tags), pathToSvnRepo ))
+    return tags
+
 def svnGetWorkingBranch( debug=False ):
     '''See if the current directory is the top of an svn working directory.
     Returns a 3-tuple of [ url, branch, tag ], [ None, None, None ] on error.
@@ -50,7 +71,7 @@ def svnGetWorkingBranch( debug=False ):
     repo_tag    = None
     try:
         repoCmd = [ 'svn', 'info', '.' ]
-        statusInfo = subprocess.check_output( repoCmd, stderr=subprocess.STDOUT )
+        statusInfo = cmd_check_output( repoCmd, stderr=subprocess.STDOUT )
         statusLines = statusInfo.splitlines()
         for line in statusLines:
             if line is None:
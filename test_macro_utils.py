@@ -0,0 +1,87 @@
+'''Tests for the gnu make subset evaluated by macro_utils, run w/ python -m pytest'''
+import os
+from macro_utils import *
+
+def writeFile( path, text ):
+    if not os.path.isdir( os.path.dirname( str(path) ) ):
+        os.makedirs( os.path.dirname( str(path) ) )
+    with open( str(path), 'w' ) as f:
+        f.write( text )
+    return str(path)
+
+def evalText( tmp_path, text, macroDict=None, name='RELEASE' ):
+    releaseFile = writeFile( tmp_path / 'configure' / name, text )
+    return dict( getMacrosFromFile( releaseFile, macroDict if macroDict is not None else {} ) )
+
+def test_recursive_assignment_uses_final_value( tmp_path ):
+    macros = evalText( tmp_path, 'ASYN = $(SUPPORT)/asyn/R4.35\nSUPPORT = /site/modules\n' )
+    assert macros['ASYN'] == '/site/modules/asyn/R4.35'
+
+def test_simple_assignment_expands_immediately( tmp_path ):
+    macros = evalText( tmp_path, 'SUPPORT = /old\nASYN := $(SUPPORT)/asyn\nSUPPORT = /new\nBUSY ::= $(SUPPORT)/busy\n' )
+    assert macros['ASYN'] == '/old/asyn'
+    assert macros['BUSY'] == '/new/busy'
+
+def test_conditional_assignment( tmp_path ):
+    macros = evalText( tmp_path, 'BASE ?= /site/base/R7.0.3\nASYN = R4.35\nASYN ?= R4.31\n',
+                       macroDict={ 'BASE': '/local/base' } )
+    assert macros['BASE'] == '/local/base'
+    assert macros['ASYN'] == 'R4.35'
+
+def test_append_assignment( tmp_path ):
+    macros = evalText( tmp_path, 'ARCHS += linuxRT\nFLAGS = -O2\nFLAGS += -g\n' )
+    assert macros['ARCHS'] == 'linuxRT'
+    assert macros['FLAGS'] == '-O2 -g'
+
+def test_ifeq_and_ifneq( tmp_path ):
+    macros = evalText( tmp_path, 'ARCH = linuxRT\n'
+                                 'ifeq ($(ARCH),linuxRT)\nA = yes\nelse\nA = no\nendif\n'
+                                 'ifeq "$(ARCH)" "rhel7"\nB = yes\nelse\nB = no\nendif\n'
+                                 "ifneq ('$(ARCH)','rhel7')\nC = yes\nendif\n"
+                                 'ifneq ($(ARCH),linuxRT)\nD = yes\nendif\n' )
+    assert ( macros['A'], macros['B'], macros['C'] ) == ( 'yes', 'no', 'yes' )
+    assert 'D' not in macros
+
+def test_ifdef_and_ifndef( tmp_path ):
+    macros = evalText( tmp_path, 'DEFINED = 1\nEMPTY =\n'
+                                 'ifdef DEFINED\nA = yes\nendif\n'
+                                 'ifdef EMPTY\nB = yes\nendif\n'
+                                 'ifndef UNDEFINED\nC = yes\nendif\n'
+                                 'ifndef DEFINED\nD = yes\nelse ifeq ($(DEFINED),1)\nD = elseif\nendif\n' )
+    assert macros['A'] == 'yes'
+    assert 'B' not in macros
+    assert macros['C'] == 'yes'
+    assert macros['D'] == 'elseif'
+
+def test_ifdef_does_not_expand_value( tmp_path ):
+    # Like gnu make, a value that expands to nothing is still defined
+    macros = evalText( tmp_path, 'NOTHING = $(UNDEFINED)\nifdef NOTHING\nA = yes\nendif\n'
+                                 'ifndef NOTHING\nB = yes\nendif\n' )
+    assert macros['A'] == 'yes'
+    assert 'B' not in macros
+
+def test_nested_conditionals( tmp_path ):
+    macros = evalText( tmp_path, 'X = 1\n'
+                                 'ifdef UNDEFINED\nifdef X\nA = inner\nelse\nA = innerElse\nendif\nelse\nA = outerElse\nendif\n' )
+    assert macros['A'] == 'outerElse'
+
+def test_nested_includes( tmp_path ):
+    writeFile( tmp_path / 'RELEASE_SITE', 'EPICS_SITE_TOP = /site\nBASE_MODULE_VERSION = R7.0.3\n' )
+    writeFile( tmp_path / 'configure' / 'RELEASE.local', 'include $(TOP)/configure/RELEASE.deps\nASYN = $(EPICS_SITE_TOP)/asyn\n' )
+    writeFile( tmp_path / 'configure' / 'RELEASE.deps', 'BUSY = $(EPICS_SITE_TOP)/busy\nASYN = /overridden\n' )
+    includeGraph = {}
+    releaseFile = writeFile( tmp_path / 'configure' / 'RELEASE',
+                             'TOP = %s\ninclude $(TOP)/RELEASE_SITE\n-include $(TOP)/configure/RELEASE.local\n'
+                             '-include $(TOP)/configure/RELEASE.missing\n' % tmp_path )
+    macros = dict( getMacrosFromFile( releaseFile, {}, includeGraph=includeGraph ) )
+    assert macros['ASYN'] == '/site/asyn'
+    assert macros['BUSY'] == '/site/busy'
+    assert macros['BASE_MODULE_VERSION'] == 'R7.0.3'
+    assert includeGraph[releaseFile] == [ str( tmp_path / 'RELEASE_SITE' ), str( tmp_path / 'configure' / 'RELEASE.local' ) ]
+
+def test_shared_layer_is_not_modified( tmp_path ):
+    siteFile = writeFile( tmp_path / 'RELEASE_SITE', 'EPICS_SITE_TOP = /site\n' )
+    first  = getMacrosFromFile( siteFile, {} )
+    first['EPICS_SITE_TOP'] = '/changed'
+    second = getMacrosFromFile( siteFile, {} )
+    assert second['EPICS_SITE_TOP'] == '/site'
@@ -0,0 +1,31 @@
+'''Tests for version ordering in version_utils and query_utils, run w/ python -m pytest'''
+from version_utils import *
+from query_utils import compareVersion
+
+def test_slac_patch_sorts_within_upstream():
+    versions = [ 'R4.36', 'R4.35.1', 'R4.35-1.0.0', 'R4.35', 'R4.35-0.1.2', 'R4.35.1-0.1.0' ]
+    assert sorted( versions, key=VersionToRelKey ) == [ 'R4.35', 'R4.35-0.1.2', 'R4.35-1.0.0',
+                                                         'R4.35.1', 'R4.35.1-0.1.0', 'R4.36' ]
+
+def test_compare_mixed_upstream_and_slac_versions():
+    assert compareVersion( 'R4.35-1.0.0', '<', 'R4.35.1' )
+    assert compareVersion( 'R4.35.1-0.1.0', '>', 'R4.35.1' )
+    assert compareVersion( 'R4.35-1.0.0', '>', 'R4.35' )
+    assert compareVersion( 'R7.0.3.1-2.0', '<', 'R7.0.4' )
+    assert compareVersion( 'R4.100', '>', 'R4.99-9.9.9' )
+    assert compareVersion( 'R4.35-1.0.0', '=', 'R4.35-1.0.0' )
+    assert not compareVersion( 'R4.35-1.0.0', '=', 'R4.35' )
+
+def test_old_style_tags():
+    assert VersionToRelKey( 'R3-14-12' ) == ( ( 3, 14, 12 ), () )
+    assert VersionToRelKey( 'R3-14-12' ) < VersionToRelKey( 'R3-14-13' )
+    assert VersionToRelKey( 'asyn-R4-35' ) == ( ( 4, 35 ), () )
+
+def test_compare_equal_only_matches_numeric_spellings():
+    assert compareVersion( 'R3-14-12', '=', 'R3.14.12' )
+    assert compareVersion( 'asyn-R4-35', '=', 'R4.35' )
+    assert compareVersion( 'master', '=', 'master' )
+    assert not compareVersion( 'master', '=', 'current' )
+    assert not compareVersion( '', '=', 'master' )
+    assert not compareVersion( 'R1.0.0-foo', '=', 'R1.0.0' )
+    assert compareVersion( 'R1.0.0-foo', '!=', 'R1.0.0' )
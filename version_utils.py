@@ -2,9 +2,9 @@
 import os
 import re
 import sys
-import glob
 import subprocess
 from pkgNamesToMacroNames import *
+from macro_utils import *
 #
 # Purpose:
 #
@@ -21,14 +21,12 @@ epics7_submodules = [ "normativeTypesCPP", "pvAccessCPP", "pvDataCPP", "pvDataba
 # Pre-compile regular expressions for speed
 numberRegExp        = re.compile( r"(\d+)" )
 releaseRegExp       = re.compile( r"(|[a-zA-Z0-9_-]*[-_])R(\d+)[-_.](\d+)(.*)" )
-macroNameRegExp     = re.compile( r"^\s*([a-zA-Z0-9_]*)\s*=\s*(\S*)\s*$" )
 condMacroRegExp     = re.compile( r"^(#*)\s*([a-zA-Z0-9_]+)\s*=\s*(\S*)\s*$" )
 macroRefRegExp      = re.compile( r"^(.*)\$\(([a-zA-Z0-9_]+)\)(.*)$" )
 moduleVersionRegExp = re.compile( r"^\s*([a-zA-Z0-9_]+)_MODULE_VERSION\s*=\s*(\S*)\s*$" )
-epicsBaseVerRegExp  = re.compile( r"^\s*([A-Za-z0-9_-]*BASE[A-Za-z0-9_-]*VER[SION]*)\s*=\s*(\S*)\s*$" )
 epicsModulesRegExp  = re.compile( r"^\s*EPICS_MODULES\s*=\s*(\S*\s*)$" )
 modulesSiteTopRegExp= re.compile( r"^\s*MODULES_SITE_TOP\s*=\s*(\S*\s*)$" )
-versionRegExp       = re.compile( r"^\s*([A-Za-z0-9_-]*VERSION)\s*=\s*(\S*)\s*$" )
+iocParentRegExp     = re.compile( r"RELEASE\s*=\s*(\S*)\s*$" )
 
 def VersionToRelNumber( version, debug=False ):
     relNumber = 0.0
@@ -54,13 +52,54 @@ def VersionToRelNumber( version, debug=False ):
         print(("VersionToRelNumber: %s = %f" % ( version, relNumber )))
     return relNumber
 
+def _versionNumbers( ver ):
+    '''Returns a tuple of the numbers in the . - or _ separated parts of ver'''
+    relKey = []
+    for n in ver.replace( '-', '.' ).replace( '_', '.' ).split( '.' ):
+        m = numberRegExp.search( n )
+        if m and m.group(1):
+            relKey.append( int(m.group(1)) )
+    return tuple( relKey )
+
+def VersionToRelKey( version ):
+    '''Returns ( upstreamNumbers, patchNumbers ) for sorting and comparing versions w/o
+    the rounding of VersionToRelNumber().  The SLAC patch level after the first -
+    sorts w/in its upstream version, ex.
+        R4.35       -> ( ( 4, 35 ), () )
+        R4.35-1.0.0 -> ( ( 4, 35 ), ( 1, 0, 0 ) )
+        R4.35.1     -> ( ( 4, 35, 1 ), () )
+    Old style tags that use - between all the numbers, ex. R3-14-12, aren't split.'''
+    ver = version
+    verMatch = releaseRegExp.search( ver )
+    if verMatch:
+        if ver[verMatch.end(2)] == '-':
+            return ( _versionNumbers( verMatch.group(2) + '.' + verMatch.group(3) + verMatch.group(4) ), () )
+        ver = verMatch.group(2) + '.' + verMatch.group(3) + verMatch.group(4)
+    ( upstream, sep, patch ) = ver.partition( '-' )
+    return ( _versionNumbers( upstream ), _versionNumbers( patch ) )
+
 def isReleaseCandidate(release):
     if release.endswith( "FAILED" ):
         return False
+    # Hidden entries are staging dirs, lock files or trash, not releases
+    if os.path.basename( release.rstrip( '/' ) ).startswith( '.' ):
+        return False
     match = releaseRegExp.search( release )
     if match:
         return True
 
+def getIocConfigParent( configFile ):
+    '''Returns the parent release path from the RELEASE= line of a templated IOC .cfg file, or None'''
+    try:
+        with open( configFile, 'r' ) as cfgFp:
+            for line in cfgFp:
+                match = iocParentRegExp.search( line )
+                if match:
+                    return match.group(1)
+    except ( IOError, UnicodeDecodeError ):
+        pass
+    return None
+
 def isBaseTop(path):
     '''isBaseTop does a simple check for startup/EpicsHostArch.
     More tests can be added if needed.'''
@@ -174,71 +213,10 @@ def getPkgReleaseList( top, pkgName ):
             releaseList += [ releaseSet[ release ] ]
     return releaseList
 
-def getMacrosFromFile( filePath, macroDict, debug = False, required = False ):
-    '''Find and return a dictionary of gnu make style macros
-    found in a file.  Ex. macroDict['BASE_MODULE_VERSION'] = 'R3.15.5-1.0'
-    '''
-    if not os.path.isfile( filePath ):
-        if required:
-            print(("getMacrosFromFile Error: unable to open %s" % filePath)) 
-        return macroDict
-    if debug:
-        print(("getMacrosFromFile %s: %d versions on entry" % ( filePath, len(macroDict) )))
-    in_file = open( filePath, "r" )
-    for line in in_file:
-        line = line.strip()
-        if line.startswith( '#' ) or len(line) == 0:
-            continue
-        if line.startswith( 'include' ) or line.startswith( '-include' ):
-            if line.startswith( '-include' ):
-                required = False
-            else:
-                required = True
-            includeFileRefs = line.split()[1:]
-            includeFiles = []
-            # Expand macros and glob include file references
-            for ref in includeFileRefs:
-                ref = expandMacros( ref, macroDict )
-                includeFiles += glob.glob( ref )
-            # Recursively call getMacrosFromFile for each includeFile
-            for includeFile in includeFiles:
-                macroDict = getMacrosFromFile( includeFile, macroDict, debug, required )
-            continue
-
-        for regExp in [ macroNameRegExp, versionRegExp, epicsBaseVerRegExp ]:
-            macroMatch = regExp.search( line )
-            if not macroMatch:
-                continue
-            macroName  = macroMatch.group(1)
-            macroValue = macroMatch.group(2)
-            if macroName and macroValue:
-                if debug:
-                    print(("getMacrosFromFile: %s = %s" % ( macroName, macroValue )))
-                macroDict[ macroName ] = macroValue
-                break
-
-    # Expand macro values
-    for macroName in macroDict:
-        macroValue = macroDict[macroName]
-        macroDict[macroName] = expandMacros( macroValue, macroDict )
-
-    if debug:
-        print(("getMacrosFromFile %s: %d versions on exit" % ( filePath, len(macroDict) )))
-    return macroDict
-
-def getEpicsPkgDependents( topDir, debug=False ):
+def macrosToPkgDependents( macroDict, debug=False ):
     '''Find and return a dictionary of EPICS package (modules and base) versions
-    found in a release file.  Ex. pkgDependents['base'] = 'R3.15.5-1.0'
+    from a dictionary of RELEASE file macros.  Ex. pkgDependents['base'] = 'R3.15.5-1.0'
     '''
-    macroDict = {}
-    macroDict['TOP'] = topDir
-    # Get the base and dependent modules from RELEASE files
-    releaseFile = os.path.join( topDir, "configure", "RELEASE" )
-    if debug:
-        print(("getEpicsPkgDependents: Checking release file: %s" % ( releaseFile )))
-    if os.path.isfile( releaseFile ):
-        macroDict = getMacrosFromFile( releaseFile, macroDict, debug=debug )
-
     pkgDependents = {}
     epicsModules = None
     if 'EPICS_MODULES' in macroDict:
@@ -247,6 +225,9 @@ def getEpicsPkgDependents( topDir, debug=False ):
         if macroName.endswith( '_MODULE_VERSION' ):
             continue
         macroValue = macroDict[macroName]
+        if not macroValue or ' ' in macroValue:
+            # Not a path to a package release
+            continue
         pkgName    = macroNameToPkgName(macroName)
         if not pkgName:
             continue
@@ -273,6 +254,121 @@ def getEpicsPkgDependents( topDir, debug=False ):
 
     return pkgDependents
 
+def getEpicsPkgDependents( topDir, debug=False ):
+    '''Find and return a dictionary of EPICS package (modules and base) versions
+    found in a release file.  Ex. pkgDependents['base'] = 'R3.15.5-1.0'
+    '''
+    if debug:
+        print(("getEpicsPkgDependents: Checking release file: %s" % ( os.path.join( topDir, "configure", "RELEASE" ) )))
+    return getConfigureDir( topDir, debug=debug ).getPkgDependents( debug=debug )
+
+class ConfigureDir(object):
+    '''Parses the configure/RELEASE* files for an EPICS package TOP once
+    and answers macro definition, macro use, include and dependent queries
+    from that one parse.
+    Use getConfigureDir() to reuse a prior parse if no files have changed.'''
+    def __init__( self, topDir, debug=False ):
+        self._topDir       = topDir
+        self._configureDir = os.path.join( topDir, 'configure' )
+        self._debug        = debug
+        self._releaseFiles = []
+        if os.path.isdir( self._configureDir ):
+            for fileName in sorted( os.listdir( self._configureDir ) ):
+                if fileName.startswith( 'RELEASE' ) and not fileName.endswith( '~' ):
+                    self._releaseFiles.append( os.path.join( self._configureDir, fileName ) )
+
+        # Evaluate configure/RELEASE, which normally includes the others
+        self._includeGraph = {}
+        self._macros = { 'TOP': topDir }
+        releaseFile = os.path.join( self._configureDir, 'RELEASE' )
+        if os.path.isfile( releaseFile ):
+            self._macros = getMacrosFromFile( releaseFile, self._macros, debug=debug,
+                                              includeGraph=self._includeGraph )
+        self._pkgDependents = None
+
+        # Remember the signature of each file we depend on
+        dependsOn = set( self._releaseFiles )
+        for includeFiles in self._includeGraph.values():
+            dependsOn.update( includeFiles )
+        self._signature = self._getSignature( dependsOn )
+
+    def _getSignature( self, filePaths ):
+        signature = [ ( self._configureDir, fileSignature( self._configureDir ) ) ]
+        for filePath in sorted( filePaths ):
+            signature.append( ( filePath, fileSignature( filePath ) ) )
+        return signature
+
+    def isCurrent( self ):
+        '''Returns True if none of the parsed files have changed.'''
+        return self._signature == self._getSignature( [ f for ( f, sig ) in self._signature[1:] ] )
+
+    def _getMacroFiles( self ):
+        macroFiles = []
+        for releaseFile in self._releaseFiles:
+            macroFile = getMacroFile( releaseFile )
+            if macroFile is not None:
+                macroFiles.append( macroFile )
+        return macroFiles
+
+    def getReleaseFiles( self ):
+        '''Returns the list of configure/RELEASE* file paths'''
+        return self._releaseFiles
+
+    def getMacros( self ):
+        '''Returns the expanded macros from configure/RELEASE and its includes'''
+        return self._macros
+
+    def getIncludeGraph( self ):
+        '''Returns a dict of file path to the list of files it includes'''
+        return self._includeGraph
+
+    def getPkgDependents( self, debug=False ):
+        '''Returns a new dictionary of EPICS package versions.
+        Ex. pkgDependents['base'] = 'R3.15.5-1.0'
+        '''
+        if self._pkgDependents is None:
+            self._pkgDependents = macrosToPkgDependents( self._macros, debug=debug )
+        return dict( self._pkgDependents )
+
+    def definesMacro( self, macroName ):
+        '''Returns True if any configure/RELEASE* file assigns macroName a value'''
+        for macroFile in self._getMacroFiles():
+            if macroName in macroFile.getMacroDefs():
+                return True
+        return False
+
+    def usesMacro( self, macroName ):
+        '''Returns True if any configure/RELEASE* file references $(macroName)'''
+        for macroFile in self._getMacroFiles():
+            if macroName in macroFile.getMacroRefs():
+                return True
+        return False
+
+    def needsMacro( self, macroName ):
+        '''Returns True if macroName is used but not defined in configure/RELEASE*'''
+        return self.usesMacro( macroName ) and not self.definesMacro( macroName )
+
+    def includesDotDotReleaseSite( self ):
+        '''Returns True if any configure/RELEASE* file includes ../../RELEASE_SITE'''
+        for macroFile in self._getMacroFiles():
+            for statement in macroFile.statements:
+                if statement[0] == 'include' and '../../RELEASE_SITE' in statement[2]:
+                    return True
+        return False
+
+# Parsed configure directories by TOP
+_configureDirCache = {}
+
+def getConfigureDir( topDir='.', debug=False ):
+    '''Returns a ConfigureDir for topDir, reusing the prior parse
+    if none of its configure/RELEASE* or included files have changed.'''
+    cacheKey = ( topDir, os.path.abspath( topDir ) )
+    configureDir = _configureDirCache.get( cacheKey )
+    if configureDir is None or debug or not configureDir.isCurrent():
+        configureDir = ConfigureDir( topDir, debug=debug )
+        _configureDirCache[cacheKey] = configureDir
+    return configureDir
+
 def pkgSpecToMacroVersions( pkgSpec, verbose=False ):
     """
     Convert the pkgSpec into a dictionary of macroVersions
@@ -287,50 +383,71 @@ def pkgSpecToMacroVersions( pkgSpec, verbose=False ):
     return macroVersions
 
 # Check if any file inside configure/ has included a ../../RELEASE_SITE file
-def hasIncludeDotDotReleaseSite():
-    if not os.path.isdir( 'configure' ):
+def hasIncludeDotDotReleaseSite( topDir='.' ):
+    if not os.path.isdir( os.path.join( topDir, 'configure' ) ):
         return False
-    # Just check configure/RELEASE and configure/RELEASE.local
-    for filename in [ 'RELEASE', 'RELEASE.local' ]:
-        configFilePath = os.path.join( 'configure', filename )
-        if not os.path.isfile( configFilePath ):
-            continue
-        configFile = open( configFilePath, 'r')
-        for line in configFile:
-            # Check included ../../RELEASE_SITE file unless it is commented
-            if re.search('^[^\#]include(.*)/../../RELEASE_SITE', line):
-                return True
-    return False
+    return getConfigureDir( topDir ).includesDotDotReleaseSite()
 
-def doesPkgNeedMacro( macroName ):
+def doesPkgNeedMacro( macroName, topDir='.' ):
     '''
     Check if configure/RELEASE* files need a particular macro
     '''
     if not macroName or len(macroName) == 0:
         return False
-    # TODO: Check all configure/RELEASE* files
-    definesMacro = False
-    needsMacro = False
-    definesMacroRegExp = re.compile( '^%s\s*=\s*\S' % macroName )
-    needsMacroRegExp   = re.compile( '\$\(' + macroName )
-    for filename in [ 'RELEASE', 'RELEASE.local' ]:
-        configFilePath = os.path.join( 'configure', filename )
-        if not os.path.isfile( configFilePath ):
-            continue
-        configFile = open( configFilePath, 'r')
-        for line in configFile:
-            # Check if this macro is used
-            if  needsMacroRegExp.search( line ):
-                needsMacro = True
-            # Check if this macro is defined
-            if  definesMacroRegExp.search( line ):
-                definesMacro = True
-
-    if needsMacro and definesMacro:
-        needsMacro = False
-    return needsMacro
-
-def ExpandPackagePath( topDir, pkgSpec, base=None, debug=False ):
+    return getConfigureDir( topDir ).needsMacro( macroName )
+
+class DirCache(object):
+    '''
+    Memoized directory listings, which can be shared by ExpandPackagePath() calls
+    and threads, ex. for a site wide scan that would otherwise list the same
+    directories for each package and top variant.
+    '''
+    def __init__( self ):
+        self._listings	= {}
+        self._isfile	= {}
+
+    def listdir( self, dirPath ):
+        '''Returns ( dirs, files, links ) for dirPath, or None if it isn't a directory.
+        dirs and files are sorted lists of names, links is the set of dirs that are symlinks.'''
+        if dirPath in self._listings:
+            return self._listings[dirPath]
+        try:
+            ( dirs, files, links ) = ( [], [], set() )
+            for entry in os.scandir( dirPath ):
+                if entry.is_dir():
+                    dirs.append( entry.name )
+                    if entry.is_symlink():
+                        links.add( entry.name )
+                elif entry.is_file():
+                    files.append( entry.name )
+            listing = ( sorted( dirs ), sorted( files ), links )
+        except PermissionError:
+            listing = ( [], [], set() ) if os.path.isdir( dirPath ) else None
+        except OSError:
+            listing = None
+        self._listings[dirPath] = listing
+        return listing
+
+    def isdir( self, path ):
+        return self.listdir( path ) is not None
+
+    def isfile( self, path ):
+        if path not in self._isfile:
+            self._isfile[path] = os.path.isfile( path )
+        return self._isfile[path]
+
+    def walk( self, top ):
+        '''Like os.walk( top, topdown=True ) from the cached listings'''
+        listing = self.listdir( top )
+        if listing is None:
+            return
+        dirs = list( listing[0] )
+        yield ( top, dirs, list( listing[1] ) )
+        for dir in dirs:
+            if dir not in listing[2]:
+                yield from self.walk( os.path.join( top, dir ) )
+
+def ExpandPackagePath( topDir, pkgSpec, base=None, debug=False, dirCache=None ):
     '''Takes a topDir directory path and looks for packages which match the pkgSpec.
     The pkgSpec can be "modules", "ioc", "ioc/common", "ioc/$AREA", "$MODULE_NAME",
     or "$MODULE_NAME/$MODULE_VERSION".
@@ -343,7 +460,11 @@ def ExpandPackagePath( topDir, pkgSpec, base=None, debug=False ):
     If that directory exists and satisfies the isReleaseCandidate() test,
     or any sub-directory of that directory satisfies IsReleaseCandidate(),
     it is added to a list of release paths which is returned.
+    dirCache is an optional DirCache to share directory listings w/ other calls.
     '''
+    if dirCache is None:
+        dirCache = DirCache()
+
     # See if "modules" is in both parts of the path
     if "modules" in topDir and "modules" in pkgSpec:
         topDir = os.path.dirname( topDir )
@@ -351,22 +472,22 @@ def ExpandPackagePath( topDir, pkgSpec, base=None, debug=False ):
     # Create the path to package
     pkgPath = os.path.join( topDir, pkgSpec )
 
-    if not os.path.isdir( pkgPath ) and base:
+    if not dirCache.isdir( pkgPath ) and base:
         if not base in topDir:
             topDir = os.path.join( topDir, base )
         if not "modules" in topDir and not "modules" in pkgSpec:
             topDir = os.path.join( topDir, "modules" )
         modPath = os.path.join( topDir, pkgSpec )
-        if os.path.isdir( modPath ):
+        if dirCache.isdir( modPath ):
             pkgPath = modPath
 
-    if not os.path.isdir( pkgPath ):
+    if not dirCache.isdir( pkgPath ):
         if not "modules" in topDir and not "modules" in pkgSpec:
             topDir = os.path.join( topDir, "modules" )
         pkgPath = os.path.join( topDir, pkgSpec ) 
 
     # See if it exists
-    if not os.path.isdir( pkgPath ):
+    if not dirCache.isdir( pkgPath ):
         if debug:
             print(("ExpandPackagePath: %s not found" % ( pkgPath )))
         return []
@@ -383,7 +504,7 @@ def ExpandPackagePath( topDir, pkgSpec, base=None, debug=False ):
     if isReleaseCandidate( os.path.split( pkgPath )[-1] ):
         selectedReleases += [ pkgPath ]
     else:
-        for dirPath, dirs, files in os.walk( pkgPath, topdown=True ):
+        for dirPath, dirs, files in dirCache.walk( pkgPath ):
             if len( dirs ) == 0:
                 continue
             if '.git' in dirs:
@@ -409,7 +530,7 @@ def ExpandPackagePath( topDir, pkgSpec, base=None, debug=False ):
                     verPath = os.path.join( release, "configure", "RELEASE" )
 
                 buildPath = os.path.join( release, "build" )
-                if os.path.isfile( verPath ) or os.path.isdir( buildPath ):
+                if dirCache.isfile( verPath ) or dirCache.isdir( buildPath ):
                     if debug:
                         print(("ExpandPackagePath: Found ", release))
                     releases += [ release ]